@@ -5,7 +5,6 @@ AI对话应用图片服务
 
 import base64
 import hashlib
-import json
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional, List
@@ -14,8 +13,8 @@ from io import BytesIO
 from django.core.files.uploadedfile import UploadedFile
 from django.conf import settings
 
-# 导入 crawler 应用的 Redis 服务
-from crawler.redis_service import redis_service
+# 导入 crawler 应用的图片二进制存储
+from crawler.image_store import BinaryImageStore
 from .config import IMAGE_CONFIG
 
 logger = logging.getLogger(__name__)
@@ -29,6 +28,7 @@ class AIImageService:
         self.supported_formats = IMAGE_CONFIG['supported_formats']
         self.cache_expire_time = IMAGE_CONFIG['cache_expire_time']
         self.max_images_per_request = IMAGE_CONFIG['max_images_per_request']
+        self.store = BinaryImageStore('ai_chat_image', self.cache_expire_time)
     
     def upload_and_cache_image(self, uploaded_file: UploadedFile) -> Dict[str, Any]:
         """
@@ -84,28 +84,17 @@ class AIImageService:
                     'message': '图片已存在缓存中'
                 }
             
-            # 编码为base64
-            image_base64 = base64.b64encode(file_data).decode('utf-8')
-            
-            # 构建缓存数据
-            image_cache_data = {
+            # 缓存到Redis：原始字节与元数据分开存放
+            image_meta = {
                 'filename': uploaded_file.name,
                 'content_type': uploaded_file.content_type,
-                'data': image_base64,
                 'size': len(file_data),
                 'width': width,
                 'height': height,
                 'format': format_name,
                 'uploaded_at': datetime.now().isoformat()
             }
-            
-            # 缓存到Redis
-            cache_key = f"ai_chat_image:{image_id}"
-            redis_service.redis_client.setex(
-                cache_key, 
-                self.cache_expire_time, 
-                json.dumps(image_cache_data, ensure_ascii=False)
-            )
+            self.store.save(image_id, file_data, image_meta)
             
             logger.info(f"图片缓存成功: {image_id} ({len(file_data)} bytes)")
             
@@ -131,7 +120,7 @@ class AIImageService:
     
     def get_cached_image(self, image_id: str) -> Optional[Dict[str, Any]]:
         """
-        获取缓存的图片信息
+        获取缓存的图片信息（不含图片数据）
         
         Args:
             image_id: 图片ID
@@ -140,12 +129,7 @@ class AIImageService:
             图片信息字典或None
         """
         try:
-            cache_key = f"ai_chat_image:{image_id}"
-            cached_data = redis_service.redis_client.get(cache_key)
-            
-            if cached_data:
-                return json.loads(cached_data)
-            return None
+            return self.store.get_meta(image_id)
             
         except Exception as e:
             logger.error(f"获取缓存图片失败: {str(e)} - {image_id}")
@@ -162,11 +146,10 @@ class AIImageService:
             data URL字符串或None
         """
         try:
-            cached_image = self.get_cached_image(image_id)
-            if cached_image:
-                content_type = cached_image.get('content_type', 'image/jpeg')
-                data = cached_image.get('data', '')
-                return f"data:{content_type};base64,{data}"
+            image_data, content_type = self.store.get_data(image_id)
+            if image_data is not None:
+                data = base64.b64encode(image_data).decode('utf-8')
+                return f"data:{content_type or 'image/jpeg'};base64,{data}"
             return None
             
         except Exception as e:
@@ -226,8 +209,7 @@ class AIImageService:
             是否删除成功
         """
         try:
-            cache_key = f"ai_chat_image:{image_id}"
-            result = redis_service.redis_client.delete(cache_key)
+            result = self.store.delete(image_id)
             logger.info(f"删除缓存图片: {image_id}, 结果: {bool(result)}")
             return bool(result)
             
@@ -243,27 +225,7 @@ class AIImageService:
             缓存统计信息
         """
         try:
-            # 获取所有AI对话图片缓存键
-            pattern = "ai_chat_image:*"
-            keys = redis_service.redis_client.keys(pattern)
-            
-            total_images = len(keys)
-            total_size = 0
-            
-            # 计算总大小（采样方式，避免性能问题）
-            sample_keys = keys[:min(100, len(keys))]
-            for key in sample_keys:
-                try:
-                    cached_data = redis_service.redis_client.get(key)
-                    if cached_data:
-                        image_info = json.loads(cached_data)
-                        total_size += image_info.get('size', 0)
-                except:
-                    continue
-            
-            # 如果是采样，估算总大小
-            if len(keys) > 100:
-                total_size = int(total_size * (len(keys) / len(sample_keys)))
+            total_images, total_size = self.store.count()
             
             return {
                 'total_images': total_images,
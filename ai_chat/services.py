@@ -7,6 +7,7 @@ AI对话服务
 import logging
 from typing import Dict, Any, List, Optional
 from volcenginesdkarkruntime import Ark
+from legacy_pi_backend.instrumentation import instrument_llm_client
 from .config import AI_MODEL_CONFIG, CHAT_SYSTEM_PROMPTS, CHAT_CONFIG, IMAGE_PROMPTS
 from .image_service import ai_image_service
 
@@ -17,7 +18,7 @@ class AIChatService:
     
     def __init__(self):
         """初始化AI对话服务"""
-        self.client = Ark(api_key=AI_MODEL_CONFIG['api_key'])
+        self.client = instrument_llm_client(Ark(api_key=AI_MODEL_CONFIG['api_key']), 'ai_chat')
         self.model = AI_MODEL_CONFIG['model']
         self.vision_model = AI_MODEL_CONFIG['vision_model']
         self.default_max_tokens = CHAT_CONFIG['max_tokens']
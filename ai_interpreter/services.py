@@ -6,6 +6,7 @@ AI解读服务
 import logging
 from typing import Dict, Any, Optional
 from volcenginesdkarkruntime import Ark
+from legacy_pi_backend.instrumentation import instrument_llm_client
 from .config import AI_MODEL_CONFIG, INTERPRETATION_PROMPTS
 
 logger = logging.getLogger(__name__)
@@ -15,7 +16,7 @@ class AIInterpreterService:
     
     def __init__(self):
         """初始化AI解读服务"""
-        self.client = Ark(api_key=AI_MODEL_CONFIG['api_key'])
+        self.client = instrument_llm_client(Ark(api_key=AI_MODEL_CONFIG['api_key']), 'ai_interpreter')
         self.model = AI_MODEL_CONFIG['model']
     
     def interpret_text(self, 
@@ -0,0 +1,210 @@
+"""
+文章归档
+Redis 只保留当天（热）文章，较早的文章转入磁盘上的按天归档：
+    {root}/{日期}.{版本}.seg     数据段，每篇文章单独 zlib 压缩后依次写入，可按偏移直接读取一篇
+    {root}/{日期}.idx.json       当天的索引：数据段文件名，以及每篇文章的偏移、长度和摘要字段
+    {root}/{日期}.lock           写入锁（每日归档与追加爬取可能在不同进程中同时写同一天）
+写入时先生成新版本的数据段，再原子替换索引，最后删除旧索引引用的数据段，读取方不会读到写了一半的文件。
+日期为本地日期（与每日文章索引一致）。
+按日期范围列出文章只读索引文件，不解压正文。
+"""
+
+import os
+import json
+import time
+import zlib
+import fcntl
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone, timedelta
+from django.conf import settings
+from django.utils import timezone
+
+from .config import ARTICLE_ARCHIVE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 索引中保存的摘要字段，列表类查询只读这些字段
+SUMMARY_FIELDS = (
+    'id', 'title', 'url', 'source', 'category', 'publish_date', 'crawl_status',
+    'word_count', 'image_count', 'view_count', 'created_at'
+)
+
+
+def article_date(article_id):
+    """根据文章ID中的毫秒时间戳推算保存日期（本地日期，与每日文章索引一致），无法解析时返回 None"""
+    try:
+        ms = int(str(article_id).rsplit('_', 1)[-1])
+        return timezone.localtime(datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc)).date()
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+class ArticleArchive:
+    """按天分段的压缩文章归档"""
+
+    def __init__(self, root=None):
+        self.root = str(root or ARTICLE_ARCHIVE_CONFIG['root'] or os.path.join(settings.BASE_DIR, 'archive', 'articles'))
+        self.compress_level = ARTICLE_ARCHIVE_CONFIG['compress_level']
+        self.index_cache_size = ARTICLE_ARCHIVE_CONFIG['index_cache_size']
+        self._index_cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def index_path(self, date):
+        return os.path.join(self.root, f"{date}.idx.json")
+
+    def lock_path(self, date):
+        return os.path.join(self.root, f"{date}.lock")
+
+    def write_day(self, date, articles):
+        """
+        把一天的文章写入归档，与已归档的同日文章合并（同ID以新数据为准）
+
+        Args:
+            date: 日期（date 或 YYYY-MM-DD）
+            articles: 文章字典列表
+
+        Returns:
+            当天归档中的文章数量
+        """
+        date = str(date)
+        articles = [article for article in articles if article and article.get('id')]
+        if not articles:
+            return 0
+        os.makedirs(self.root, exist_ok=True)
+
+        # 读取-合并-写入整个过程持有当天的文件锁，避免并发写入方删除对方刚写入的数据段
+        with open(self.lock_path(date), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return self._write_day_locked(date, articles)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_day_locked(self, date, articles):
+        merged = OrderedDict()
+        index = self._load_index(date)
+        if index:
+            for article_id in index['articles']:
+                if article_id not in merged:
+                    merged[article_id] = self.get(article_id, date=date)
+        for article in articles:
+            merged[article['id']] = article
+
+        segment = f"{date}.{time.time_ns()}.seg"
+        entries = {}
+        offset = 0
+        segment_path = os.path.join(self.root, segment)
+        with open(segment_path, 'wb') as f:
+            for article_id, article in merged.items():
+                if article is None:
+                    continue
+                data = zlib.compress(json.dumps(article, ensure_ascii=False).encode('utf-8'), self.compress_level)
+                f.write(data)
+                entry = {field: article.get(field) for field in SUMMARY_FIELDS}
+                entry.update(offset=offset, length=len(data))
+                entries[article_id] = entry
+                offset += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        tmp_path = f"{self.index_path(date)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'date': date, 'segment': segment, 'articles': entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path(date))
+        with self._lock:
+            self._index_cache.pop(date, None)
+
+        # 只删除旧索引引用的数据段
+        if index and index.get('segment') != segment:
+            try:
+                os.remove(os.path.join(self.root, index['segment']))
+            except OSError:
+                pass
+        logger.info(f"已归档 {date} 的文章 {len(entries)} 篇")
+        return len(entries)
+
+    def get(self, article_id, date=None):
+        """读取一篇归档文章，不存在时返回 None；未指定日期时根据文章ID推算（含前后一天）"""
+        for day in self._candidate_dates(article_id, date):
+            for _ in range(2):
+                index = self._load_index(day)
+                entry = index and index['articles'].get(article_id)
+                if not entry:
+                    break
+                try:
+                    with open(os.path.join(self.root, index['segment']), 'rb') as f:
+                        f.seek(entry['offset'])
+                        return json.loads(zlib.decompress(f.read(entry['length'])))
+                except FileNotFoundError:
+                    # 数据段刚被新版本替换，重新加载索引后再读一次
+                    with self._lock:
+                        self._index_cache.pop(day, None)
+        return None
+
+    def get_many(self, article_ids):
+        """批量读取归档文章，按顺序返回（不存在的为 None）"""
+        return [self.get(article_id) for article_id in article_ids]
+
+    def list_day(self, date):
+        """列出某天归档文章的摘要字段（只读索引文件）"""
+        index = self._load_index(str(date))
+        if not index:
+            return []
+        return [
+            {field: entry.get(field) for field in SUMMARY_FIELDS}
+            for entry in index['articles'].values()
+        ]
+
+    def list_range(self, start_date, end_date):
+        """按日期范围列出归档文章摘要，返回 {日期: [摘要, ...]}"""
+        results = OrderedDict()
+        day = start_date
+        while day <= end_date:
+            results[day.isoformat()] = self.list_day(day)
+            day += timedelta(days=1)
+        return results
+
+    def has_day(self, date):
+        return os.path.exists(self.index_path(str(date)))
+
+    def _candidate_dates(self, article_id, date):
+        if date:
+            return [str(date)]
+        day = article_date(article_id)
+        if day is None:
+            return []
+        return [str(day), str(day - timedelta(days=1)), str(day + timedelta(days=1))]
+
+    def _load_index(self, date):
+        """读取索引文件，按文件修改时间缓存在进程内"""
+        path = self.index_path(date)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = self._index_cache.get(date)
+            if cached and cached[0] == mtime:
+                self._index_cache.move_to_end(date)
+                return cached[1]
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取归档索引失败: {path} - {str(e)}")
+            return None
+
+        with self._lock:
+            self._index_cache[date] = (mtime, index)
+            self._index_cache.move_to_end(date)
+            while len(self._index_cache) > self.index_cache_size:
+                self._index_cache.popitem(last=False)
+        return index
+
+
+# 全局文章归档实例
+article_archive = ArticleArchive()
@@ -0,0 +1,355 @@
+"""
+异步爬取流水线
+基于 aiohttp/asyncio 的流式爬取：列表页发现 → 文章抓取 → 解析提取 → 图片下载 → Redis 批量持久化。
+各阶段之间用有界队列连接，文章 N 的解析与文章 N+1 的抓取以及图片下载相互重叠。
+解析、浏览器兜底和 Redis 写入等阻塞操作放到线程池中执行，不阻塞事件循环。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+import aiohttp
+from django.utils import timezone
+
+from .config import CRAWLER_CONFIG, ASYNC_PIPELINE_CONFIG, IMAGE_INGEST_CONFIG
+from .fetch_engine import AsyncHostPolitenessLimiter
+from .image_service import image_cache_service
+from .page_fetcher import decode_html
+from .redis_models import RedisCrawlTask
+from .redis_service import redis_service
+from .services import PeopleNetCrawler
+
+logger = logging.getLogger(__name__)
+
+# 阶段结束标记
+_DONE = object()
+
+
+class AsyncCrawlPipeline:
+    """异步流式爬取流水线，复用 PeopleNetCrawler 的解析、浏览器池和保存逻辑"""
+
+    target_url = "http://www.people.com.cn/GB/59476/index.html"
+
+    def __init__(self, crawler=None):
+        self.crawler = crawler or PeopleNetCrawler()
+        self.config = ASYNC_PIPELINE_CONFIG
+        self.limiter = AsyncHostPolitenessLimiter()
+        self.timeout = aiohttp.ClientTimeout(total=CRAWLER_CONFIG['http_timeout'])
+        self.image_timeout = aiohttp.ClientTimeout(total=IMAGE_INGEST_CONFIG['timeout'])
+        self.task = None
+        self.progress = {'total': 0, 'success': 0, 'failed': 0, 'skipped': 0, 'unchanged': 0}
+        self.refresh = False
+        self.delta = False
+
+    def run(self, task_id=None, refresh=False, delta=False):
+        """同步入口，供 Celery 任务调用"""
+        return asyncio.run(self.crawl_today_news(task_id, refresh=refresh, delta=delta))
+
+    async def crawl_today_news(self, task_id=None, refresh=False, delta=False):
+        """爬取今日要闻，返回结果格式与 PeopleNetCrawler.crawl_today_news 一致（同样支持增量执行、刷新和追加模式）"""
+        self.refresh = refresh
+        self.delta = delta
+        self.crawler.stage_timer.reset()
+        logger.info("异步流水线开始执行")
+        try:
+            if task_id:
+                self.task = await asyncio.to_thread(RedisCrawlTask.get, task_id)
+                if self.task:
+                    await asyncio.to_thread(self.task.update, status='running', started_at=timezone.now().isoformat())
+
+            connector = aiohttp.TCPConnector(limit=self.config['connection_limit'], ttl_dns_cache=300)
+            # trust_env：与 requests 一致遵循 HTTP_PROXY 等环境变量（离线基准测试通过代理回放录制的页面）
+            async with aiohttp.ClientSession(headers=self.crawler.headers, connector=connector, timeout=self.timeout, trust_env=True) as session:
+                await self._run_stages(session)
+
+            if not self.progress['total']:
+                raise Exception(f"无法从目标URL {self.target_url} 获取任何新闻链接")
+
+            metrics = self.crawler._collect_metrics()
+            metrics['incremental'] = {'skipped': self.progress['skipped'], 'unchanged': self.progress['unchanged'], 'delta': self.delta}
+            if self.task:
+                await asyncio.to_thread(
+                    self.task.update,
+                    status='completed',
+                    completed_at=timezone.now().isoformat(),
+                    success_count=self.progress['success'],
+                    failed_count=self.progress['failed'],
+                    metrics=metrics
+                )
+                await asyncio.to_thread(self.task.save_article_timings, self.crawler.stage_timer.article_timings())
+
+            logger.info(f"各阶段耗时: {metrics['stages']}")
+            logger.info(f"异步爬取完成: 成功 {self.progress['success']} 篇，失败 {self.progress['failed']} 篇")
+
+            return {
+                'success': True,
+                'total': self.progress['total'],
+                'success_count': self.progress['success'],
+                'failed_count': self.progress['failed'],
+                'skipped_count': self.progress['skipped'],
+                'unchanged_count': self.progress['unchanged'],
+                'metrics': metrics,
+                'message': '爬取完成'
+            }
+
+        except Exception as e:
+            error_msg = f"爬取今日要闻时出错: {str(e)}"
+            logger.error(error_msg)
+
+            if self.task:
+                await asyncio.to_thread(
+                    self.task.update,
+                    status='failed',
+                    error_message=error_msg,
+                    completed_at=timezone.now().isoformat(),
+                    metrics=self.crawler._collect_metrics()
+                )
+                await asyncio.to_thread(self.task.save_article_timings, self.crawler.stage_timer.article_timings())
+
+            return {
+                'success': False,
+                'message': error_msg
+            }
+        finally:
+            await asyncio.to_thread(self.crawler.browser_pool.close)
+
+    async def _run_stages(self, session):
+        """启动所有阶段并等待流水线排空"""
+        size = self.config['queue_size']
+        fetch_queue = asyncio.Queue(size)
+        parse_queue = asyncio.Queue(size)
+        image_queue = asyncio.Queue(size)
+        persist_queue = asyncio.Queue(size)
+
+        image_semaphore = asyncio.Semaphore(self.config['image_concurrency'])
+
+        await asyncio.gather(
+            self._discovery_stage(session, fetch_queue),
+            self._stage('fetch', lambda item: self._fetch(session, item), fetch_queue, parse_queue, self.config['fetch_workers']),
+            self._stage('parse', lambda item: asyncio.to_thread(self._parse, item), parse_queue, image_queue, self.config['parse_workers']),
+            self._stage('images', lambda item: self._download_images(session, image_semaphore, item), image_queue, persist_queue, self.config['image_workers']),
+            self._persist_stage(persist_queue),
+        )
+
+    async def _stage(self, name, handler, inbox, outbox, workers):
+        """
+        通用阶段：workers 个协程从 inbox 取条目交给 handler 处理，结果放入 outbox。
+        handler 返回 None 表示该文章失败；收到结束标记后向下游传递结束标记。
+        """
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    # 让同阶段的其他协程也能收到结束标记
+                    await inbox.put(_DONE)
+                    return
+                started = time.monotonic()
+                try:
+                    result = await handler(item)
+                except Exception as e:
+                    logger.error(f"流水线阶段 {name} 处理失败: {item['link'].get('title', 'Unknown')} - {str(e)}")
+                    result = None
+                self.crawler.stage_timer.record(name, time.monotonic() - started, item['link'].get('url'))
+                if result is None:
+                    await self._mark_done(item, success=False)
+                elif outbox is not None:
+                    await outbox.put(result)
+                else:
+                    await self._mark_done(result, success=True)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        if outbox is not None:
+            await outbox.put(_DONE)
+
+    async def _mark_done(self, item, success):
+        """记录文章最终结果并更新任务进度"""
+        if success and item.get('unchanged'):
+            self.progress['unchanged'] += 1
+        elif success:
+            self.progress['success'] += 1
+            logger.info(f"成功保存文章: {item['article_data']['title']}")
+        else:
+            self.progress['failed'] += 1
+            logger.warning(f"文章爬取失败: {item['link'].get('title', 'Unknown')}")
+        if self.task:
+            await asyncio.to_thread(
+                self.task.update,
+                success_count=self.progress['success'],
+                failed_count=self.progress['failed'],
+                metrics={'stages': self.crawler.stage_timer.summary()}
+            )
+
+    # ---- 阶段 1：列表页发现 ----
+    async def _discovery_stage(self, session, fetch_queue):
+        """获取今日要闻链接并送入抓取队列"""
+        try:
+            # 优先使用检查点中保存的链接，刷新和追加模式重新获取列表页
+            news_links = None if self.refresh or self.delta else await asyncio.to_thread(redis_service.crawl_registry.load_links)
+            if news_links:
+                logger.info("从检查点恢复今日新闻链接")
+            else:
+                started = time.monotonic()
+                news_links = await self._discover(session) or []
+                self.crawler.stage_timer.record('discovery', time.monotonic() - started)
+                if news_links:
+                    await asyncio.to_thread(redis_service.crawl_registry.save_links, news_links)
+            self.progress['total'] = len(news_links)
+            logger.info(f"找到 {len(news_links)} 条新闻链接")
+            if self.task and news_links:
+                await asyncio.to_thread(self.task.update, total_links=len(news_links))
+            news_links, self.progress['skipped'] = await asyncio.to_thread(self.crawler._plan_links, news_links, self.refresh)
+            for link_info in news_links:
+                await fetch_queue.put({'link': link_info})
+        finally:
+            await fetch_queue.put(_DONE)
+
+    async def _discover(self, session):
+        """通过 HTTP + lxml 获取列表页（按日期拼出地址或解析日历 iframe），失败时回退到浏览器的日历点击流程"""
+        return await asyncio.to_thread(self.crawler.list_discovery.discover, self.target_url, datetime.now())
+
+    # ---- 阶段 2：文章抓取 ----
+    async def _fetch(self, session, item):
+        """通过 aiohttp 获取文章页；失败时不丢弃，交给解析阶段走浏览器兜底"""
+        url = item['link']['url']
+        item['started'] = time.monotonic()
+        item['page_source'] = None
+        try:
+            async with self.limiter.acquire(url):
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        body = await response.read()
+                        item['page_source'] = decode_html(body, response.charset)
+                    else:
+                        logger.warning(f"HTTP 抓取状态码异常: {response.status} - {url}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"HTTP 抓取失败，升级到浏览器: {url} - {str(e)}")
+        return item
+
+    # ---- 阶段 3：解析提取（线程池中执行） ----
+    def _parse(self, item):
+        """提取文章主体和字段；HTTP 页面提取失败时用浏览器池兜底"""
+        link_info = item['link']
+        url = link_info['url']
+        fetcher = self.crawler.page_fetcher
+
+        article_content = None
+        if item['page_source']:
+            article_content = self.crawler._extract_article_content(item['page_source'])
+            if article_content is not None:
+                fetcher.record('http', item['started'])
+
+        if article_content is None:
+            browser_started = time.monotonic()
+            try:
+                with self.crawler.browser_pool.lease() as driver:
+                    driver.get(url)
+                    page_source = driver.page_source
+                article_content = self.crawler._extract_article_content(page_source)
+            except Exception as e:
+                logger.error(f"浏览器抓取失败: {url} - {str(e)}")
+            if article_content is None:
+                fetcher.record('failed', item['started'])
+                return None
+            fetcher.record('browser', browser_started)
+
+        item['fields'], item['text'], item['image_jobs'] = self.crawler._parse_article(article_content, link_info)
+        item.pop('page_source', None)
+        return item
+
+    # ---- 阶段 4：图片下载 ----
+    async def _download_images(self, session, semaphore, item):
+        """并发下载文章中的图片，再填充正文生成最终文章数据"""
+        jobs = item['image_jobs']
+        results = await asyncio.gather(*(self._download_image_job(session, semaphore, job) for job in jobs))
+        downloaded = {job['placeholder']: result for job, result in zip(jobs, results)}
+
+        img_placeholders, image_mapping = self.crawler._apply_image_results(jobs, downloaded)
+        article_data = self.crawler._build_article_data(item['fields'], item['text'], img_placeholders, image_mapping)
+        if not article_data:
+            return None
+        item['article_data'] = article_data
+        return item
+
+    async def _download_image_job(self, session, semaphore, job):
+        """按顺序尝试图片的候选地址，返回 (image_id, content_type)"""
+        for candidate in job['candidates']:
+            image_id, content_type = await asyncio.to_thread(image_cache_service.find_cached_image, candidate)
+            if image_id:
+                return image_id, content_type
+
+            async with semaphore:
+                downloaded = await self._download_image(session, candidate)
+            if downloaded:
+                image_bytes, content_type = downloaded
+                image_id, content_type = await asyncio.to_thread(
+                    image_cache_service.cache_image_bytes, candidate, image_bytes, content_type
+                )
+                if image_id:
+                    return image_id, content_type
+        return None, None
+
+    async def _download_image(self, session, image_url):
+        """下载单张图片，返回 (图片数据, content_type)，失败返回 None"""
+        max_size = image_cache_service.max_image_size
+        headers = {'Referer': self.crawler.base_url}
+        try:
+            async with session.get(image_url, headers=headers, timeout=self.image_timeout) as response:
+                if response.status != 200:
+                    logger.warning(f"图片下载失败，状态码: {response.status} - {image_url}")
+                    return None
+                content_type = response.headers.get('content-type', '').lower()
+                if not content_type.startswith('image/'):
+                    logger.warning(f"不是有效的图片类型: {content_type} - {image_url}")
+                    return None
+                if response.content_length and response.content_length > max_size:
+                    logger.warning(f"图片文件过大: {response.content_length} bytes - {image_url}")
+                    return None
+
+                chunks = []
+                total_size = 0
+                async for chunk in response.content.iter_chunked(8192):
+                    total_size += len(chunk)
+                    if total_size > max_size:
+                        logger.warning(f"图片文件过大: {total_size} bytes - {image_url}")
+                        return None
+                    chunks.append(chunk)
+                return b''.join(chunks), content_type
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"下载图片时网络错误: {str(e)} - {image_url}")
+            return None
+
+    # ---- 阶段 5：Redis 持久化（线程池中执行） ----
+    async def _persist_stage(self, inbox):
+        """
+        攒够 save_batch_size 篇后通过 _save_articles 在一个事务中批量保存（与线程池后端一致，分配修订号），
+        重新抓取的文章未变化时不保存；收到结束标记时保存剩余的文章。
+        """
+        pending = []
+        batch_size = CRAWLER_CONFIG['save_batch_size']
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                break
+            if not await asyncio.to_thread(self.crawler._is_changed, item['link'], item['article_data']):
+                item['unchanged'] = True
+                await self._mark_done(item, success=True)
+                continue
+            pending.append(item)
+            if len(pending) >= batch_size:
+                await self._flush(pending)
+                pending = []
+        if pending:
+            await self._flush(pending)
+
+    async def _flush(self, items):
+        """批量保存文章并记录各文章的结果"""
+        started = time.monotonic()
+        try:
+            saved = await asyncio.to_thread(self.crawler._save_articles, [item['article_data'] for item in items])
+        except Exception as e:
+            logger.error(f"批量保存文章失败: {str(e)}")
+            saved = False
+        self.crawler.stage_timer.record_batch('persist', time.monotonic() - started, [item['link'].get('url') for item in items])
+        for item in items:
+            await self._mark_done(item, success=saved)
@@ -0,0 +1,335 @@
+"""
+内容寻址的二进制对象存储
+同一份数据（如同一张图片）只按 SHA-256 存一次，各应用通过别名引用：
+- Redis 后端（爬虫图片、AI对话图片；以下以默认前缀 blob 为例）：
+    blob:{sha256}                   原始字节
+    blob_meta:{sha256}              数据元信息（content_type、大小、宽高、格式、引用计数）
+    blob_alias:{namespace}:{alias}  别名 -> sha256，附带别名自己的信息（如原始URL、文件名）
+    blob_lru                        有序集合，按最近访问时间记录 sha256，用于超出容量时淘汰
+    blob_sizes                      哈希，sha256 -> 字节数（不过期，数据自然过期后仍能正确扣减总量；已有记录的数据不重复计入总量）
+    blob_stats                      哈希，记录当前数据总字节数
+  每个别名计一次引用，删除别名时引用减一，归零后删除数据；数据的过期时间不短于引用它的别名。
+  别名自然过期时引用不会减少，由 sweep() 按现存别名重建引用计数。
+- 文件后端（md_docs 上传图片）：按 sha256 分目录存放在 MEDIA_ROOT 下，相同内容只写一份文件。
+"""
+
+import os
+import time
+import hashlib
+import logging
+from collections import Counter
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .config import BLOB_STORE_CONFIG
+from .redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+# 元信息中需要转回整数的字段
+INT_FIELDS = ('size', 'width', 'height', 'refcount')
+
+
+def content_hash(data):
+    """计算内容哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class RedisBlobStore:
+    """Redis 内容寻址存储"""
+
+    def __init__(self, max_bytes=None, prefix='blob', default_ttl=None):
+        """
+        Args:
+            max_bytes: 数据总大小上限，超出后按 LRU 淘汰
+            prefix: 键前缀，不同前缀的存储各自独立计算容量（如图片衍生版本使用单独的存储）
+            default_ttl: 默认过期时间(秒)
+        """
+        self.max_bytes = max_bytes or BLOB_STORE_CONFIG['max_bytes']
+        self.evict_batch = BLOB_STORE_CONFIG['evict_batch']
+        self.prefix = prefix
+        self.default_ttl = default_ttl or BLOB_STORE_CONFIG['default_ttl']
+        self.lru_key = f"{prefix}_lru"
+        self.sizes_key = f"{prefix}_sizes"
+        self.stats_key = f"{prefix}_stats"
+
+    @property
+    def client(self):
+        return redis_service.binary_client
+
+    def blob_key(self, digest):
+        return f"{self.prefix}:{digest}"
+
+    def meta_key(self, digest):
+        return f"{self.prefix}_meta:{digest}"
+
+    def alias_key(self, namespace, alias):
+        return f"{self.prefix}_alias:{namespace}:{alias}"
+
+    def put(self, namespace, alias, data, meta=None, alias_meta=None, ttl=None):
+        """
+        保存数据并把别名指向它，返回 sha256
+
+        Args:
+            namespace: 别名命名空间（如 image、ai_chat_image）
+            alias: 别名（如 URL 的 MD5）
+            data: 原始字节
+            meta: 数据元信息（content_type、宽高、格式等）
+            alias_meta: 别名自己的信息（如原始URL、文件名）
+            ttl: 过期时间(秒)
+        """
+        return self.put_many(namespace, [(alias, data, meta, alias_meta)], ttl=ttl)[0]
+
+    def put_many(self, namespace, items, ttl=None):
+        """
+        批量保存，items 为 (alias, data, meta, alias_meta) 列表，按顺序返回 sha256 列表。
+        读取旧别名、写入数据和别名、更新容量统计各只需一次往返。
+        容量按 blob_sizes 中首次登记的数据计入，数据自然过期后重新写入时不会重复计入。
+        """
+        ttl = ttl or self.default_ttl
+        if not items:
+            return []
+
+        pipe = self.client.pipeline(transaction=False)
+        for alias, *_ in items:
+            pipe.hget(self.alias_key(namespace, alias), 'sha256')
+        previous_list = [digest.decode('utf-8') if digest else None for digest in pipe.execute()]
+
+        digests = []
+        size_positions = []
+        pipe = self.client.pipeline(transaction=True)
+        for (alias, data, meta, alias_meta), previous in zip(items, previous_list):
+            digest = content_hash(data)
+            digests.append(digest)
+            alias_key = self.alias_key(namespace, alias)
+
+            size_positions.append(len(pipe))
+            pipe.hsetnx(self.sizes_key, digest, len(data))
+            pipe.set(self.blob_key(digest), data, ex=ttl, nx=True)
+            pipe.expire(self.blob_key(digest), ttl, gt=True)
+            blob_meta = {key: '' if value is None else value for key, value in (meta or {}).items()}
+            blob_meta['size'] = len(data)
+            for field, value in blob_meta.items():
+                pipe.hsetnx(self.meta_key(digest), field, value)
+            if previous != digest:
+                pipe.hincrby(self.meta_key(digest), 'refcount', 1)
+            else:
+                # 别名未变，只在数据被淘汰后重新写入时补上引用
+                pipe.hsetnx(self.meta_key(digest), 'refcount', 1)
+            # 新建的元信息先设置过期时间，已有的只延长不缩短
+            pipe.expire(self.meta_key(digest), ttl, nx=True)
+            pipe.expire(self.meta_key(digest), ttl, gt=True)
+
+            pipe.delete(alias_key)
+            mapping = {key: '' if value is None else value for key, value in (alias_meta or {}).items()}
+            mapping['sha256'] = digest
+            pipe.hset(alias_key, mapping=mapping)
+            pipe.expire(alias_key, ttl)
+            pipe.zadd(self.lru_key, {digest: time.time()})
+        results = pipe.execute()
+
+        # 首次登记大小的数据计入总容量（已过期但尚未清理的数据仍有记录，重新写入时不再计入）
+        added = sum(len(data) for (alias, data, *_), position in zip(items, size_positions) if results[position])
+        if added:
+            total = self.client.hincrby(self.stats_key, 'bytes', added)
+            if total > self.max_bytes:
+                self.evict()
+
+        for digest, previous in zip(digests, previous_list):
+            if previous and previous != digest:
+                self.release(previous)
+        return digests
+
+    def resolve(self, namespace, alias):
+        """别名 -> sha256，不存在时返回 None"""
+        return self.resolve_many(namespace, [alias])[0]
+
+    def resolve_many(self, namespace, aliases):
+        """一次往返批量解析别名"""
+        pipe = self.client.pipeline(transaction=False)
+        for alias in aliases:
+            pipe.hget(self.alias_key(namespace, alias), 'sha256')
+        return [digest.decode('utf-8') if digest else None for digest in pipe.execute()]
+
+    def exists_many(self, namespace, aliases, digests):
+        """一次往返确认别名及其指向的数据都还存在（别名可能已过期，数据可能已被淘汰），按顺序返回布尔值列表"""
+        pipe = self.client.pipeline(transaction=False)
+        for alias, digest in zip(aliases, digests):
+            pipe.exists(self.alias_key(namespace, alias), self.blob_key(digest))
+        return [count == 2 for count in pipe.execute()]
+
+    def get_alias_meta_many(self, namespace, aliases):
+        """
+        批量获取别名对应的完整信息（数据元信息 + 别名信息，不含数据），
+        别名不存在或数据已被淘汰时对应位置为 None
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for alias in aliases:
+            pipe.hgetall(self.alias_key(namespace, alias))
+        alias_metas = [self._decode(raw) if raw else None for raw in pipe.execute()]
+
+        found = [index for index, alias_meta in enumerate(alias_metas) if alias_meta]
+        results = [None] * len(aliases)
+        if not found:
+            return results
+        pipe = self.client.pipeline(transaction=False)
+        for index in found:
+            pipe.hgetall(self.meta_key(alias_metas[index]['sha256']))
+        for index, raw in zip(found, pipe.execute()):
+            if raw:
+                meta = self._decode(raw)
+                meta.update(alias_metas[index])
+                results[index] = meta
+        return results
+
+    def get(self, digest):
+        """按 sha256 取数据，返回 (原始字节, 元信息)，不存在时返回 (None, None)"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(self.blob_key(digest))
+        pipe.hgetall(self.meta_key(digest))
+        pipe.zadd(self.lru_key, {digest: time.time()}, xx=True)
+        data, raw_meta, _ = pipe.execute()
+        if data is None:
+            return None, None
+        return data, self._decode(raw_meta) if raw_meta else {}
+
+    def get_by_alias(self, namespace, alias):
+        """按别名取数据，返回 (原始字节, 元信息)"""
+        digest = self.resolve(namespace, alias)
+        if not digest:
+            return None, None
+        return self.get(digest)
+
+    def delete_alias(self, namespace, alias):
+        """删除别名并释放它对数据的引用"""
+        alias_key = self.alias_key(namespace, alias)
+        digest = self.client.hget(alias_key, 'sha256')
+        if not digest:
+            return False
+        self.client.delete(alias_key)
+        self.release(digest.decode('utf-8'))
+        return True
+
+    def release(self, digest):
+        """引用减一，归零时删除数据"""
+        refcount = self.client.hincrby(self.meta_key(digest), 'refcount', -1)
+        if refcount <= 0:
+            self._drop(digest)
+
+    def evict(self):
+        """超出容量时按最近最少访问淘汰数据，直到总大小回到上限以内"""
+        evicted = 0
+        total = int(self.client.hget(self.stats_key, 'bytes') or 0)
+        while total > self.max_bytes:
+            oldest = self.client.zrange(self.lru_key, 0, self.evict_batch - 1)
+            if not oldest:
+                break
+            for digest in oldest:
+                total -= self._drop(digest.decode('utf-8'))
+                evicted += 1
+                if total <= self.max_bytes:
+                    break
+        if evicted:
+            logger.info(f"对象存储超出容量，淘汰了 {evicted} 个数据")
+        return evicted
+
+    def sweep(self, batch_size=500):
+        """
+        清理已自然过期的数据在容量统计和 LRU 中残留的记录，返回清理数量。
+        别名自然过期时引用不会减少，这里同时按现存别名重建引用计数，已没有别名引用的数据一并删除。
+        """
+        started = time.time()
+        refcounts = Counter()
+        alias_keys = list(self.client.scan_iter(match=self.alias_key('*', '*'), count=batch_size))
+        for offset in range(0, len(alias_keys), batch_size):
+            pipe = self.client.pipeline(transaction=False)
+            for key in alias_keys[offset:offset + batch_size]:
+                pipe.hget(key, 'sha256')
+            refcounts.update(digest.decode('utf-8') for digest in pipe.execute() if digest)
+
+        # 只处理本轮开始前写入或访问过的数据，之后写入的别名可能没有被扫描到
+        digests = [digest.decode('utf-8') for digest in self.client.zrangebyscore(self.lru_key, '-inf', started)]
+        removed = 0
+        for offset in range(0, len(digests), batch_size):
+            batch = digests[offset:offset + batch_size]
+            pipe = self.client.pipeline(transaction=False)
+            for digest in batch:
+                pipe.exists(self.blob_key(digest))
+            alive = pipe.execute()
+
+            pipe = self.client.pipeline(transaction=False)
+            for digest, exists in zip(batch, alive):
+                if exists and refcounts[digest]:
+                    pipe.hset(self.meta_key(digest), 'refcount', refcounts[digest])
+                else:
+                    self._drop(digest)
+                    removed += 1
+            pipe.execute()
+        return removed
+
+    def get_stats(self):
+        """获取对象存储统计：数据个数和总字节数"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zcard(self.lru_key)
+        pipe.hget(self.stats_key, 'bytes')
+        count, total = pipe.execute()
+        return {
+            'blobs': count,
+            'total_bytes': int(total or 0),
+            'max_bytes': self.max_bytes,
+        }
+
+    def _drop(self, digest):
+        """删除数据及其元信息，并更新容量统计（数据可能已经过期），返回释放的字节数"""
+        size = self.client.hget(self.sizes_key, digest)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.blob_key(digest), self.meta_key(digest))
+        pipe.zrem(self.lru_key, digest)
+        pipe.hdel(self.sizes_key, digest)
+        if size:
+            pipe.hincrby(self.stats_key, 'bytes', -int(size))
+        pipe.execute()
+        return int(size or 0)
+
+    def _decode(self, raw):
+        meta = {key.decode('utf-8'): value.decode('utf-8') for key, value in raw.items()}
+        for field in INT_FIELDS:
+            if meta.get(field):
+                meta[field] = int(meta[field])
+        return meta
+
+
+class FileBlobStore:
+    """文件系统内容寻址存储：相同内容只保存一份文件"""
+
+    def __init__(self, base_dir='blobs', storage=None):
+        self.base_dir = base_dir
+        self.storage = storage or default_storage
+
+    def path_for(self, digest, extension=''):
+        return f"{self.base_dir}/{digest[:2]}/{digest}{extension.lower()}"
+
+    def put(self, data, extension=''):
+        """保存数据，返回 (sha256, 相对存储路径)；内容已存在时直接复用"""
+        digest = content_hash(data)
+        path = self.path_for(digest, extension)
+        if not self.storage.exists(path):
+            saved_path = self.storage.save(path, ContentFile(data))
+            if saved_path != path:
+                # 并发写入同一内容时存储会自动改名，保留先写入的那一份
+                self.storage.delete(saved_path)
+        return digest, path
+
+    def delete(self, path):
+        """删除文件（调用方需确认已无引用）"""
+        if self.storage.exists(path):
+            self.storage.delete(path)
+            return True
+        return False
+
+    def full_path(self, path):
+        return os.path.join(self.storage.location, path)
+
+
+# 全局对象存储实例
+blob_store = RedisBlobStore()
@@ -0,0 +1,230 @@
+"""
+无头浏览器池
+复用预热好的 Chrome 实例，按租约分配标签页，避免每个页面都冷启动一次 Chrome
+"""
+
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+
+from .config import BROWSER_POOL_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPoolError(Exception):
+    """浏览器池异常（如租约等待超时）"""
+
+
+class _PooledDriver:
+    """池中的一个 Chrome 实例"""
+
+    def __init__(self, driver, user_data_dir):
+        self.driver = driver
+        self.user_data_dir = user_data_dir
+        self.base_handle = driver.current_window_handle
+        self.pages_served = 0
+
+
+class BrowserPool:
+    """无头浏览器池：预热、租借、按页数或崩溃回收"""
+
+    def __init__(self, size=None, max_pages_per_driver=None, lease_timeout=None):
+        self.size = size or BROWSER_POOL_CONFIG['size']
+        self.max_pages_per_driver = max_pages_per_driver or BROWSER_POOL_CONFIG['max_pages_per_driver']
+        self.lease_timeout = lease_timeout or BROWSER_POOL_CONFIG['lease_timeout']
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {
+            'drivers_started': 0,
+            'driver_restarts': 0,
+            'driver_crashes': 0,
+            'leases': 0,
+            'lease_wait_total': 0.0,
+            'lease_wait_max': 0.0,
+        }
+
+    def _build_options(self, user_data_dir):
+        """构建 Chrome 启动参数"""
+        chrome_options = Options()
+        chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--window-size=1920,1080")
+        chrome_options.add_argument("--disable-extensions")  # 禁用所有扩展
+        chrome_options.add_argument("--disable-infobars")  # 禁用信息栏
+        chrome_options.add_argument("--disable-notifications")  # 禁用通知
+        chrome_options.add_argument("--disable-logging")  # 禁用日志记录
+        chrome_options.add_argument("--log-level=3")  # 设置日志级别为最高（最少日志）
+        chrome_options.add_argument("--silent")  # 静默模式
+        chrome_options.add_argument("--ignore-certificate-errors")  # 忽略证书错误
+        chrome_options.add_argument("--disk-cache-size=0")  # 禁用磁盘缓存
+        chrome_options.add_argument("--media-cache-size=0")  # 禁用媒体缓存
+        return chrome_options
+
+    def _start_driver(self):
+        """启动一个新的 Chrome 实例"""
+        user_data_dir = tempfile.mkdtemp()
+        try:
+            driver = webdriver.Chrome(options=self._build_options(user_data_dir))
+        except Exception:
+            shutil.rmtree(user_data_dir, ignore_errors=True)
+            raise
+        with self._lock:
+            self._stats['drivers_started'] += 1
+        return _PooledDriver(driver, user_data_dir)
+
+    def _quit_driver(self, pooled):
+        """关闭 Chrome 实例并清理临时目录"""
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"关闭浏览器失败: {str(e)}")
+        shutil.rmtree(pooled.user_data_dir, ignore_errors=True)
+
+    def warm_up(self, count=None):
+        """预热指定数量的浏览器实例（默认填满整个池）"""
+        count = min(count or self.size, self.size)
+        while True:
+            with self._lock:
+                if self._created >= count:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._start_driver())
+            except Exception as e:
+                with self._lock:
+                    self._created -= 1
+                logger.error(f"预热浏览器失败: {str(e)}")
+                return
+
+    def _checkout(self):
+        """取出一个空闲实例；池未满时新建，池已满时等待归还"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._start_driver()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.lease_timeout)
+        except queue.Empty:
+            raise BrowserPoolError(f"等待浏览器超时（{self.lease_timeout}秒）")
+
+    def _reset_tabs(self, pooled):
+        """关闭租约期间打开的所有标签页，回到基础标签页。实例不可用时抛出异常"""
+        driver = pooled.driver
+        for handle in driver.window_handles:
+            if handle != pooled.base_handle:
+                driver.switch_to.window(handle)
+                driver.close()
+        driver.switch_to.window(pooled.base_handle)
+
+    def _checkin(self, pooled, crashed):
+        """归还实例：崩溃或达到页数上限时回收重启"""
+        recycle = crashed or pooled.pages_served >= self.max_pages_per_driver
+        if not recycle:
+            try:
+                self._reset_tabs(pooled)
+            except Exception as e:
+                logger.warning(f"浏览器实例状态异常，准备回收: {str(e)}")
+                crashed = recycle = True
+
+        if not recycle:
+            self._idle.put(pooled)
+            return
+
+        self._quit_driver(pooled)
+        with self._lock:
+            self._stats['driver_restarts'] += 1
+            if crashed:
+                self._stats['driver_crashes'] += 1
+        try:
+            self._idle.put(self._start_driver())
+        except Exception as e:
+            logger.error(f"重启浏览器失败: {str(e)}")
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def lease(self):
+        """
+        租借一个浏览器，每次租约都在新标签页中进行
+
+        用法:
+            with pool.lease() as driver:
+                driver.get(url)
+        """
+        wait_started = time.monotonic()
+        pooled = self._checkout()
+        waited = time.monotonic() - wait_started
+        with self._lock:
+            self._stats['leases'] += 1
+            self._stats['lease_wait_total'] += waited
+            self._stats['lease_wait_max'] = max(self._stats['lease_wait_max'], waited)
+
+        crashed = False
+        try:
+            pooled.driver.switch_to.new_window('tab')
+        except WebDriverException:
+            self._checkin(pooled, crashed=True)
+            raise
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            crashed = not self._is_alive(pooled)
+            raise
+        finally:
+            pooled.pages_served += 1
+            self._checkin(pooled, crashed)
+
+    def _is_alive(self, pooled):
+        """检查实例是否仍可响应"""
+        try:
+            pooled.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        """关闭池中所有空闲实例（应在所有租约归还后调用，之后再次租借会重新启动实例）"""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit_driver(pooled)
+            with self._lock:
+                self._created -= 1
+
+    def get_stats(self):
+        """获取浏览器池指标：租约等待时间、实例重启次数等"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['active_drivers'] = self._created
+        stats['lease_wait_avg'] = round(stats['lease_wait_total'] / stats['leases'], 4) if stats['leases'] else 0.0
+        stats['lease_wait_total'] = round(stats['lease_wait_total'], 4)
+        stats['lease_wait_max'] = round(stats['lease_wait_max'], 4)
+        return stats
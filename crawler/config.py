@@ -0,0 +1,82 @@
+# 爬虫应用配置
+import os
+
+# 抓取引擎配置
+CRAWLER_CONFIG = {
+    'backend': os.environ.get('CRAWLER_BACKEND', 'threaded'),  # 每日爬取后端: threaded(线程池) / async(aiohttp 流水线)
+    'max_workers': int(os.environ.get('CRAWLER_MAX_WORKERS', 4)),  # 并发抓取的文章数
+    'per_host_concurrency': int(os.environ.get('CRAWLER_PER_HOST_CONCURRENCY', 2)),  # 同一主机的最大并发请求数
+    'per_host_min_interval': float(os.environ.get('CRAWLER_PER_HOST_MIN_INTERVAL', 0.5)),  # 同一主机相邻请求的最小间隔(秒)
+    'http_timeout': float(os.environ.get('CRAWLER_HTTP_TIMEOUT', 15)),  # HTTP 抓取超时时间(秒)
+    'http_cache_ttl': 86400 * 2,  # 条件请求所用缓存（校验器和文章主体）的过期时间 2天
+    'save_batch_size': int(os.environ.get('CRAWLER_SAVE_BATCH_SIZE', 10)),  # 攒够多少篇文章批量写入一次Redis
+}
+
+# 无头浏览器池配置
+BROWSER_POOL_CONFIG = {
+    'size': int(os.environ.get('CRAWLER_BROWSER_POOL_SIZE', 2)),  # 常驻 Chrome 实例数
+    'max_pages_per_driver': int(os.environ.get('CRAWLER_BROWSER_MAX_PAGES', 50)),  # 每个实例服务多少页面后回收重启
+    'lease_timeout': float(os.environ.get('CRAWLER_BROWSER_LEASE_TIMEOUT', 120)),  # 等待空闲实例的超时时间(秒)
+}
+
+# 异步流水线配置（CRAWLER_BACKEND=async 时使用）
+ASYNC_PIPELINE_CONFIG = {
+    'queue_size': int(os.environ.get('CRAWLER_ASYNC_QUEUE_SIZE', 16)),  # 各阶段之间有界队列的容量
+    'fetch_workers': int(os.environ.get('CRAWLER_ASYNC_FETCH_WORKERS', 8)),  # 文章抓取协程数
+    'parse_workers': int(os.environ.get('CRAWLER_ASYNC_PARSE_WORKERS', 2)),  # 解析协程数（解析在线程池中执行）
+    'image_workers': int(os.environ.get('CRAWLER_ASYNC_IMAGE_WORKERS', 4)),  # 图片下载协程数（按文章）
+    'image_concurrency': int(os.environ.get('CRAWLER_ASYNC_IMAGE_CONCURRENCY', 8)),  # 同时下载的图片总数
+    'connection_limit': int(os.environ.get('CRAWLER_ASYNC_CONNECTION_LIMIT', 32)),  # aiohttp 连接池上限
+}
+
+# 图片批量入库配置
+IMAGE_INGEST_CONFIG = {
+    'max_workers': int(os.environ.get('CRAWLER_IMAGE_WORKERS', 8)),  # 并发下载图片的线程数
+    'pool_size': int(os.environ.get('CRAWLER_IMAGE_POOL_SIZE', 8)),  # 图片下载连接池大小
+    'timeout': float(os.environ.get('CRAWLER_IMAGE_TIMEOUT', 30)),  # 单张图片下载超时时间(秒)
+    'memo_size': int(os.environ.get('CRAWLER_IMAGE_MEMO_SIZE', 4096)),  # 进程内记住的已缓存图片URL数量（跨文章去重）
+}
+
+# 内容寻址对象存储配置（爬虫图片与AI对话图片共用）
+BLOB_STORE_CONFIG = {
+    'max_bytes': int(os.environ.get('BLOB_STORE_MAX_BYTES', 512 * 1024 * 1024)),  # Redis 中数据总大小上限，超出后按 LRU 淘汰
+    'evict_batch': 20,  # 每轮淘汰的数据个数
+    'default_ttl': 86400 * 7,  # 默认过期时间 7天
+}
+
+# 图片衍生版本（缩放/转码）配置
+IMAGE_DERIVATIVE_CONFIG = {
+    'widths': [160, 320, 480, 640, 960, 1280, 1920],  # 允许的输出宽度，请求宽度向上取到最近的一档，减少版本数量
+    'default_quality': 80,  # 默认压缩质量
+    'max_quality': 95,
+    'max_pixels': 40 * 1000 * 1000,  # 超过该像素数的原图不做处理，直接返回原图
+    'max_bytes': int(os.environ.get('IMAGE_DERIVATIVE_MAX_BYTES', 128 * 1024 * 1024)),  # 衍生版本缓存的容量上限，与原图分开淘汰
+    'ttl': 86400 * 3,  # 衍生版本缓存过期时间 3天
+}
+
+# 今日要闻列表页发现配置
+LIST_DISCOVERY_CONFIG = {
+    # 按日期命名的列表页地址模板（日历中日期链接指向的页面），置空则跳过该方式
+    'archive_url_template': os.environ.get('CRAWLER_ARCHIVE_URL_TEMPLATE', 'http://www.people.com.cn/GB/59476/review/{date:%Y%m%d}.html'),
+    'http_timeout': float(os.environ.get('CRAWLER_DISCOVERY_TIMEOUT', 10)),  # 列表页 HTTP 请求超时时间(秒)
+    'browser_fallback': True,  # HTTP 方式都失败时是否回退到浏览器点击日历
+}
+
+# 文章全文检索配置
+SEARCH_INDEX_CONFIG = {
+    'retention_days': int(os.environ.get('SEARCH_INDEX_RETENTION_DAYS', 30)),  # 索引覆盖的天数，独立于文章数据的过期时间
+    'title_weight': 5,  # 标题命中的额外权重
+    'max_stored_chars': 20000,  # 每篇文章保存用于生成摘要的正文长度
+    'snippet_length': 120,  # 高亮摘要长度
+    'page_size': 10,
+    'max_page_size': 50,
+    'result_cache_ttl': 60,  # 查询结果缓存时间(秒)，翻页时不再重复求交集
+}
+
+# 文章归档配置（Redis 中的旧文章转存到磁盘）
+ARTICLE_ARCHIVE_CONFIG = {
+    'root': os.environ.get('CRAWLER_ARCHIVE_DIR'),  # 归档目录，默认为项目目录下的 archive/articles
+    'compress_level': 6,  # zlib 压缩级别
+    'index_cache_size': 32,  # 进程内缓存的每日索引数量
+    'max_range_days': 31,  # 按日期范围查询时允许的最大天数
+}
@@ -0,0 +1,92 @@
+"""
+增量爬取登记表
+按天记录已入库文章的 URL 指纹和正文哈希，重复运行或当天刷新时只抓取新链接或内容有变化的文章：
+    crawl_registry:{日期}   哈希，URL 指纹 -> {"id": 文章ID, "content_hash": 正文哈希}
+    crawl_links:{日期}      当天列表页发现的链接（检查点），崩溃后重跑直接从这里继续，不必重新打开列表页
+登记与文章保存在同一个事务中写入，每批文章保存成功即是一个检查点。
+"""
+
+import json
+import hashlib
+import logging
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from django.utils import timezone
+
+from .utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# 不影响页面内容的追踪参数，计算指纹时忽略
+TRACKING_PARAMS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'spm', 'from')
+
+# 登记表保留时间，与文章数据一致
+REGISTRY_TTL = 86400 * 2
+
+
+def url_fingerprint(url):
+    """规范化 URL（补全相对地址、忽略协议/大小写/锚点/追踪参数、参数排序）后取 MD5"""
+    parts = urlsplit(normalize_url(url.strip()))
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if key not in TRACKING_PARAMS)
+    canonical = urlunsplit(('', parts.netloc.lower(), parts.path or '/', urlencode(query), ''))
+    return hashlib.md5(canonical.encode('utf-8')).hexdigest()
+
+
+def content_hash(article_data):
+    """文章标题和正文的哈希，用于判断文章是否被修改"""
+    text = f"{article_data.get('title') or ''}\n{article_data.get('content') or ''}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class CrawlRegistry:
+    """基于 Redis 哈希的 URL 指纹登记表"""
+
+    def __init__(self, service):
+        """
+        Args:
+            service: RedisService 实例（使用其文本客户端）
+        """
+        self.service = service
+
+    @property
+    def client(self):
+        return self.service.redis_client
+
+    def _date(self, date):
+        return date or timezone.localdate().isoformat()
+
+    def queue_mark(self, pipe, article_data, date=None):
+        """把文章登记加入保存文章的 pipeline"""
+        if not article_data.get('url') or article_data.get('crawl_status') != 'success':
+            return
+        key = f"crawl_registry:{self._date(date)}"
+        pipe.hset(key, url_fingerprint(article_data['url']), json.dumps({
+            'id': article_data['id'],
+            'content_hash': content_hash(article_data),
+        }))
+        pipe.expire(key, REGISTRY_TTL)
+
+    def lookup(self, urls, date=None):
+        """批量查询 URL 的登记信息，按顺序返回（未登记的为 None）"""
+        if not urls:
+            return []
+        values = self.client.hmget(f"crawl_registry:{self._date(date)}", [url_fingerprint(url) for url in urls])
+        return [json.loads(value) if value else None for value in values]
+
+    def count(self, date=None):
+        return self.client.hlen(f"crawl_registry:{self._date(date)}")
+
+    def save_links(self, links, date=None):
+        """保存列表页发现的链接作为检查点"""
+        key = f"crawl_links:{self._date(date)}"
+        self.client.set(key, json.dumps(links, ensure_ascii=False), ex=REGISTRY_TTL)
+
+    def load_links(self, date=None):
+        """读取检查点中的链接，不存在时返回 None"""
+        raw = self.client.get(f"crawl_links:{self._date(date)}")
+        return json.loads(raw) if raw else None
+
+    def clear(self, date=None):
+        """清除当天的登记和检查点，下次运行将重新抓取全部文章"""
+        date = self._date(date)
+        return self.client.delete(f"crawl_registry:{date}", f"crawl_links:{date}")
@@ -0,0 +1,329 @@
+"""
+文章页提取引擎
+每个页面只用 lxml 解析一次，后续步骤共用同一棵树：
+    locate_article        按 <!--内容--> / <!--结束正文--> 注释定位文章主体元素
+    ArticleExtractor      在文章主体上遍历一次，同时收集标题、来源、分类导航和正文容器候选，
+                          再遍历正文容器生成文本，同时把图片替换为占位符，返回结构化的提取结果
+提取规则与原 BeautifulSoup 实现一致（正文按文本节点分行，与原先 prettify 后再解析的结果相同）。
+"""
+
+import re
+import logging
+from datetime import datetime
+from urllib.parse import urljoin
+
+import lxml.html
+from lxml import etree
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 正文容器，按优先级排列：(属性, 值)
+CONTENT_SELECTORS = (
+    ('class', 'main'),
+    ('class', 'rm_txt_con'),
+    ('class', 'content'),
+    ('class', 'article-content'),
+    ('id', 'content'),
+    ('class', 'article-body'),
+    ('class', 'post-content'),
+    ('class', 'entry-content'),
+)
+
+# 正文中需要移除的元素
+UNWANTED_CLASSES = {'edit', 'paper_num', 'share', 'ad'}
+UNWANTED_TAGS = {'script', 'style'}
+
+# 找不到正文容器时，用于判断大段文本是否为文章内容的关键词
+CONTENT_KEYWORDS = ('习近平', '中国', '发展', '经济', '政治', '社会', '建设', '改革')
+
+CATEGORIES = ("经济·科技", "文旅·体育", "社会·法治", "国际", "时政", "军事", "健康·生活", "教育")
+
+# URL 路径 -> 分类
+URL_CATEGORIES = (
+    ('/finance/', "经济·科技"),
+    ('/ent/', "文旅·体育"),
+    ('/society/', "社会·法治"),
+    ('/world/', "国际"),
+    ('/politics/', "时政"),
+    ('/military/', "军事"),
+    ('/health/', "健康·生活"),
+    ('/edu/', "教育"),
+)
+
+SOURCE_PATTERNS = (
+    re.compile(r'来源：(.+?)(?:\s|$)'),
+    re.compile(r'来源:<a[^>]*>([^<]+)</a>'),
+)
+
+DATE_PATTERNS = (
+    re.compile(r'(\d{4}年\d{1,2}月\d{1,2}日\d{1,2}:\d{1,2})'),
+    re.compile(r'(\d{4}-\d{1,2}-\d{1,2}\s+\d{1,2}:\d{1,2})'),
+    re.compile(r'(\d{4}/\d{1,2}/\d{1,2}\s+\d{1,2}:\d{1,2})'),
+)
+
+
+def _classes(element):
+    return (element.get('class') or '').split()
+
+
+def _has_ancestor_class(element, root, names):
+    """element 在 root 之内（不含 root 之外）的祖先是否带有指定 class"""
+    for ancestor in element.iterancestors():
+        if names.intersection(_classes(ancestor)):
+            return True
+        if ancestor is root:
+            return False
+    return False
+
+
+def _stripped_text(element):
+    """等同 BeautifulSoup 的 get_text(strip=True)"""
+    return ''.join(text.strip() for text in element.itertext())
+
+
+def _text_nodes(element, skip=None, replace=None):
+    """
+    按文档顺序产出元素内的文本节点（不含注释）
+
+    Args:
+        skip: skip(子元素) 为真时跳过整个子树（保留其后的文本）
+        replace: replace(子元素) 返回字符串时用它代替整个子树
+    """
+    if element.text:
+        yield element.text
+    for child in element:
+        if isinstance(child.tag, str) and not (skip and skip(child)):
+            replacement = replace(child) if replace else None
+            if replacement is not None:
+                yield replacement
+            else:
+                yield from _text_nodes(child, skip, replace)
+        if child.tail:
+            yield child.tail
+
+
+def parse_date_string(date_str):
+    """解析日期字符串，无法解析时返回当前时间"""
+    try:
+        # 处理中文日期格式 2025年09月01日06:56
+        if '年' in date_str and '月' in date_str and '日' in date_str:
+            date_str = re.sub(r'年|月', '-', date_str).replace('日', ' ')
+            return datetime.strptime(date_str, '%Y-%m-%d %H:%M')
+
+        for fmt in ('%Y-%m-%d %H:%M', '%Y/%m/%d %H:%M', '%Y-%m-%d', '%Y/%m/%d'):
+            try:
+                return datetime.strptime(date_str, fmt)
+            except ValueError:
+                continue
+        return timezone.now()
+
+    except Exception:
+        return timezone.now()
+
+
+def image_candidates(src):
+    """生成图片的候选下载地址（按顺序尝试）"""
+    # 如果是本地文件的相对路径，尝试转换为可用的URL
+    if src.startswith('./') and '_files/' in src:
+        filename = src.split('/')[-1]
+
+        if filename.startswith('MAIN'):
+            # MAIN开头的文件，通常是NMediaFile路径
+            constructed_url = f"http://www.people.com.cn/NMediaFile/2022/0801/{filename}"
+        elif filename.isdigit() or len(filename.split('.')[0]) > 10:
+            # 纯数字或长文件名，通常是mediafile/pic路径
+            constructed_url = f"http://www.people.com.cn/mediafile/pic/BIG/20250901/{filename}"
+        else:
+            # 其他文件，尝试paper.people.com.cn路径
+            constructed_url = f"http://paper.people.com.cn/rmrb/pc/pic/202509/01/{filename}"
+
+        logger.debug(f"本地相对路径转换: {src} -> {constructed_url}")
+        candidates = [constructed_url]
+        if filename.startswith('MAIN'):
+            candidates.append(f"http://www.people.com.cn/mediafile/pic/{filename}")
+        return candidates
+
+    return [src]
+
+
+def locate_article(page_source):
+    """
+    解析整页HTML并定位文章主体元素，失败时返回 None
+
+    策略 1: '<!--内容-->' 注释之后第一个 div 的第一个子 div
+    策略 2: '<!--结束正文-->' 注释之前紧邻的 div
+    """
+    if not page_source or not page_source.strip():
+        return None
+    try:
+        doc = lxml.html.fromstring(page_source)
+    except (etree.ParserError, ValueError) as e:
+        logger.warning(f"解析文章页HTML失败: {str(e)}")
+        return None
+
+    start = end = None
+    for comment in doc.iter(etree.Comment):
+        marker = (comment.text or '').strip()
+        if marker == '内容' and start is None:
+            start = comment
+        elif marker == '结束正文' and end is None:
+            end = comment
+
+    if start is not None:
+        wrapper = next((sibling for sibling in start.itersiblings() if sibling.tag == 'div'), None)
+        if wrapper is not None:
+            article = next((child for child in wrapper if child.tag == 'div'), None)
+            if article is not None:
+                logger.debug("通过 '<!--内容-->' (策略1) 定位到文章主体")
+                return article
+
+    if end is not None:
+        article = next((sibling for sibling in end.itersiblings(preceding=True) if sibling.tag == 'div'), None)
+        if article is not None:
+            logger.debug("通过 '<!--结束正文-->' (策略2) 定位到文章主体")
+            return article
+
+    logger.warning("所有提取策略均失败，未能定位到文章内容")
+    return None
+
+
+class ArticleExtractor:
+    """在文章主体元素上提取各字段"""
+
+    def __init__(self, base_url="http://www.people.com.cn"):
+        self.base_url = base_url
+
+    def extract(self, article, link_info):
+        """
+        提取文章字段、正文和待下载的图片
+
+        Args:
+            article: locate_article 返回的文章主体元素
+            link_info: {'title', 'url'}，标题提取失败时使用其中的标题
+
+        Returns:
+            {'fields': {url, title, source, publish_date, category}, 'text': 带图片占位符的正文, 'image_jobs': [...]}
+        """
+        url = link_info['url']
+        h1s, titles, sources, nav_links, divs = [], [], [], [], []
+        containers = [None] * len(CONTENT_SELECTORS)
+
+        # 一次遍历收集所有字段需要的元素
+        for element in article.iter(etree.Element):
+            tag = element.tag
+            classes = _classes(element)
+            if tag == 'h1':
+                h1s.append(element)
+            elif tag == 'title':
+                titles.append(element)
+            elif tag == 'div':
+                divs.append(element)
+            elif tag == 'a' and _has_ancestor_class(element, article, {'route', 'breadcrumb'}):
+                nav_links.append(element)
+            if 'source' in classes or ('col-1-1' in classes and _has_ancestor_class(element, article, {'channel'})):
+                sources.append(element)
+            for index, (attr, value) in enumerate(CONTENT_SELECTORS):
+                if containers[index] is None and (value in classes if attr == 'class' else element.get(attr) == value):
+                    containers[index] = element
+
+        content_element = next((element for element in containers if element is not None), None)
+        if content_element is None:
+            content_element = self._find_content_by_text(divs)
+
+        # 先处理正文（跳过无关元素、图片替换为占位符），与原实现的顺序一致
+        text, image_jobs = self._render_text(content_element)
+        fields = {
+            'url': url,
+            'title': self._title(article, h1s, titles, link_info['title']),
+            'source': self._source(sources),
+            'publish_date': self._publish_date(article),
+            'category': self._category(url, nav_links),
+        }
+        return {'fields': fields, 'text': text, 'image_jobs': image_jobs}
+
+    def _title(self, article, h1s, titles, fallback_title):
+        candidates = (
+            h1s[0] if h1s else None,
+            next((h1 for h1 in h1s if _has_ancestor_class(h1, article, {'rm_txt_con'})), None),
+            titles[0] if titles else None,
+        )
+        for element in candidates:
+            if element is None:
+                continue
+            title = _stripped_text(element)
+            if title and not title.endswith('--人民网'):
+                return title.replace('--人民网', '').replace('--文旅·体育--人民网', '').replace('--经济·科技--人民网', '').strip()
+        return fallback_title
+
+    def _source(self, sources):
+        for element in sources:
+            text = '\n'.join(element.itertext())
+            for pattern in SOURCE_PATTERNS:
+                match = pattern.search(text)
+                if match:
+                    return match.group(1).strip()
+        return "人民网"
+
+    def _publish_date(self, article):
+        try:
+            page_text = '\n'.join(_text_nodes(article, skip=lambda element: element.tag in UNWANTED_TAGS))
+            for pattern in DATE_PATTERNS:
+                match = pattern.search(page_text)
+                if match:
+                    return parse_date_string(match.group(1))
+            return timezone.now()
+
+        except Exception as e:
+            logger.warning(f"提取发布时间失败: {str(e)}")
+            return timezone.now()
+
+    def _category(self, url, nav_links):
+        for pattern, category in URL_CATEGORIES:
+            if pattern in url:
+                return category
+        for link in nav_links:
+            nav_text = _stripped_text(link)
+            if nav_text in CATEGORIES:
+                return nav_text
+        return "综合"
+
+    def _find_content_by_text(self, divs):
+        """找不到正文容器时，取第一个文本足够长且包含常见关键词的 div"""
+        for div in divs:
+            text = _stripped_text(div)
+            if len(text) > 500 and any(keyword in text for keyword in CONTENT_KEYWORDS):
+                return div
+        return None
+
+    def _render_text(self, content_element):
+        """生成带图片占位符的正文：按文本节点分行，保留长度大于 5 的行"""
+        if content_element is None:
+            return "", []
+        image_jobs = []
+
+        def skip(element):
+            return element.tag in UNWANTED_TAGS or bool(UNWANTED_CLASSES.intersection(_classes(element)))
+
+        def replace(element):
+            if element.tag != 'img' or not element.get('src'):
+                return None
+            src = element.get('src')
+            if not src.startswith('http'):
+                src = urljoin(self.base_url, src)
+            placeholder = f"__IMAGE_PLACEHOLDER_{len(image_jobs)}__"
+            image_jobs.append({
+                'placeholder': placeholder,
+                'src': src,
+                'alt': element.get('alt') or "图片",
+                'candidates': image_candidates(src),
+            })
+            return placeholder
+
+        lines = []
+        for text in _text_nodes(content_element, skip, replace):
+            for line in text.split('\n'):
+                line = line.strip()
+                if len(line) > 5:
+                    lines.append(line)
+        return '\n\n'.join(lines), image_jobs
@@ -0,0 +1,152 @@
+"""
+图片衍生版本服务
+按查询参数 w（宽度）、q（质量）、fmt（webp/jpeg/auto）对原图缩放和转码，并根据 Accept 请求头协商输出格式。
+生成的版本缓存在独立的对象存储中（前缀 derivative），拥有自己的容量上限，不会挤占原图缓存。
+"""
+
+import logging
+from io import BytesIO
+from PIL import Image, ImageOps
+
+from .blob_store import RedisBlobStore
+from .config import IMAGE_DERIVATIVE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# fmt 参数 -> (Pillow 格式, content_type)
+OUTPUT_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+class DerivativeSpec:
+    """一次请求需要的衍生版本参数"""
+
+    def __init__(self, width=None, quality=None, fmt=None):
+        self.width = width
+        self.quality = quality
+        self.fmt = fmt
+
+    @property
+    def key(self):
+        return f"w{self.width or 0}-q{self.quality}-{self.fmt}"
+
+
+class ImageDerivativeService:
+    """图片缩放与转码服务"""
+
+    def __init__(self):
+        self.config = IMAGE_DERIVATIVE_CONFIG
+        self.store = RedisBlobStore(
+            max_bytes=self.config['max_bytes'],
+            prefix='derivative',
+            default_ttl=self.config['ttl'],
+        )
+
+    def negotiate(self, request):
+        """
+        解析查询参数并协商输出格式，未请求任何处理时返回 None（直接返回原图）
+
+        Raises:
+            ValueError: 参数不合法
+        """
+        width = request.GET.get('w')
+        quality = request.GET.get('q')
+        fmt = request.GET.get('fmt', '').lower()
+        if not (width or quality or fmt):
+            return None
+
+        if width:
+            width = int(width)
+            if width <= 0:
+                raise ValueError('w 必须为正整数')
+            # 向上取到最近的一档宽度
+            width = next((w for w in self.config['widths'] if w >= width), self.config['widths'][-1])
+
+        if quality:
+            quality = int(quality)
+            if not 1 <= quality <= 100:
+                raise ValueError('q 必须在 1-100 之间')
+            quality = min(quality, self.config['max_quality'])
+        else:
+            quality = self.config['default_quality']
+
+        if fmt in ('', 'auto'):
+            fmt = 'webp' if 'image/webp' in request.META.get('HTTP_ACCEPT', '') else 'jpeg'
+        elif fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的格式: {fmt}，支持: {', '.join(OUTPUT_FORMATS)}, auto")
+
+        return DerivativeSpec(width=width, quality=quality, fmt=fmt)
+
+    def render(self, source_id, image_bytes, content_type, spec):
+        """
+        获取原图的衍生版本，优先读取缓存
+
+        Args:
+            source_id: 原图的唯一标识（如 crawler:{image_id}），用作缓存别名的一部分
+            image_bytes: 原图数据
+            content_type: 原图类型
+            spec: negotiate 返回的参数
+
+        Returns:
+            (图片数据, content_type)；无法处理时返回原图
+        """
+        alias = f"{source_id}:{spec.key}"
+        try:
+            cached, meta = self.store.get_by_alias('variant', alias)
+            if cached is not None:
+                return cached, meta.get('content_type') or OUTPUT_FORMATS[spec.fmt][1]
+        except Exception as e:
+            logger.warning(f"读取图片衍生版本缓存失败: {str(e)}")
+
+        try:
+            rendered = self._transform(image_bytes, spec)
+        except Exception as e:
+            logger.error(f"生成图片衍生版本失败: {str(e)} - {source_id}")
+            rendered = None
+        if rendered is None:
+            return image_bytes, content_type
+
+        output_type = OUTPUT_FORMATS[spec.fmt][1]
+        try:
+            self.store.put('variant', alias, rendered, meta={'content_type': output_type})
+        except Exception as e:
+            logger.warning(f"缓存图片衍生版本失败: {str(e)}")
+        return rendered, output_type
+
+    def _transform(self, image_bytes, spec):
+        """缩放并转码，动图或超大图片返回 None"""
+        with Image.open(BytesIO(image_bytes)) as img:
+            if getattr(img, 'is_animated', False):
+                return None
+            if img.width * img.height > self.config['max_pixels']:
+                return None
+
+            img = ImageOps.exif_transpose(img)
+            if spec.width and img.width > spec.width:
+                height = max(1, round(img.height * spec.width / img.width))
+                img = img.resize((spec.width, height), Image.LANCZOS)
+
+            pil_format, _ = OUTPUT_FORMATS[spec.fmt]
+            if pil_format == 'JPEG':
+                img = self._flatten(img)
+            elif img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+
+            output = BytesIO()
+            img.save(output, format=pil_format, quality=spec.quality, optimize=pil_format == 'JPEG')
+            return output.getvalue()
+
+    def _flatten(self, img):
+        """JPEG 不支持透明通道，透明部分填充白色背景"""
+        if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            return background
+        return img.convert('RGB')
+
+
+# 全局图片衍生版本服务实例
+image_derivative_service = ImageDerivativeService()
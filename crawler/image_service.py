@@ -1,12 +1,16 @@
 import requests
-import base64
 import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from io import BytesIO
 from urllib.parse import urljoin, urlparse
 from django.conf import settings
-from .redis_service import redis_service
+from requests.adapters import HTTPAdapter
+from .config import IMAGE_INGEST_CONFIG
+from .image_store import BinaryImageStore
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +21,23 @@ class ImageCacheService:
         self.max_image_size = getattr(settings, 'MAX_IMAGE_SIZE', 5 * 1024 * 1024)  # 5MB
         self.supported_formats = ['JPEG', 'PNG', 'GIF', 'WEBP']
         self.cache_expire_time = 86400 * 7  # 7天过期
+        self.store = BinaryImageStore('image', self.cache_expire_time)
+        self.timeout = IMAGE_INGEST_CONFIG['timeout']
+        self.max_workers = IMAGE_INGEST_CONFIG['max_workers']
+        
+        # 共享连接池，避免每张图片都新建连接
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        })
+        adapter = HTTPAdapter(pool_connections=IMAGE_INGEST_CONFIG['pool_size'], pool_maxsize=IMAGE_INGEST_CONFIG['pool_size'])
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # 进程内已缓存图片的记录（URL -> ((image_id, content_type), sha256)），用于跨文章去重，使用前确认数据仍在
+        self._memo = OrderedDict()
+        self._memo_size = IMAGE_INGEST_CONFIG['memo_size']
+        self._memo_lock = threading.Lock()
     
     def download_and_cache_image(self, image_url, base_url=None):
         """下载并缓存图片到Redis"""
@@ -25,130 +46,278 @@ class ImageCacheService:
             if base_url and not image_url.startswith('http'):
                 image_url = urljoin(base_url, image_url)
             
-            # 生成图片的唯一标识
-            image_id = self._generate_image_id(image_url)
-            
             # 检查是否已缓存
-            cached_image = self.get_cached_image(image_id)
-            if cached_image:
+            image_id, content_type = self.find_cached_image(image_url)
+            if image_id:
                 logger.debug(f"图片已缓存: {image_id}")
-                return image_id, cached_image['content_type']
-            
-            # 下载图片
-            logger.info(f"开始下载图片: {image_url}")
-            response = requests.get(
-                image_url,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Referer': base_url or 'http://www.people.com.cn/'
-                },
-                timeout=30,
-                stream=True
-            )
-            
-            if response.status_code != 200:
-                logger.warning(f"图片下载失败，状态码: {response.status_code} - {image_url}")
-                return None, None
-            
-            # 检查内容类型
-            content_type = response.headers.get('content-type', '').lower()
-            if not content_type.startswith('image/'):
-                logger.warning(f"不是有效的图片类型: {content_type} - {image_url}")
-                return None, None
+                return image_id, content_type
             
-            # 检查文件大小
-            content_length = response.headers.get('content-length')
-            if content_length and int(content_length) > self.max_image_size:
-                logger.warning(f"图片文件过大: {content_length} bytes - {image_url}")
+            downloaded = self._download_image(image_url, base_url)
+            if not downloaded:
                 return None, None
+            return self.cache_image_bytes(image_url, *downloaded)
             
-            # 读取图片数据
-            image_data = BytesIO()
-            total_size = 0
-            
-            for chunk in response.iter_content(chunk_size=8192):
-                total_size += len(chunk)
-                if total_size > self.max_image_size:
-                    logger.warning(f"图片文件过大: {total_size} bytes - {image_url}")
-                    return None, None
-                image_data.write(chunk)
-            
-            image_data.seek(0)
-            
-            # 验证图片格式
-            try:
-                with Image.open(image_data) as img:
-                    format_name = img.format
-                    if format_name not in self.supported_formats:
-                        logger.warning(f"不支持的图片格式: {format_name} - {image_url}")
-                        return None, None
-                    
-                    # 获取图片信息
-                    width, height = img.size
-                    logger.debug(f"图片信息: {width}x{height}, {format_name} - {image_url}")
-                    
-            except Exception as e:
-                logger.warning(f"图片格式验证失败: {str(e)} - {image_url}")
+        except Exception as e:
+            logger.error(f"缓存图片时出错: {str(e)} - {image_url}")
+            return None, None
+    
+    def ingest_images(self, image_urls, base_url=None):
+        """
+        批量下载并缓存图片
+        
+        重复的URL只处理一次；已缓存的图片（进程内记录或Redis中已存在）不再下载；
+        其余图片通过共享连接池并发下载，校验通过后用一次 pipeline 写入Redis。
+        
+        Args:
+            image_urls: 图片URL列表（可为相对地址）
+            base_url: 用于补全相对地址和作为 Referer
+            
+        Returns:
+            dict: 原始URL -> (image_id, content_type)，失败的图片为 (None, None)
+        """
+        # 补全地址并去重
+        resolved = {}
+        for url in image_urls:
+            if url and url not in resolved:
+                resolved[url] = urljoin(base_url, url) if base_url and not url.startswith('http') else url
+        unique_urls = list(dict.fromkeys(resolved.values()))
+        
+        results = self._memo_lookup(unique_urls)
+        pending = [url for url in unique_urls if url not in results]
+        
+        # 一次往返检查Redis中已缓存的图片
+        if pending:
+            for url, cached in zip(pending, self._find_cached_images(pending)):
+                if cached:
+                    found, digest = cached
+                    results[url] = found
+                    self._memo_put(url, found, digest)
+            pending = [url for url in pending if url not in results]
+        
+        # 并发下载并校验，结果统一写入
+        entries = []
+        if pending:
+            workers = min(self.max_workers, len(pending))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-ingest') as executor:
+                for url, entry in zip(pending, executor.map(lambda u: self._fetch_cache_entry(u, base_url), pending)):
+                    if entry:
+                        entries.append(entry)
+                    else:
+                        results[url] = (None, None)
+        
+        if entries:
+            digests = self._store_entries(entries)
+            if digests:
+                for entry, digest in zip(entries, digests):
+                    found = (self._generate_image_id(entry['url']), entry['content_type'])
+                    results[entry['url']] = found
+                    self._memo_put(entry['url'], found, digest)
+            else:
+                for entry in entries:
+                    results[entry['url']] = (None, None)
+        
+        return {url: results.get(absolute, (None, None)) for url, absolute in resolved.items()}
+    
+    def find_cached_image(self, image_url):
+        """按图片URL查找已缓存的图片，返回 (image_id, content_type)，未缓存时返回 (None, None)"""
+        known = self._memo_lookup([image_url])
+        if known:
+            return known[image_url]
+        image_id = self._generate_image_id(image_url)
+        cached_image = self.get_cached_image(image_id)
+        if cached_image:
+            found = (image_id, cached_image['content_type'])
+            self._memo_put(image_url, found, cached_image.get('sha256'))
+            return found
+        return None, None
+    
+    def cache_image_bytes(self, image_url, image_bytes, content_type):
+        """校验已下载的图片数据并缓存到Redis，返回 (image_id, content_type)"""
+        try:
+            entry = self._build_cache_entry(image_url, image_bytes, content_type)
+            digests = self._store_entries([entry]) if entry else None
+            if not digests:
                 return None, None
+            found = (self._generate_image_id(image_url), content_type)
+            self._memo_put(image_url, found, digests[0])
+            return found
             
-            # 重置数据流位置
-            image_data.seek(0)
-            
-            # 编码为base64
-            image_base64 = base64.b64encode(image_data.getvalue()).decode('utf-8')
-            
-            # 缓存到Redis
-            image_cache_data = {
-                'url': image_url,
-                'content_type': content_type,
-                'data': image_base64,
-                'size': total_size,
-                'width': width,
-                'height': height,
-                'format': format_name
-            }
-            
-            cache_key = f"image:{image_id}"
-            import json
-            redis_service.redis_client.setex(
-                cache_key, 
-                self.cache_expire_time, 
-                json.dumps(image_cache_data, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"缓存图片时出错: {str(e)} - {image_url}")
+            return None, None
+    
+    def _download_image(self, image_url, base_url=None):
+        """通过共享会话下载图片，返回 (图片数据, content_type)，失败返回 None"""
+        try:
+            logger.info(f"开始下载图片: {image_url}")
+            response = self.session.get(
+                image_url,
+                headers={'Referer': base_url or 'http://www.people.com.cn/'},
+                timeout=self.timeout,
+                stream=True
             )
             
-            logger.info(f"图片缓存成功: {image_id} ({total_size} bytes)")
-            return image_id, content_type
+            with response:
+                if response.status_code != 200:
+                    logger.warning(f"图片下载失败，状态码: {response.status_code} - {image_url}")
+                    return None
+                
+                # 检查内容类型
+                content_type = response.headers.get('content-type', '').lower()
+                if not content_type.startswith('image/'):
+                    logger.warning(f"不是有效的图片类型: {content_type} - {image_url}")
+                    return None
+                
+                # 检查文件大小
+                content_length = response.headers.get('content-length')
+                if content_length and int(content_length) > self.max_image_size:
+                    logger.warning(f"图片文件过大: {content_length} bytes - {image_url}")
+                    return None
+                
+                # 读取图片数据
+                image_data = BytesIO()
+                total_size = 0
+                
+                for chunk in response.iter_content(chunk_size=8192):
+                    total_size += len(chunk)
+                    if total_size > self.max_image_size:
+                        logger.warning(f"图片文件过大: {total_size} bytes - {image_url}")
+                        return None
+                    image_data.write(chunk)
+                
+                return image_data.getvalue(), content_type
             
         except requests.RequestException as e:
             logger.error(f"下载图片时网络错误: {str(e)} - {image_url}")
-            return None, None
+            return None
+    
+    def _fetch_cache_entry(self, image_url, base_url=None):
+        """下载并校验单张图片，返回待写入的缓存数据，失败返回 None（在线程池中执行）"""
+        try:
+            downloaded = self._download_image(image_url, base_url)
+            if not downloaded:
+                return None
+            return self._build_cache_entry(image_url, *downloaded)
         except Exception as e:
             logger.error(f"缓存图片时出错: {str(e)} - {image_url}")
-            return None, None
+            return None
     
-    def get_cached_image(self, image_id):
-        """获取缓存的图片"""
+    def _build_cache_entry(self, image_url, image_bytes, content_type):
+        """校验图片大小和格式，生成缓存数据；校验失败返回 None"""
+        total_size = len(image_bytes)
+        if total_size > self.max_image_size:
+            logger.warning(f"图片文件过大: {total_size} bytes - {image_url}")
+            return None
+        
+        # 验证图片格式
         try:
-            cache_key = f"image:{image_id}"
-            cached_data = redis_service.redis_client.get(cache_key)
-            
-            if cached_data:
-                import json
-                return json.loads(cached_data)
+            with Image.open(BytesIO(image_bytes)) as img:
+                format_name = img.format
+                if format_name not in self.supported_formats:
+                    logger.warning(f"不支持的图片格式: {format_name} - {image_url}")
+                    return None
+                
+                # 获取图片信息
+                width, height = img.size
+                logger.debug(f"图片信息: {width}x{height}, {format_name} - {image_url}")
+                
+        except Exception as e:
+            logger.warning(f"图片格式验证失败: {str(e)} - {image_url}")
             return None
+        
+        return {
+            'url': image_url,
+            'content_type': content_type,
+            'data': image_bytes,
+            'size': total_size,
+            'width': width,
+            'height': height,
+            'format': format_name
+        }
+    
+    def _store_entries(self, entries):
+        """把多张图片批量写入对象存储（相同内容的图片只存一份），按顺序返回 sha256 列表，失败返回 None"""
+        try:
+            digests = self.store.save_many([
+                (self._generate_image_id(entry['url']), entry['data'], entry)
+                for entry in entries
+            ])
+            for entry in entries:
+                logger.info(f"图片缓存成功: {self._generate_image_id(entry['url'])} ({entry['size']} bytes)")
+            return digests
+        except Exception as e:
+            logger.error(f"批量写入图片缓存失败: {str(e)}")
+            return None
+    
+    def _find_cached_images(self, image_urls):
+        """批量查询多张图片是否已缓存，按顺序返回 ((image_id, content_type), sha256) 或 None"""
+        image_ids = [self._generate_image_id(url) for url in image_urls]
+        try:
+            metas = self.store.get_meta_many(image_ids)
+        except Exception as e:
+            logger.error(f"批量查询图片缓存失败: {str(e)}")
+            return [None] * len(image_urls)
+        return [
+            ((image_id, meta['content_type']), meta.get('sha256')) if meta else None
+            for image_id, meta in zip(image_ids, metas)
+        ]
+    
+    def _memo_lookup(self, image_urls):
+        """
+        从进程内记录中查找图片，返回 URL -> (image_id, content_type)。
+        数据可能已被对象存储淘汰或过期，命中的记录用一次往返确认仍然存在，失效的记录随之删除。
+        """
+        with self._memo_lock:
+            known = {}
+            for url in image_urls:
+                if url in self._memo:
+                    self._memo.move_to_end(url)
+                    known[url] = self._memo[url]
+        if not known:
+            return {}
+        
+        try:
+            alive = self.store.blobs.exists_many(
+                self.store.prefix,
+                [found[0] for found, digest in known.values()],
+                [digest for found, digest in known.values()]
+            )
+        except Exception as e:
+            logger.error(f"确认图片缓存失败: {str(e)}")
+            return {}
+        
+        results = {}
+        with self._memo_lock:
+            for (url, (found, digest)), exists in zip(known.items(), alive):
+                if exists:
+                    results[url] = found
+                else:
+                    self._memo.pop(url, None)
+        return results
+    
+    def _memo_put(self, image_url, found, digest):
+        if not digest:
+            # 旧格式的图片没有 sha256，无法确认是否仍然存在，不记录
+            return
+        with self._memo_lock:
+            self._memo[image_url] = (found, digest)
+            self._memo.move_to_end(image_url)
+            while len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+    
+    def get_cached_image(self, image_id):
+        """获取缓存图片的元数据（不含图片数据）"""
+        try:
+            return self.store.get_meta(image_id)
             
         except Exception as e:
             logger.error(f"获取缓存图片失败: {str(e)} - {image_id}")
             return None
     
     def get_image_data(self, image_id):
-        """获取图片的二进制数据"""
+        """获取图片的二进制数据，返回 (图片数据, content_type)"""
         try:
-            cached_image = self.get_cached_image(image_id)
-            if cached_image:
-                image_data = base64.b64decode(cached_image['data'])
-                return image_data, cached_image['content_type']
-            return None, None
+            return self.store.get_data(image_id)
             
         except Exception as e:
             logger.error(f"获取图片数据失败: {str(e)} - {image_id}")
@@ -157,20 +326,22 @@ class ImageCacheService:
     def process_article_images(self, content, base_url):
         """处理文章中的所有图片，下载并替换为缓存链接"""
         try:
-            from bs4 import BeautifulSoup
+            import lxml.html
             
-            soup = BeautifulSoup(content, 'html.parser')
-            images = soup.find_all('img')
+            images = list(lxml.html.fromstring(content).iter('img'))
             
             image_mapping = {}  # 原链接 -> 缓存ID的映射
             
+            # 批量下载并缓存所有图片
+            srcs = [img.get('src') for img in images if img.get('src')]
+            ingested = self.ingest_images(srcs, base_url)
+            
             for img in images:
                 src = img.get('src')
                 if not src:
                     continue
                 
-                # 下载并缓存图片
-                image_id, content_type = self.download_and_cache_image(src, base_url)
+                image_id, content_type = ingested.get(src, (None, None))
                 
                 if image_id:
                     # 记录映射关系
@@ -198,28 +369,7 @@ class ImageCacheService:
     def get_cache_stats(self):
         """获取图片缓存统计信息"""
         try:
-            # 获取所有图片缓存键
-            pattern = "image:*"
-            keys = redis_service.redis_client.keys(pattern)
-            
-            total_images = len(keys)
-            total_size = 0
-            
-            # 计算总大小（采样方式，避免性能问题）
-            sample_keys = keys[:min(100, len(keys))]
-            for key in sample_keys:
-                try:
-                    cached_data = redis_service.redis_client.get(key)
-                    if cached_data:
-                        import json
-                        image_info = json.loads(cached_data)
-                        total_size += image_info.get('size', 0)
-                except:
-                    continue
-            
-            # 如果是采样，估算总大小
-            if len(keys) > 100:
-                total_size = int(total_size * (len(keys) / len(sample_keys)))
+            total_images, total_size = self.store.count()
             
             return {
                 'total_images': total_images,
@@ -235,17 +385,10 @@ class ImageCacheService:
                 'total_size_mb': 0
             }
     
-    def clear_image_cache(self, older_than_days=7):
-        """清理过期的图片缓存"""
+    def clear_image_cache(self):
+        """清理已过期图片在对象存储容量统计中的残留记录"""
         try:
-            pattern = "image:*"
-            keys = redis_service.redis_client.keys(pattern)
-            
-            deleted_count = 0
-            for key in keys:
-                # Redis会自动清理过期的键，这里主要是手动清理
-                if not redis_service.redis_client.exists(key):
-                    deleted_count += 1
+            deleted_count = self.store.blobs.sweep()
             
             logger.info(f"清理了 {deleted_count} 个过期图片缓存")
             return deleted_count
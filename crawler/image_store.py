@@ -0,0 +1,192 @@
+"""
+图片存储
+图片数据统一存放在内容寻址对象存储（blob_store）中，相同图片只存一份；
+各应用的图片ID（爬虫为 URL 的 MD5，AI对话为数据的 MD5）作为别名指向数据。
+读取时兼容两种旧格式，可通过 migrate_image_storage 命令迁移：
+- {prefix}:{id}                         base64 编码的 JSON 文档
+- {prefix}_data:{id} / {prefix}_meta:{id}  原始字节 + 元数据哈希
+"""
+
+import json
+import base64
+import logging
+
+from .blob_store import blob_store
+from .redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+# 属于图片数据本身的元信息，其余字段（如原始URL、文件名）记在别名上
+BLOB_FIELDS = ('content_type', 'size', 'width', 'height', 'format')
+INT_FIELDS = ('size', 'width', 'height')
+
+
+class BinaryImageStore:
+    """按应用命名空间访问共享对象存储中的图片"""
+
+    def __init__(self, prefix, expire_time):
+        """
+        Args:
+            prefix: 命名空间，如 image、ai_chat_image（同时也是旧格式的键前缀）
+            expire_time: 过期时间(秒)
+        """
+        self.prefix = prefix
+        self.expire_time = expire_time
+        self.blobs = blob_store
+
+    @property
+    def client(self):
+        return redis_service.binary_client
+
+    def legacy_key(self, image_id):
+        return f"{self.prefix}:{image_id}"
+
+    def legacy_data_key(self, image_id):
+        return f"{self.prefix}_data:{image_id}"
+
+    def legacy_meta_key(self, image_id):
+        return f"{self.prefix}_meta:{image_id}"
+
+    def save(self, image_id, image_bytes, meta, expire_time=None):
+        """保存图片，返回内容哈希"""
+        return self.save_many([(image_id, image_bytes, meta)], expire_time=expire_time)[0]
+
+    def save_many(self, items, expire_time=None):
+        """批量保存 (image_id, 图片数据, 元信息) 列表"""
+        entries = []
+        for image_id, image_bytes, meta in items:
+            blob_meta = {key: value for key, value in meta.items() if key in BLOB_FIELDS}
+            alias_meta = {key: value for key, value in meta.items() if key not in BLOB_FIELDS and key != 'data'}
+            entries.append((image_id, image_bytes, blob_meta, alias_meta))
+        return self.blobs.put_many(self.prefix, entries, ttl=expire_time or self.expire_time)
+
+    def get_meta(self, image_id):
+        """获取图片元数据，不存在时返回 None"""
+        return self.get_meta_many([image_id])[0]
+
+    def get_meta_many(self, image_ids):
+        """批量获取元数据；未命中的再批量回退读取旧格式"""
+        results = self.blobs.get_alias_meta_many(self.prefix, image_ids)
+
+        missing = [index for index, meta in enumerate(results) if meta is None]
+        if missing:
+            pipe = self.client.pipeline(transaction=False)
+            for index in missing:
+                pipe.hgetall(self.legacy_meta_key(image_ids[index]))
+                pipe.get(self.legacy_key(image_ids[index]))
+            values = pipe.execute()
+            for index, raw_meta, legacy in zip(missing, values[::2], values[1::2]):
+                if raw_meta:
+                    results[index] = self._decode_meta(raw_meta)
+                elif legacy:
+                    meta = json.loads(legacy)
+                    meta.pop('data', None)
+                    results[index] = meta
+        return results
+
+    def get_data(self, image_id):
+        """获取图片原始字节，返回 (图片数据, content_type)，不存在时返回 (None, None)"""
+        image_bytes, meta = self.blobs.get_by_alias(self.prefix, image_id)
+        if image_bytes is not None:
+            return image_bytes, meta.get('content_type') or 'application/octet-stream'
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(self.legacy_data_key(image_id))
+        pipe.hget(self.legacy_meta_key(image_id), 'content_type')
+        pipe.get(self.legacy_key(image_id))
+        image_bytes, content_type, legacy = pipe.execute()
+        if image_bytes is not None:
+            return image_bytes, (content_type or b'application/octet-stream').decode('utf-8')
+        if legacy:
+            cached_image = json.loads(legacy)
+            return base64.b64decode(cached_image['data']), cached_image['content_type']
+        return None, None
+
+    def delete(self, image_id):
+        """删除图片别名（数据在无引用后释放）以及旧格式的键"""
+        deleted = self.blobs.delete_alias(self.prefix, image_id)
+        legacy_deleted = self.client.delete(
+            self.legacy_key(image_id), self.legacy_data_key(image_id), self.legacy_meta_key(image_id)
+        )
+        return deleted or bool(legacy_deleted)
+
+    def count(self):
+        """统计本命名空间引用的图片数量和总大小（含旧格式）"""
+        total_images = 0
+        total_size = 0
+        batch = []
+
+        def flush():
+            nonlocal total_images, total_size
+            for meta in self.blobs.get_alias_meta_many(self.prefix, batch):
+                if meta:
+                    total_images += 1
+                    total_size += meta.get('size', 0)
+            batch.clear()
+
+        alias_prefix = self.blobs.alias_key(self.prefix, '')
+        for key in self.client.scan_iter(match=f"{alias_prefix}*", count=500):
+            batch.append(key.decode('utf-8')[len(alias_prefix):])
+            if len(batch) >= 500:
+                flush()
+        if batch:
+            flush()
+
+        for key in self.client.scan_iter(match=f"{self.prefix}_meta:*", count=500):
+            total_images += 1
+            total_size += int(self.client.hget(key, 'size') or 0)
+        for key in self.client.scan_iter(match=f"{self.prefix}:*", count=500):
+            raw = self.client.get(key)
+            if raw:
+                total_images += 1
+                total_size += json.loads(raw).get('size', 0)
+        return total_images, total_size
+
+    def migrate_legacy(self, batch_size=100, dry_run=False):
+        """
+        把旧格式的图片转入对象存储，保留剩余过期时间
+
+        Returns:
+            (已迁移数量, 失败数量)
+        """
+        migrated = 0
+        failed = 0
+
+        def read_json(key):
+            cached_image = json.loads(self.client.get(key))
+            return base64.b64decode(cached_image.pop('data')), cached_image, [key]
+
+        def read_binary(key):
+            image_id = key.decode('utf-8')[len(self.prefix) + len('_meta:'):]
+            meta = self._decode_meta(self.client.hgetall(key))
+            image_bytes = self.client.get(self.legacy_data_key(image_id))
+            if image_bytes is None:
+                raise ValueError('缺少图片数据')
+            return image_bytes, meta, [key, self.legacy_data_key(image_id)]
+
+        sources = [
+            (f"{self.prefix}:*", len(self.prefix) + 1, read_json),
+            (f"{self.prefix}_meta:*", len(self.prefix) + len('_meta:'), read_binary),
+        ]
+        for pattern, id_offset, reader in sources:
+            for key in self.client.scan_iter(match=pattern, count=batch_size):
+                try:
+                    image_bytes, meta, old_keys = reader(key)
+                except Exception as e:
+                    logger.error(f"迁移图片失败: {key.decode('utf-8')} - {str(e)}")
+                    failed += 1
+                    continue
+                if not dry_run:
+                    ttl = self.client.ttl(key)
+                    image_id = key.decode('utf-8')[id_offset:]
+                    self.save(image_id, image_bytes, meta, expire_time=ttl if ttl and ttl > 0 else None)
+                    self.client.delete(*old_keys)
+                migrated += 1
+        return migrated, failed
+
+    def _decode_meta(self, raw):
+        meta = {key.decode('utf-8'): value.decode('utf-8') for key, value in raw.items()}
+        for field in INT_FIELDS:
+            if meta.get(field):
+                meta[field] = int(meta[field])
+        return meta
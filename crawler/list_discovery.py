@@ -0,0 +1,165 @@
+"""
+今日要闻列表页发现
+人民网要闻回顾首页通过 iframe 中的日历跳转到按日期命名的列表页，列表在 td.p6 中。
+依次尝试以下方式获取列表，前两种只发 HTTP 请求并用 lxml 解析，不启动浏览器：
+    archive   按模板直接拼出当天列表页的地址
+    iframe    获取首页（首页本身即列表页时直接解析），否则获取日历 iframe 文档，找到当天的日期链接再获取列表页
+    browser   浏览器打开首页并点击日历（原有流程，作为兜底）
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import urljoin
+
+import requests
+import lxml.html
+from lxml import etree
+
+from .config import LIST_DISCOVERY_CONFIG
+from .page_fetcher import decode_html
+
+logger = logging.getLogger(__name__)
+
+# class 中包含 p6 的单元格（与 BeautifulSoup 的 class_='p6' 匹配方式一致）
+_NEWS_CONTAINER_XPATH = "//td[contains(concat(' ', normalize-space(@class), ' '), ' p6 ')]"
+
+
+def _parse_html(html_content):
+    if not html_content or not html_content.strip():
+        return None
+    try:
+        return lxml.html.fromstring(html_content)
+    except (etree.ParserError, ValueError) as e:
+        logger.warning(f"解析列表页HTML失败: {str(e)}")
+        return None
+
+
+def parse_news_links(html_content):
+    """从列表页HTML的 td.p6 中提取今日要闻，返回 [{'title', 'url'}, ...]"""
+    doc = _parse_html(html_content)
+    if doc is None:
+        return []
+    containers = doc.xpath(_NEWS_CONTAINER_XPATH)
+    if not containers:
+        return []
+    news_links = []
+    # 一个 <li> 可能包含多个以 <br> 分隔的 <a>，直接取容器内所有链接
+    for link in containers[0].iter('a'):
+        title = link.text_content().strip()
+        url = (link.get('href') or '').strip()
+        if title and url:
+            news_links.append({'title': title, 'url': url})
+    return news_links
+
+
+def find_iframe_urls(html_content, base_url):
+    """提取页面中 iframe 的绝对地址"""
+    doc = _parse_html(html_content)
+    if doc is None:
+        return []
+    return [urljoin(base_url, src.strip()) for src in doc.xpath('//iframe/@src') if src.strip()]
+
+
+def find_date_link(html_content, day, base_url):
+    """在日历文档中找到指定日期（几号）的链接，返回绝对地址，找不到时返回 None"""
+    doc = _parse_html(html_content)
+    if doc is None:
+        return None
+    hrefs = doc.xpath('//a[font[normalize-space(text())=$day]]/@href', day=str(day))
+    return urljoin(base_url, hrefs[0].strip()) if hrefs else None
+
+
+class ListPageDiscovery:
+    """列表页发现：HTTP + lxml 优先，浏览器兜底，并统计各方式命中次数和耗时"""
+
+    METHODS = ('archive', 'iframe', 'browser', 'failed')
+
+    def __init__(self, session, browser_discover):
+        """
+        Args:
+            session: 已配置请求头的 requests.Session
+            browser_discover: browser_discover(url, day) -> 链接列表，浏览器点击日历的原有流程
+        """
+        self.session = session
+        self.browser_discover = browser_discover
+        self.config = LIST_DISCOVERY_CONFIG
+        self._lock = threading.Lock()
+        self._hits = {method: 0 for method in self.METHODS}
+        self._seconds = {method: 0.0 for method in self.METHODS}
+
+    def discover(self, url, date=None):
+        """
+        获取指定日期（默认今天）的要闻链接
+
+        Returns:
+            [{'title', 'url'}, ...]，所有方式都失败时返回空列表
+        """
+        date = date or datetime.now()
+        started = time.monotonic()
+        for method, discover in (('archive', self._discover_archive), ('iframe', self._discover_iframe)):
+            method_started = time.monotonic()
+            try:
+                news_links = discover(url, date)
+            except requests.RequestException as e:
+                logger.warning(f"列表页发现方式 {method} 请求失败: {str(e)}")
+                news_links = None
+            if news_links:
+                self._record(method, method_started)
+                logger.info(f"通过 {method} 方式获取到 {len(news_links)} 条要闻链接，耗时 {time.monotonic() - method_started:.2f}s")
+                return news_links
+
+        if self.config['browser_fallback']:
+            method_started = time.monotonic()
+            logger.info("HTTP 方式未能获取要闻列表，回退到浏览器")
+            news_links = self.browser_discover(url, date.day)
+            if news_links:
+                self._record('browser', method_started)
+                return news_links
+
+        self._record('failed', started)
+        return []
+
+    def _discover_archive(self, url, date):
+        template = self.config['archive_url_template']
+        if not template:
+            return None
+        return parse_news_links(self._get(template.format(date=date)))
+
+    def _discover_iframe(self, url, date):
+        page = self._get(url)
+        if not page:
+            return None
+        # 首页直接就是列表页的情况
+        news_links = parse_news_links(page)
+        if news_links:
+            return news_links
+        for iframe_url in find_iframe_urls(page, url):
+            list_url = find_date_link(self._get(iframe_url), date.day, iframe_url)
+            if list_url:
+                return parse_news_links(self._get(list_url))
+        return None
+
+    def _get(self, url):
+        """获取页面并解码，非 200 时返回 None"""
+        response = self.session.get(url, timeout=self.config['http_timeout'])
+        if response.status_code != 200:
+            logger.info(f"列表页请求状态码异常: {response.status_code} - {url}")
+            return None
+        return decode_html(response.content, response.encoding)
+
+    def _record(self, method, started):
+        with self._lock:
+            self._hits[method] += 1
+            self._seconds[method] += time.monotonic() - started
+
+    def get_stats(self):
+        """各发现方式的命中次数和平均耗时"""
+        with self._lock:
+            hits = dict(self._hits)
+            seconds = dict(self._seconds)
+        return {
+            'hits': hits,
+            'avg_seconds': {method: round(seconds[method] / count, 4) if count else 0.0 for method, count in hits.items()},
+        }
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import logging
+import resource
+import redis
+import redis.connection
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from legacy_pi_backend.instrumentation import TimedRedis
+from crawler.config import LIST_DISCOVERY_CONFIG
+from crawler.redis_service import redis_service
+from crawler.image_service import image_cache_service
+from crawler.replay_server import ReplayServer
+from crawler.services import PeopleNetCrawler
+from crawler.async_pipeline import AsyncCrawlPipeline
+
+logger = logging.getLogger(__name__)
+
+TESTDATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'testdata')
+DEFAULT_SITE_DIR = os.path.join(TESTDATA_DIR, 'site')
+DEFAULT_BASELINE = os.path.join(TESTDATA_DIR, 'benchmark_baseline.json')
+
+# 阶段耗时很短时的绝对容差(毫秒)，避免亚毫秒级抖动被判为回归
+STAGE_SLACK_MS = 1.0
+
+
+class RedisOpCounter:
+    """Redis 命令数和网络往返次数（pipeline 中的每条命令单独计数）"""
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+
+
+@contextmanager
+def count_redis_ops():
+    """包装连接的发送方法统计 Redis 命令，退出时（包括异常）恢复原方法"""
+    connection_class = redis.connection.AbstractConnection
+    send_command = connection_class.send_command
+    pack_commands = connection_class.pack_commands
+    send_packed_command = connection_class.send_packed_command
+    counter = RedisOpCounter()
+
+    def counted_send_command(connection, *args, **kwargs):
+        counter.commands += 1
+        return send_command(connection, *args, **kwargs)
+
+    def counted_pack_commands(connection, commands):
+        commands = list(commands)
+        counter.commands += len(commands)
+        return pack_commands(connection, commands)
+
+    def counted_send_packed_command(connection, *args, **kwargs):
+        counter.round_trips += 1
+        return send_packed_command(connection, *args, **kwargs)
+
+    try:
+        connection_class.send_command = counted_send_command
+        connection_class.pack_commands = counted_pack_commands
+        connection_class.send_packed_command = counted_send_packed_command
+        yield counter
+    finally:
+        connection_class.send_command = send_command
+        connection_class.pack_commands = pack_commands
+        connection_class.send_packed_command = send_packed_command
+
+
+def find_regressions(current, baseline, tolerance, ops_tolerance):
+    """与基线比较，返回回归项的说明列表（为空表示没有回归）"""
+    regressions = []
+    if current['pages_per_second'] < baseline['pages_per_second'] * (1 - tolerance):
+        regressions.append(f"吞吐量 {current['pages_per_second']} 页/秒 < 基线 {baseline['pages_per_second']}")
+    for stage, expected in baseline.get('stages', {}).items():
+        actual = current['stages'].get(stage)
+        if actual is None:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if actual[key] > expected[key] * (1 + tolerance) + STAGE_SLACK_MS:
+                regressions.append(f"阶段 {stage} {key} {actual[key]}ms > 基线 {expected[key]}ms")
+    if current['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        regressions.append(f"峰值内存 {current['peak_rss_mb']}MB > 基线 {baseline['peak_rss_mb']}MB")
+    if current['redis_ops_per_article'] > baseline['redis_ops_per_article'] * (1 + ops_tolerance):
+        regressions.append(f"每篇文章 Redis 命令数 {current['redis_ops_per_article']} > 基线 {baseline['redis_ops_per_article']}")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = '离线爬取基准：通过本地回放服务爬取录制的页面，统计吞吐量、各阶段 p50/p95、峰值内存和每篇文章的 Redis 命令数，与基线比较'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--site', default=DEFAULT_SITE_DIR, help='录制页面目录（含 manifest.json）')
+        parser.add_argument('--backend', choices=['threaded', 'async'], default='threaded', help='爬取后端')
+        parser.add_argument('--redis-db', type=int, default=15, help='基准测试使用的 Redis 库（运行前后清空，不能是业务库）')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件')
+        parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+        parser.add_argument('--no-baseline', action='store_true', help='只输出结果，不做回归检查')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='吞吐量、阶段耗时和内存允许的退化比例')
+        parser.add_argument('--ops-tolerance', type=float, default=0.05, help='Redis 命令数允许的增加比例')
+
+    def handle(self, *args, **options):
+        redis_db = options['redis_db']
+        if redis_db == getattr(settings, 'REDIS_DB', 0):
+            raise CommandError(f"--redis-db 不能与业务库相同（REDIS_DB={redis_db}），基准测试会清空该库")
+        baseline_path = options['baseline']
+        check_baseline = not options['save_baseline'] and not options['no_baseline']
+        # 先检查基线再爬取，缺少基线时以非零状态退出，避免回归检查被静默跳过
+        if check_baseline and not os.path.exists(baseline_path):
+            raise CommandError(f"基线文件不存在: {baseline_path}（使用 --save-baseline 生成，或加 --no-baseline 跳过回归检查）")
+
+        current = self._run(options['site'], options['backend'], redis_db)
+        self._report(current)
+
+        if options['save_baseline']:
+            with open(baseline_path, 'w', encoding='utf-8') as f:
+                json.dump(current, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"已保存基线: {baseline_path}"))
+            return
+
+        if not check_baseline:
+            return
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(current, baseline, options['tolerance'], options['ops_tolerance'])
+        if regressions:
+            raise CommandError("性能回归:\n" + "\n".join(f"  - {item}" for item in regressions))
+        self.stdout.write(self.style.SUCCESS("未发现性能回归"))
+
+    def _run(self, site_dir, backend, redis_db):
+        """在独立的 Redis 库中通过回放服务完整爬取一次，返回统计结果"""
+        original_clients = (redis_service.redis_client, redis_service.binary_client)
+        original_env = {key: os.environ.get(key) for key in ('HTTP_PROXY', 'http_proxy', 'NO_PROXY', 'no_proxy')}
+        original_fallback = LIST_DISCOVERY_CONFIG['browser_fallback']
+        redis_config = {
+            'host': getattr(settings, 'REDIS_HOST', 'localhost'),
+            'port': getattr(settings, 'REDIS_PORT', 6379),
+            'db': redis_db,
+            'password': getattr(settings, 'REDIS_PASSWORD', None) or None,
+        }
+        redis_service.redis_client = TimedRedis(decode_responses=True, **redis_config)
+        redis_service.binary_client = TimedRedis(decode_responses=False, **redis_config)
+        try:
+            redis_service.redis_client.flushdb()
+            image_cache_service._memo.clear()
+            # 录制的页面都能通过 HTTP 解析，不启动浏览器
+            LIST_DISCOVERY_CONFIG['browser_fallback'] = False
+
+            with ReplayServer(site_dir) as server:
+                os.environ.update(HTTP_PROXY=server.url, http_proxy=server.url, NO_PROXY='', no_proxy='')
+                crawler = PeopleNetCrawler()
+                with count_redis_ops() as counter:
+                    started = time.perf_counter()
+                    if backend == 'async':
+                        result = AsyncCrawlPipeline(crawler=crawler).run()
+                    else:
+                        result = crawler.crawl_today_news()
+                    elapsed = time.perf_counter() - started
+                requests_served = sum(server.site.hits.values())
+
+            if not result.get('success'):
+                raise CommandError(f"基准爬取失败: {result.get('message')}")
+            articles = result['success_count'] + result['failed_count']
+            saved = max(result['success_count'], 1)
+            return {
+                'backend': backend,
+                'articles': articles,
+                'failed': result['failed_count'],
+                'elapsed_s': round(elapsed, 3),
+                'pages_per_second': round(articles / elapsed, 2),
+                'stages': {
+                    stage: {'p50_ms': summary['p50_ms'], 'p95_ms': summary['p95_ms']}
+                    for stage, summary in result['metrics']['stages'].items()
+                },
+                # Linux 下 ru_maxrss 单位为 KB
+                'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                'redis_ops_per_article': round(counter.commands / saved, 1),
+                'redis_round_trips_per_article': round(counter.round_trips / saved, 1),
+                'requests_served': requests_served,
+            }
+        finally:
+            try:
+                redis_service.redis_client.flushdb()
+            except redis.RedisError as e:
+                logger.warning(f"清空基准测试库失败: {str(e)}")
+            redis_service.redis_client, redis_service.binary_client = original_clients
+            LIST_DISCOVERY_CONFIG['browser_fallback'] = original_fallback
+            for key, value in original_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+    def _report(self, current):
+        self.stdout.write(f"后端: {current['backend']}，文章 {current['articles']} 篇（失败 {current['failed']}），"
+                          f"耗时 {current['elapsed_s']}s，回放请求 {current['requests_served']} 次")
+        self.stdout.write(f"吞吐量: {current['pages_per_second']} 页/秒")
+        for stage, summary in current['stages'].items():
+            self.stdout.write(f"  {stage:<10} p50 {summary['p50_ms']:>9.2f}ms  p95 {summary['p95_ms']:>9.2f}ms")
+        self.stdout.write(f"峰值内存: {current['peak_rss_mb']}MB")
+        self.stdout.write(f"每篇文章 Redis 命令数: {current['redis_ops_per_article']}（往返 {current['redis_round_trips_per_article']} 次）")
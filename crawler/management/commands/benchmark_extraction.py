@@ -0,0 +1,181 @@
+import os
+import re
+import time
+import logging
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup, Comment
+from django.core.management.base import BaseCommand
+
+from crawler.extraction import ArticleExtractor, locate_article, parse_date_string, image_candidates
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'testdata', 'article_pages')
+BASE_URL = "http://www.people.com.cn"
+
+
+# ---- 对照组：原 BeautifulSoup 实现（html.parser 解析，prettify 后再次解析，各字段分别查询） ----
+
+def baseline_extract(page_source, link_info):
+    """原实现的提取流程，返回与 ArticleExtractor.extract 相同结构的结果，定位失败时返回 None"""
+    soup = BeautifulSoup(page_source, 'html.parser')
+    article_html = None
+    comment_start = soup.find(string=lambda text: isinstance(text, Comment) and text.strip() == '内容')
+    if comment_start:
+        wrapper = comment_start.find_next_sibling('div')
+        article_div = wrapper.find('div', recursive=False) if wrapper else None
+        if article_div:
+            article_html = article_div.prettify()
+    if article_html is None:
+        comment_end = soup.find(string=lambda text: isinstance(text, Comment) and text.strip() == '结束正文')
+        article_div = comment_end.find_previous_sibling('div') if comment_end else None
+        if article_div:
+            article_html = article_div.prettify()
+    if article_html is None:
+        return None
+
+    soup = BeautifulSoup(article_html, 'html.parser')
+    text, image_jobs = _baseline_content(soup)
+    url = link_info['url']
+    fields = {
+        'url': url,
+        'title': _baseline_title(soup, link_info['title']),
+        'source': _baseline_source(soup),
+        'publish_date': _baseline_publish_date(soup),
+        'category': _baseline_category(soup, url),
+    }
+    # 原实现统计图片数量时还会解析一次正文
+    BeautifulSoup(text, 'html.parser').find_all('img')
+    return {'fields': fields, 'text': text, 'image_jobs': image_jobs}
+
+
+def _baseline_content(soup):
+    content_element = None
+    for selector in ('.main', '.rm_txt_con', '.content', '.article-content', '#content', '.article-body', '.post-content', '.entry-content'):
+        content_element = soup.select_one(selector)
+        if content_element:
+            break
+    if not content_element:
+        for div in soup.find_all('div'):
+            text = div.get_text(strip=True)
+            if len(text) > 500 and any(keyword in text for keyword in ['习近平', '中国', '发展', '经济', '政治', '社会', '建设', '改革']):
+                content_element = div
+                break
+        if not content_element:
+            return "", []
+
+    for unwanted in content_element.select('.edit, .paper_num, .share, .ad, script, style'):
+        unwanted.decompose()
+
+    image_jobs = []
+    for img in content_element.find_all('img'):
+        src = img.get('src')
+        if src:
+            if not src.startswith('http'):
+                src = urljoin(BASE_URL, src)
+            placeholder = f"__IMAGE_PLACEHOLDER_{len(image_jobs)}__"
+            image_jobs.append({'placeholder': placeholder, 'src': src, 'alt': img.get('alt', '') or "图片",
+                               'candidates': image_candidates(src)})
+            img.replace_with(placeholder)
+
+    lines = [line.strip() for line in content_element.get_text().split('\n') if line.strip()]
+    return '\n\n'.join(line for line in lines if len(line) > 5), image_jobs
+
+
+def _baseline_title(soup, fallback_title):
+    for selector in ('h1', '.rm_txt_con h1', 'title'):
+        element = soup.select_one(selector)
+        if element:
+            title = element.get_text(strip=True)
+            if title and not title.endswith('--人民网'):
+                return title.replace('--人民网', '').replace('--文旅·体育--人民网', '').replace('--经济·科技--人民网', '').strip()
+    return fallback_title
+
+
+def _baseline_source(soup):
+    for element in soup.select('.channel .col-1-1, .source'):
+        text = element.get_text()
+        for pattern in (r'来源：(.+?)(?:\s|$)', r'来源:<a[^>]*>([^<]+)</a>'):
+            match = re.search(pattern, text)
+            if match:
+                return match.group(1).strip()
+    return "人民网"
+
+
+def _baseline_publish_date(soup):
+    page_text = soup.get_text()
+    for pattern in (r'(\d{4}年\d{1,2}月\d{1,2}日\d{1,2}:\d{1,2})', r'(\d{4}-\d{1,2}-\d{1,2}\s+\d{1,2}:\d{1,2})',
+                    r'(\d{4}/\d{1,2}/\d{1,2}\s+\d{1,2}:\d{1,2})'):
+        match = re.search(pattern, page_text)
+        if match:
+            return parse_date_string(match.group(1))
+    return None
+
+
+def _baseline_category(soup, url):
+    for pattern, category in (('/finance/', "经济·科技"), ('/ent/', "文旅·体育"), ('/society/', "社会·法治"), ('/world/', "国际"),
+                              ('/politics/', "时政"), ('/military/', "军事"), ('/health/', "健康·生活"), ('/edu/', "教育")):
+        if pattern in url:
+            return category
+    for nav in soup.select('.route a, .breadcrumb a'):
+        nav_text = nav.get_text(strip=True)
+        if nav_text in ["经济·科技", "文旅·体育", "社会·法治", "国际", "时政", "军事", "健康·生活", "教育"]:
+            return nav_text
+    return "综合"
+
+
+def lxml_extract(page_source, link_info, extractor=None):
+    """新实现：lxml 解析一次，定位文章主体后一次遍历提取"""
+    article = locate_article(page_source)
+    if article is None:
+        return None
+    return (extractor or ArticleExtractor(BASE_URL)).extract(article, link_info)
+
+
+def _cpu_ms(func, iterations):
+    """每次调用的平均 CPU 时间（毫秒）"""
+    started = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - started) * 1000 / iterations
+
+
+class Command(BaseCommand):
+    help = '文章页提取微基准：对比原 BeautifulSoup 实现与 lxml 单次解析引擎的单页 CPU 耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', default=DEFAULT_PAGES_DIR, help='保存的文章页HTML目录')
+        parser.add_argument('--iterations', type=int, default=20, help='每个页面重复提取的次数')
+
+    def handle(self, *args, **options):
+        pages_dir, iterations = options['pages'], options['iterations']
+        names = sorted(name for name in os.listdir(pages_dir) if name.endswith('.html'))
+        if not names:
+            self.stderr.write(self.style.ERROR(f"目录中没有HTML页面: {pages_dir}"))
+            return
+
+        extractor = ArticleExtractor(BASE_URL)
+        self.stdout.write(f"{'页面':<24}{'大小(KB)':>10}{'原实现(ms)':>14}{'lxml(ms)':>12}{'降低':>10}  结果一致")
+        total_baseline = total_lxml = 0.0
+        for name in names:
+            with open(os.path.join(pages_dir, name), encoding='utf-8') as f:
+                page_source = f.read()
+            link_info = {'title': name, 'url': f'{BASE_URL}/n1/2025/0901/{name}'}
+
+            baseline_ms = _cpu_ms(lambda: baseline_extract(page_source, link_info), iterations)
+            lxml_ms = _cpu_ms(lambda: lxml_extract(page_source, link_info, extractor), iterations)
+            total_baseline += baseline_ms
+            total_lxml += lxml_ms
+
+            expected, actual = baseline_extract(page_source, link_info), lxml_extract(page_source, link_info, extractor)
+            same = expected is not None and actual is not None and expected['text'] == actual['text'] and \
+                expected['image_jobs'] == actual['image_jobs'] and expected['fields'] == actual['fields']
+            self.stdout.write(
+                f"{name:<24}{len(page_source.encode('utf-8')) / 1024:>10.1f}{baseline_ms:>14.2f}{lxml_ms:>12.2f}"
+                f"{1 - lxml_ms / baseline_ms:>10.0%}  {'是' if same else '否'}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"平均每页: 原实现 {total_baseline / len(names):.2f}ms，lxml {total_lxml / len(names):.2f}ms，"
+            f"CPU 降低 {1 - total_lxml / total_baseline:.0%}"
+        ))
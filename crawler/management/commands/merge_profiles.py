@@ -0,0 +1,52 @@
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from legacy_pi_backend.profiling import ProfileStore, profile_dir_name
+
+
+class Command(BaseCommand):
+    help = '合并 ProfilingMiddleware 保存的请求采样结果，输出 collapsed stack 格式（可直接交给 flamegraph.pl 或 speedscope）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='采样结果目录，默认取 PROFILING_DIR')
+        parser.add_argument('--view', action='append', default=[], help='视图名（如 knowledge_quiz:get_daily_question），可重复，默认全部')
+        parser.add_argument('--since', type=float, default=None, help='只合并最近 N 小时的采样结果')
+        parser.add_argument('--output', default=None, help='输出文件，默认输出到标准输出')
+        parser.add_argument('--list', action='store_true', help='只列出已保存的视图及采样数量')
+
+    def handle(self, *args, **options):
+        store = ProfileStore(options['dir'] or getattr(settings, 'PROFILING_DIR', ''))
+        available = store.views()
+        if options['list']:
+            for name, count in available.items():
+                self.stdout.write(f"{name:<60}{count:>6}")
+            return
+
+        selected = [profile_dir_name(view) for view in options['view']] or list(available)
+        missing = [name for name in selected if name not in available]
+        if missing:
+            raise CommandError(f"没有这些视图的采样结果: {', '.join(missing)}（使用 --list 查看）")
+        if not selected:
+            raise CommandError(f"采样结果目录为空: {store.directory}")
+
+        since = time.time() - options['since'] * 3600 if options['since'] else None
+        merged = Counter()
+        for name in selected:
+            stacks = store.load(name, since)
+            # 合并多个视图时以视图名作为根帧，火焰图中按视图分开
+            prefix = f"{name};" if len(selected) > 1 else ''
+            for stack, count in stacks.items():
+                merged[prefix + stack] += count
+
+        lines = [f"{stack} {count}" for stack, count in sorted(merged.items())]
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n' if lines else '')
+            self.stdout.write(self.style.SUCCESS(
+                f"已合并 {len(selected)} 个视图、{sum(merged.values())} 个样本到 {options['output']}"
+            ))
+        else:
+            for line in lines:
+                self.stdout.write(line)
@@ -0,0 +1,31 @@
+import logging
+from django.core.management.base import BaseCommand
+
+from crawler.image_service import image_cache_service
+from ai_chat.image_service import ai_image_service
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Moves cached images from the legacy Redis layouts into the shared content-addressed blob store.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='每批迁移的键数量')
+        parser.add_argument('--dry-run', action='store_true', help='只统计可迁移的数量，不写入Redis')
+
+    def handle(self, *args, **options):
+        stores = [
+            ('爬虫图片', image_cache_service.store),
+            ('AI对话图片', ai_image_service.store),
+        ]
+        for name, store in stores:
+            try:
+                migrated, failed = store.migrate_legacy(batch_size=options['batch_size'], dry_run=options['dry_run'])
+            except Exception as e:
+                logger.error(f"迁移{name}失败: {str(e)}")
+                self.stderr.write(self.style.ERROR(f"迁移{name}失败: {str(e)}"))
+                continue
+
+            action = '可迁移' if options['dry_run'] else '已迁移'
+            self.stdout.write(self.style.SUCCESS(f"{name}: {action} {migrated} 张，失败 {failed} 张"))
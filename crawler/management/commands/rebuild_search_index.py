@@ -0,0 +1,41 @@
+import json
+import logging
+from django.core.management.base import BaseCommand
+
+from crawler.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Builds the full-text search index for articles already stored in Redis and prunes expired index entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='每批建立索引的文章数量')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        client = redis_service.redis_client
+        indexed = 0
+        batch = []
+
+        def flush():
+            nonlocal indexed
+            articles = [json.loads(article_json) for article_json in client.mget(batch) if article_json]
+            indexed += redis_service.search_index.index_documents(articles)
+            batch.clear()
+
+        try:
+            for key in client.scan_iter(match='article:*', count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+            pruned = redis_service.search_index.prune()
+        except Exception as e:
+            logger.error(f"重建检索索引失败: {str(e)}")
+            self.stderr.write(self.style.ERROR(f"重建检索索引失败: {str(e)}"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"已为 {indexed} 篇文章建立索引，清理过期索引 {pruned} 篇"))
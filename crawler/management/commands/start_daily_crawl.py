@@ -15,13 +15,22 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = 'Starts the daily article crawling task and performs data cleanup.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh', action='store_true', help='当天刷新：重新获取列表页，只抓取新链接和内容有变化的文章')
+
     def handle(self, *args, **options):
         self.stdout.write("开始执行每日爬取任务...")
+        refresh = options.get('refresh', False)
         
         try:
-            today = timezone.now().date()
+            today = timezone.localdate()
             today_str = today.isoformat()
             
+            # 0. 汇总昨日阅读统计
+            view_stats = redis_service.flush_view_stats((today - timedelta(days=1)).isoformat())
+            if view_stats:
+                self.stdout.write(f"昨日阅读统计已汇总: 总阅读量 {view_stats['total_views']}，独立读者 {view_stats['unique_readers']}。")
+
             # 1. 清理旧数据 (和原逻辑一样)
             deleted_count = RedisStats.clear_old_data(days_to_keep=1)
             if deleted_count > 0:
@@ -46,8 +55,14 @@ class Command(BaseCommand):
                 logger.warning("每日爬取任务已在运行，跳过。")
                 return
             
+            # 日内追加爬取正在进行时跳过，避免同一链接被两个任务同时保存
+            if redis_service.is_crawl_locked(delta=True):
+                self.stdout.write(self.style.WARNING("追加爬取任务正在运行，跳过本次执行。"))
+                logger.warning("追加爬取任务正在运行，跳过每日爬取。")
+                return
+            
             # 如果已有成功数据，也跳过
-            if RedisNewsArticle.filter(crawl_status='success'):
+            if not refresh and RedisNewsArticle.count(crawl_status='success'):
                 self.stdout.write(self.style.SUCCESS("今日文章已成功爬取，跳过本次执行。"))
                 logger.info("今日文章已成功爬取，跳过。")
                 return
@@ -65,11 +80,11 @@ class Command(BaseCommand):
             task = RedisCrawlTask.create(
                 task_name=f'每日爬取-{today.strftime("%Y-%m-%d")}',
                 target_url='http://www.people.com.cn/GB/59476/index.html',
-                task_type='full'
+                task_type='refresh' if refresh else 'full'
             )
             
             # 异步执行爬虫
-            run_daily_crawler_task.delay(task.id)
+            run_daily_crawler_task.delay(task.id, refresh=refresh)
             
             logger.info(f"成功启动每日爬取任务，Task ID: {task.id}")
             self.stdout.write(self.style.SUCCESS(f"成功启动每日爬取任务，Task ID: {task.id}"))
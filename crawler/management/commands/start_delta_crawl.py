@@ -0,0 +1,46 @@
+import logging
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from crawler.redis_service import redis_service
+from crawler.redis_models import RedisCrawlTask
+from crawler.tasks import run_delta_crawl_task
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = '日内追加爬取：只抓取列表页上新出现的文章并追加到当日文章（由 cron 定时执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=['threaded', 'async'], help='爬取后端，默认取 CRAWLER_BACKEND 配置')
+
+    def handle(self, *args, **options):
+        try:
+            today = timezone.now()
+
+            # 每日爬取正在进行时跳过，由每日爬取负责当天的全部链接
+            if redis_service.is_crawl_locked():
+                self.stdout.write(self.style.WARNING("每日爬取任务正在运行，跳过本次追加爬取。"))
+                logger.info("每日爬取任务正在运行，跳过追加爬取。")
+                return
+
+            if not redis_service.acquire_delta_crawl_lock():
+                self.stdout.write(self.style.WARNING("上一次追加爬取尚未结束，跳过本次执行。"))
+                logger.warning("获取追加爬取锁失败，跳过。")
+                return
+
+            task = RedisCrawlTask.create(
+                task_name=f'追加爬取-{today.strftime("%Y-%m-%d %H:%M")}',
+                target_url='http://www.people.com.cn/GB/59476/index.html',
+                task_type='delta'
+            )
+            run_delta_crawl_task.delay(task.id, backend=options.get('backend'))
+
+            logger.info(f"成功启动追加爬取任务，Task ID: {task.id}")
+            self.stdout.write(self.style.SUCCESS(f"成功启动追加爬取任务，Task ID: {task.id}"))
+
+        except Exception as e:
+            logger.error(f"执行追加爬取命令失败: {str(e)}")
+            self.stderr.write(self.style.ERROR(f"执行任务时发生错误: {e}"))
+            redis_service.release_delta_crawl_lock()
@@ -0,0 +1,146 @@
+"""
+文章 Markdown 渲染与缓存
+文章内容在爬取后不再变化，Markdown（含推广内容过滤）在保存文章时生成一次，
+以 gzip 压缩形式存入 Redis，读取时一次 HGETALL 即可直接返回压缩数据：
+    article_md:v{版本}:{文章ID}   哈希：gzip（压缩后的 Markdown）、etag、title、base_views
+阅读量会随每次访问变化，不写入 Markdown 正文，而是通过 X-View-Count 响应头返回。
+修改渲染模板或过滤规则时递增 RENDER_VERSION，旧版本的缓存会被自动忽略并在访问时重新生成。
+"""
+
+import re
+import gzip
+import json
+import hashlib
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+RENDER_VERSION = 1
+
+# 推广类内容关键词（含常见变体），命中的行会被过滤
+PROMO_KEYWORDS = [
+    '关注公众号', '关注 公众号', '公众号', '二维码', '扫码', '微信', '微博', '客户端', '订阅', '官微'
+]
+
+# 按需生成的缓存（如从归档读取的文章）的过期时间
+LAZY_RENDER_TTL = 86400
+
+
+def filter_promo_content(md_text):
+    """过滤“关注公众号/二维码/扫码”等推广类内容所在的行，并收敛多余空行"""
+    if not md_text:
+        return md_text
+    filtered_lines = []
+    for line in md_text.split('\n'):
+        normalized = line.strip()
+        # 含关键词的纯文本行和图片行（alt 或链接中含关键词）均跳过
+        if normalized and any(k in normalized for k in PROMO_KEYWORDS):
+            continue
+        filtered_lines.append(line)
+    md_text = '\n'.join(filtered_lines)
+    md_text = re.sub(r"\n{3,}", "\n\n", md_text)
+    return md_text.strip()
+
+
+def _format_datetime(value, fmt):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime(fmt)
+        except ValueError:
+            return value
+    if value is None:
+        return value
+    return value.strftime(fmt)
+
+
+def render_article_markdown(article_data):
+    """把文章字典渲染为 Markdown 文档（不含阅读量）"""
+    publish_date_str = _format_datetime(article_data.get('publish_date'), '%Y年%m月%d日 %H:%M')
+    created_at_str = _format_datetime(article_data.get('created_at'), '%Y-%m-%d %H:%M:%S')
+    url = article_data.get('url')
+
+    markdown_content = f"""# {article_data.get('title')}
+
+                        **来源**: {article_data.get('source')}  
+                        **发布时间**: {publish_date_str}  
+                        **分类**: {article_data.get('category')}  
+                        **字数**: {article_data.get('word_count', 0)}  
+                        **原文链接**: [{url}]({url})
+
+                        ---
+
+                        {article_data.get('markdown_content', '')}
+
+                        ---
+
+                        *本文由人民网爬虫系统自动采集整理*  
+                        *采集时间: {created_at_str}*
+                        """
+    # 最后一步过滤（确保旧缓存中的推广内容被清理）
+    return filter_promo_content(markdown_content)
+
+
+def build_rendition(article_data):
+    """渲染并压缩，返回写入缓存的字段"""
+    markdown_bytes = render_article_markdown(article_data).encode('utf-8')
+    return {
+        'gzip': gzip.compress(markdown_bytes, compresslevel=9, mtime=0),
+        'etag': hashlib.sha256(markdown_bytes).hexdigest()[:32],
+        'title': article_data.get('title') or '',
+        'base_views': article_data.get('view_count') or 0,
+    }
+
+
+class ArticleMarkdownCache:
+    """文章 Markdown 的预渲染缓存"""
+
+    def __init__(self, service):
+        """
+        Args:
+            service: RedisService 实例（写入使用其 pipeline，读取使用二进制客户端）
+        """
+        self.service = service
+
+    def key(self, article_id):
+        return f"article_md:v{RENDER_VERSION}:{article_id}"
+
+    def queue(self, pipe, article_data, expire_time):
+        """保存文章时把渲染结果加入同一个 pipeline，只渲染爬取成功的文章"""
+        if article_data.get('crawl_status') != 'success':
+            return
+        key = self.key(article_data['id'])
+        pipe.delete(key)
+        pipe.hset(key, mapping=build_rendition(article_data))
+        pipe.expire(key, expire_time)
+
+    def get(self, article_id):
+        """
+        获取文章的预渲染结果，缓存缺失时从文章数据（Redis 或归档）生成并写入缓存
+
+        Returns:
+            {'gzip': bytes, 'etag': str, 'title': str, 'base_views': int}，文章不存在或未爬取成功时返回 None
+        """
+        raw = self.service.binary_client.hgetall(self.key(article_id))
+        if raw:
+            return {
+                'gzip': raw[b'gzip'],
+                'etag': raw[b'etag'].decode('utf-8'),
+                'title': raw[b'title'].decode('utf-8'),
+                'base_views': int(raw.get(b'base_views') or 0),
+            }
+
+        article_json = self.service.redis_client.get(f"article:{article_id}")
+        article_data = json.loads(article_json) if article_json else self.service.archive.get(article_id)
+        if not article_data or article_data.get('crawl_status') != 'success':
+            return None
+
+        rendition = build_rendition(article_data)
+        try:
+            pipe = self.service.binary_client.pipeline(transaction=True)
+            pipe.hset(self.key(article_id), mapping=rendition)
+            pipe.expire(self.key(article_id), LAZY_RENDER_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"缓存文章Markdown失败: {str(e)}")
+        return rendition
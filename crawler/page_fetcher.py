@@ -0,0 +1,166 @@
+"""
+文章页分层抓取
+优先使用带连接池的 HTTP 会话（gzip + 条件请求）获取静态页面，只有内容提取失败时才升级到无头浏览器
+"""
+
+import hashlib
+import threading
+import time
+import logging
+import requests
+import lxml.html
+from requests.adapters import HTTPAdapter
+
+from .config import CRAWLER_CONFIG
+from .redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+def decode_html(content, encoding=None):
+    """按响应头或页面声明的编码解码HTML（人民网多为 GB2312/GBK）"""
+    if not encoding or encoding.lower() == 'iso-8859-1':
+        declared = requests.utils.get_encodings_from_content(content[:2048].decode('ascii', 'ignore'))
+        encoding = declared[0] if declared else None
+    if encoding and encoding.lower() in ('gb2312', 'gbk'):
+        encoding = 'gb18030'
+    try:
+        return content.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+class TieredPageFetcher:
+    """文章页分层抓取器：HTTP 优先，浏览器兜底，并统计各层命中率"""
+
+    TIERS = ('http', 'http_not_modified', 'browser', 'failed')
+
+    def __init__(self, session, browser_pool, extractor):
+        """
+        Args:
+            session: 已配置请求头的 requests.Session
+            browser_pool: 浏览器池，用于 HTTP 层提取失败时兜底
+            extractor: 从整页HTML中提取文章主体元素（lxml）的函数，失败时返回 None
+        """
+        self.session = session
+        self.browser_pool = browser_pool
+        self.extractor = extractor
+        self.timeout = CRAWLER_CONFIG['http_timeout']
+        self.cache_ttl = CRAWLER_CONFIG['http_cache_ttl']
+
+        # 连接池大小与并发抓取数保持一致，保证 keep-alive 连接可被复用
+        adapter = HTTPAdapter(pool_connections=CRAWLER_CONFIG['max_workers'], pool_maxsize=CRAWLER_CONFIG['max_workers'])
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._hits = {tier: 0 for tier in self.TIERS}
+        self._seconds = {tier: 0.0 for tier in self.TIERS}
+
+    def fetch_article(self, url):
+        """
+        获取文章主体HTML
+
+        Returns:
+            (article_html, tier)，所有层都失败时 article_html 为 None，tier 为 'failed'
+        """
+        started = time.monotonic()
+        try:
+            article_content, not_modified = self._fetch_http(url)
+            if article_content is not None:
+                tier = 'http_not_modified' if not_modified else 'http'
+                self.record(tier, started)
+                return article_content, tier
+        except requests.RequestException as e:
+            logger.warning(f"HTTP 抓取失败，升级到浏览器: {url} - {str(e)}")
+
+        browser_started = time.monotonic()
+        try:
+            with self.browser_pool.lease() as driver:
+                driver.get(url)
+                page_source = driver.page_source
+            article_content = self.extractor(page_source)
+            if article_content is not None:
+                self.record('browser', browser_started)
+                return article_content, 'browser'
+        except Exception as e:
+            logger.error(f"浏览器抓取失败: {url} - {str(e)}")
+
+        self.record('failed', started)
+        return None, 'failed'
+
+    def _fetch_http(self, url):
+        """
+        使用 HTTP 会话抓取页面并提取文章主体，带 ETag/Last-Modified 条件请求。返回 (文章主体, 是否命中304)
+        缓存中只保存校验器和提取出的文章主体HTML，不保存整页
+        """
+        cache_key = f"http_cache:{hashlib.md5(url.encode('utf-8')).hexdigest()}"
+        cached = self._get_cached_page(cache_key)
+
+        headers = {}
+        # 没有缓存文章主体时（如旧格式的整页缓存）不发条件请求，304 无法使用
+        if cached.get('article'):
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and cached.get('article'):
+            return lxml.html.fragment_fromstring(cached['article']), True
+
+        if response.status_code != 200:
+            logger.warning(f"HTTP 抓取状态码异常: {response.status_code} - {url}")
+            return None, False
+
+        article_content = self.extractor(decode_html(response.content, response.encoding))
+        if article_content is None:
+            logger.info(f"HTTP 页面未能提取到正文，升级到浏览器: {url}")
+            return None, False
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self._cache_page(cache_key, {
+                'etag': etag or '',
+                'last_modified': last_modified or '',
+                'article': lxml.html.tostring(article_content, encoding='unicode', with_tail=False),
+            })
+        return article_content, False
+
+    def _get_cached_page(self, cache_key):
+        try:
+            return redis_service.redis_client.hgetall(cache_key) or {}
+        except Exception as e:
+            logger.warning(f"读取页面缓存失败: {str(e)}")
+            return {}
+
+    def _cache_page(self, cache_key, mapping):
+        try:
+            pipe = redis_service.redis_client.pipeline()
+            pipe.delete(cache_key)  # 同时清除旧格式缓存中的整页 body
+            pipe.hset(cache_key, mapping=mapping)
+            pipe.expire(cache_key, self.cache_ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"写入页面缓存失败: {str(e)}")
+
+    def record(self, tier, started):
+        """记录一次抓取落在哪一层及耗时"""
+        with self._lock:
+            self._hits[tier] += 1
+            self._seconds[tier] += time.monotonic() - started
+
+    def get_stats(self):
+        """获取各层命中次数、命中率和平均耗时"""
+        with self._lock:
+            hits = dict(self._hits)
+            seconds = dict(self._seconds)
+        total = sum(hits.values())
+        return {
+            'total': total,
+            'hits': hits,
+            'hit_rates': {tier: round(count / total, 4) if total else 0.0 for tier, count in hits.items()},
+            'avg_seconds': {tier: round(seconds[tier] / count, 4) if count else 0.0 for tier, count in hits.items()},
+        }
@@ -76,6 +76,25 @@ class RedisNewsArticle:
             logger.error(f"保存文章失败: {str(e)}")
             return False
     
+    @classmethod
+    def save_many(cls, articles):
+        """批量保存文章，一次往返原子写入所有文章及索引，返回是否成功"""
+        try:
+            now = datetime.now()
+            for article in articles:
+                if not article.id:
+                    article.id = redis_service._generate_article_id()
+                if not article.created_at:
+                    article.created_at = now
+                article.updated_at = now
+            
+            article_ids = redis_service.save_articles([article.to_dict() for article in articles])
+            return len(article_ids) == len(articles)
+            
+        except Exception as e:
+            logger.error(f"批量保存文章失败: {str(e)}")
+            return False
+    
     @classmethod
     def get(cls, article_id):
         """根据ID获取文章"""
@@ -90,28 +109,47 @@ class RedisNewsArticle:
             return None
     
     @classmethod
-    def filter(cls, **kwargs):
-        """过滤文章"""
+    def _filter_ids(cls, category=None, crawl_status=None, date=None):
+        """
+        根据索引取文章ID，返回 (文章ID列表, 是否已按爬取状态过滤)。
+        按状态的索引只包含新格式保存的文章，为空时回退到每日列表再逐篇过滤。
+        """
+        if category:
+            return redis_service.get_articles_by_category(category), False
+        if crawl_status:
+            article_ids = redis_service.get_daily_articles(date, status=crawl_status)
+            if article_ids:
+                return article_ids, True
+        return redis_service.get_daily_articles(date), False
+    
+    @classmethod
+    def filter(cls, fields=None, **kwargs):
+        """
+        过滤文章
+        
+        Args:
+            fields: 只加载指定字段（如 ['id', 'title']），为 None 时加载完整文章
+            category / crawl_status / date: 过滤条件
+        """
         try:
-            # 支持的过滤条件
-            category = kwargs.get('category')
             crawl_status = kwargs.get('crawl_status')
-            date = kwargs.get('date')
+            article_ids, status_filtered = cls._filter_ids(
+                category=kwargs.get('category'),
+                crawl_status=crawl_status,
+                date=kwargs.get('date')
+            )
             
-            if category:
-                article_ids = redis_service.get_articles_by_category(category)
-            elif date:
-                article_ids = redis_service.get_daily_articles(date)
-            else:
-                # 默认获取今日文章
-                article_ids = redis_service.get_daily_articles()
+            load_fields = None
+            if fields:
+                load_fields = list(fields)
+                if crawl_status and not status_filtered and 'crawl_status' not in load_fields:
+                    load_fields.append('crawl_status')
             
             articles = []
-            for article_id in article_ids:
-                article_data = redis_service.get_article(article_id)
+            for article_data in redis_service.get_articles(article_ids, load_fields):
                 if article_data:
                     # 应用额外的过滤条件
-                    if crawl_status and article_data.get('crawl_status') != crawl_status:
+                    if crawl_status and not status_filtered and article_data.get('crawl_status') != crawl_status:
                         continue
                     articles.append(cls.from_dict(article_data))
             
@@ -121,19 +159,29 @@ class RedisNewsArticle:
             logger.error(f"过滤文章失败: {str(e)}")
             return []
     
+    @classmethod
+    def ids(cls, **kwargs):
+        """只获取符合条件的文章ID，不加载文章内容"""
+        try:
+            article_ids, status_filtered = cls._filter_ids(
+                category=kwargs.get('category'),
+                crawl_status=kwargs.get('crawl_status'),
+                date=kwargs.get('date')
+            )
+            if status_filtered or not kwargs.get('crawl_status'):
+                return article_ids
+            return [article.id for article in cls.filter(fields=['id'], **kwargs)]
+            
+        except Exception as e:
+            logger.error(f"获取文章ID失败: {str(e)}")
+            return []
+    
     @classmethod
     def search(cls, keyword):
         """搜索文章"""
         try:
             article_ids = redis_service.search_articles(keyword)
-            articles = []
-            
-            for article_id in article_ids:
-                article_data = redis_service.get_article(article_id)
-                if article_data:
-                    articles.append(cls.from_dict(article_data))
-            
-            return articles
+            return [cls.from_dict(article_data) for article_data in redis_service.get_articles(article_ids) if article_data]
             
         except Exception as e:
             logger.error(f"搜索文章失败: {str(e)}")
@@ -141,10 +189,21 @@ class RedisNewsArticle:
     
     @classmethod
     def count(cls, **kwargs):
-        """统计文章数量"""
+        """统计文章数量（能直接用索引时使用 SCARD）"""
         try:
-            articles = cls.filter(**kwargs)
-            return len(articles)
+            category = kwargs.get('category')
+            crawl_status = kwargs.get('crawl_status')
+            date = kwargs.get('date')
+            
+            if category and not crawl_status:
+                return redis_service.count_articles_by_category(category)
+            if not category:
+                if not crawl_status:
+                    return redis_service.count_daily_articles(date)
+                count = redis_service.count_daily_articles(date, status=crawl_status)
+                if count:
+                    return count
+            return len(cls.ids(**kwargs))
             
         except Exception as e:
             logger.error(f"统计文章数量失败: {str(e)}")
@@ -170,6 +229,7 @@ class RedisCrawlTask:
         self.success_count = kwargs.get('success_count', 0)
         self.failed_count = kwargs.get('failed_count', 0)
         self.error_message = kwargs.get('error_message', '')
+        self.metrics = kwargs.get('metrics', {})  # 运行指标（浏览器池等）
     
     def to_dict(self):
         """转换为字典"""
@@ -190,7 +250,8 @@ class RedisCrawlTask:
             'total_links': self.total_links,
             'success_count': self.success_count,
             'failed_count': self.failed_count,
-            'error_message': self.error_message
+            'error_message': self.error_message,
+            'metrics': self.metrics
         }
     
     @classmethod
@@ -236,7 +297,42 @@ class RedisCrawlTask:
         except Exception as e:
             logger.error(f"更新任务失败: {str(e)}")
             return False
-    
+
+    @property
+    def stages(self):
+        """各阶段耗时汇总（次数、p50/p95/最大耗时、总耗时），运行中随进度更新"""
+        return (self.metrics or {}).get('stages', {})
+
+    @property
+    def duration_seconds(self):
+        """任务耗时（秒），运行中的任务计算到当前时间，未开始时返回 None"""
+        try:
+            started_at = datetime.fromisoformat(self.started_at) if isinstance(self.started_at, str) else self.started_at
+            if not started_at:
+                return None
+            completed_at = self.completed_at
+            if isinstance(completed_at, str):
+                completed_at = datetime.fromisoformat(completed_at)
+            if not completed_at:
+                completed_at = timezone.now() if timezone.is_aware(started_at) else datetime.now()
+            return max((completed_at - started_at).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def save_article_timings(self, timings):
+        """保存每篇文章的各阶段耗时（文章地址 -> {阶段: 毫秒, total_ms}）"""
+        return redis_service.save_task_article_timings(self.id, timings)
+
+    def get_article_timings(self):
+        """获取每篇文章的各阶段耗时"""
+        return redis_service.get_task_article_timings(self.id)
+
+    def slowest_articles(self, limit=5):
+        """总耗时最长的文章及其各阶段耗时"""
+        timings = self.get_article_timings()
+        ranked = sorted(timings.items(), key=lambda item: item[1].get('total_ms', 0), reverse=True)
+        return [dict(entry, url=url) for url, entry in ranked[:limit]]
+
     @classmethod
     def get(cls, task_id):
         """根据ID获取任务"""
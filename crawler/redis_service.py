@@ -1,12 +1,58 @@
-import redis
 import json
 import logging
+import threading
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.conf import settings
+from legacy_pi_backend.instrumentation import TimedRedis
+
+from .search_index import ArticleSearchIndex
+from .article_archive import article_archive
+from .markdown_renderer import ArticleMarkdownCache
+from .crawl_registry import CrawlRegistry
 
 logger = logging.getLogger(__name__)
 
+# 文章摘要字段：保存时额外写入 article_meta:{id} 哈希，列表类查询只读这些字段，不反序列化正文
+ARTICLE_META_FIELDS = (
+    'id', 'title', 'url', 'source', 'category', 'publish_date', 'crawl_status',
+    'word_count', 'image_count', 'created_at', 'updated_at'
+)
+ARTICLE_INT_FIELDS = ('word_count', 'image_count', 'view_count')
+
+# 阅读量计数保留天数（按天的计数哈希和独立读者 HyperLogLog）
+VIEW_COUNTER_TTL = 86400 * 8
+
+# 分配当天修订号并登记本批爬取成功的文章（在保存文章的 MULTI 中执行，修订号随事务一起生效）
+# KEYS: daily_revision:{date}, daily_revisions:{date}；ARGV: 过期时间, 文章ID...
+ASSIGN_REVISION_SCRIPT = """
+local revision = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+for i = 2, #ARGV do
+    redis.call('ZADD', KEYS[2], revision, ARGV[i])
+end
+if #ARGV > 1 then
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+end
+return revision
+"""
+
+# 在服务端合并任务字段，读取和写入在一次往返中完成（任务不存在时返回 0）
+# cjson 会把空数组编码为 {}，任务字段中不使用列表
+# KEYS: task:{id}；ARGV: 要更新的字段(JSON), 过期时间
+UPDATE_TASK_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return 0
+end
+local task = cjson.decode(current)
+for field, value in pairs(cjson.decode(ARGV[1])) do
+    task[field] = value
+end
+redis.call('SET', KEYS[1], cjson.encode(task), 'EX', ARGV[2])
+return 1
+"""
+
 class RedisService:
     """Redis服务类，用于管理爬虫数据的缓存"""
     
@@ -23,7 +69,23 @@ class RedisService:
         if redis_password:
             redis_config['password'] = redis_password
         
-        self.redis_client = redis.Redis(**redis_config)
+        self.redis_client = TimedRedis(**redis_config)
+        # 二进制客户端：不解码响应，用于直接存取图片等原始字节
+        self.binary_client = TimedRedis(**dict(redis_config, decode_responses=False))
+        self._update_task_script = self.redis_client.register_script(UPDATE_TASK_SCRIPT)
+        
+        # 保证同一进程内生成的文章ID不重复（批量保存时同一毫秒内会生成多个ID）
+        self._id_lock = threading.Lock()
+        self._last_article_ms = 0
+        
+        # 文章全文检索索引
+        self.search_index = ArticleSearchIndex(self)
+        # 磁盘归档：Redis 中没有的文章从归档读取
+        self.archive = article_archive
+        # 预渲染的文章 Markdown
+        self.markdown_cache = ArticleMarkdownCache(self)
+        # 增量爬取登记表（已入库文章的 URL 指纹）
+        self.crawl_registry = CrawlRegistry(self)
         
     def test_connection(self):
         """测试Redis连接"""
@@ -36,69 +98,373 @@ class RedisService:
     
     # 文章相关操作
     def save_article(self, article_data):
-        """保存文章到Redis"""
+        """保存文章到Redis（文章数据和所有索引在一个事务中写入）"""
+        article_ids = self.save_articles([article_data])
+        return article_ids[0] if article_ids else None
+    
+    def save_articles(self, articles_data):
+        """
+        批量保存文章，所有文章及其索引、本批的修订号在一次 MULTI/EXEC 中原子写入；
+        重新保存已有文章时，写入前先用一次 pipeline 读出旧的索引词项
+        
+        Returns:
+            按顺序返回文章ID列表，失败时返回空列表
+        """
+        if not articles_data:
+            return []
         try:
-            article_id = article_data.get('id') or self._generate_article_id()
-            article_data['id'] = article_id
-            article_data['created_at'] = datetime.now().isoformat()
-            article_data['updated_at'] = datetime.now().isoformat()
-            
-            # 将文章数据序列化为JSON
-            article_json = json.dumps(article_data, ensure_ascii=False)
-            
-            # 保存文章数据
-            key = f"article:{article_id}"
-            self.redis_client.set(key, article_json, ex=86400*2)  # 2天过期
-            
-            # 添加到今日文章列表
-            today = timezone.now().date().isoformat()
-            self.redis_client.sadd(f"daily_articles:{today}", article_id)
-            self.redis_client.expire(f"daily_articles:{today}", 86400*2)  # 2天过期
-            
-            # 添加到按分类索引
-            category = article_data.get('category', 'unknown')
-            self.redis_client.sadd(f"category:{category}", article_id)
-            self.redis_client.expire(f"category:{category}", 86400*2)
-            
-            logger.info(f"文章已保存到Redis: {article_id}")
-            return article_id
+            # 重新保存已有文章时，先读出其旧的索引词项
+            existing_ids = [article_data['id'] for article_data in articles_data if article_data.get('id')]
+            previous_terms = dict(zip(existing_ids, self.search_index.get_indexed_terms(existing_ids))) if existing_ids else {}
+            
+            pipe = self.redis_client.pipeline(transaction=True)
+            article_ids = [
+                self._queue_article(pipe, article_data, previous_terms.get(article_data.get('id')))
+                for article_data in articles_data
+            ]
+            
+            # 每批文章分配一个当天递增的修订号，客户端据此只获取新增的文章（重新保存时更新为新的修订号）
+            # 使用 EVAL 而不是注册脚本：事务中的 EVALSHA 每次执行前都要多一次 SCRIPT EXISTS 往返
+            today = timezone.localdate().isoformat()
+            succeeded = [
+                article_id for article_id, article_data in zip(article_ids, articles_data)
+                if article_data.get('crawl_status') == 'success'
+            ]
+            pipe.eval(ASSIGN_REVISION_SCRIPT, 2, f"daily_revision:{today}", f"daily_revisions:{today}", 86400*2, *succeeded)
+            pipe.execute()
+            
+            logger.info(f"文章已保存到Redis: {', '.join(article_ids)}")
+            return article_ids
             
         except Exception as e:
             logger.error(f"保存文章到Redis失败: {str(e)}")
-            return None
+            return []
+    
+    def _queue_article(self, pipe, article_data, previous_terms=None):
+        """把保存一篇文章所需的命令加入 pipeline，返回文章ID"""
+        article_id = article_data.get('id') or self._generate_article_id()
+        article_data['id'] = article_id
+        article_data['created_at'] = datetime.now().isoformat()
+        article_data['updated_at'] = datetime.now().isoformat()
+        
+        # 将文章数据序列化为JSON
+        article_json = json.dumps(article_data, ensure_ascii=False)
+        
+        # 保存文章数据
+        pipe.set(f"article:{article_id}", article_json, ex=86400*2)  # 2天过期
+        
+        # 保存摘要字段，供列表类查询按字段读取
+        meta_key = f"article_meta:{article_id}"
+        pipe.delete(meta_key)
+        pipe.hset(meta_key, mapping={
+            field: '' if article_data.get(field) is None else article_data[field]
+            for field in ARTICLE_META_FIELDS
+        })
+        pipe.expire(meta_key, 86400*2)
+        
+        # 添加到今日文章列表
+        today = timezone.localdate().isoformat()
+        pipe.sadd(f"daily_articles:{today}", article_id)
+        pipe.expire(f"daily_articles:{today}", 86400*2)  # 2天过期
+        
+        # 添加到今日按爬取状态索引
+        status = article_data.get('crawl_status') or 'pending'
+        pipe.sadd(f"daily_articles:{today}:{status}", article_id)
+        pipe.expire(f"daily_articles:{today}:{status}", 86400*2)
+        
+        # 添加到按分类索引
+        category = article_data.get('category', 'unknown')
+        pipe.sadd(f"category:{category}", article_id)
+        pipe.expire(f"category:{category}", 86400*2)
+        
+        # 登记 URL 指纹和正文哈希（增量爬取的检查点）
+        self.crawl_registry.queue_mark(pipe, article_data, today)
+        
+        # 预渲染 Markdown（压缩保存）
+        self.markdown_cache.queue(pipe, article_data, 86400*2)
+        
+        # 建立全文检索索引
+        self.search_index.queue_document(pipe, article_data, previous_terms)
+        return article_id
     
     def get_article(self, article_id):
-        """根据ID获取文章"""
+        """根据ID获取文章（只读，阅读量从独立的计数器读取）"""
         try:
-            key = f"article:{article_id}"
-            article_json = self.redis_client.get(key)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.get(f"article:{article_id}")
+            pipe.hget("article_views:total", article_id)
+            article_json, views = pipe.execute()
             
             if article_json:
                 article_data = json.loads(article_json)
-                # 增加阅读量
-                article_data['view_count'] = article_data.get('view_count', 0) + 1
-                self.redis_client.set(key, json.dumps(article_data, ensure_ascii=False), ex=86400*2)
-                return article_data
             else:
-                return None
+                article_data = self.archive.get(article_id)
+                if article_data is None:
+                    return None
+            article_data['view_count'] = article_data.get('view_count', 0) + int(views or 0)
+            return article_data
                 
         except Exception as e:
             logger.error(f"获取文章失败: {str(e)}")
             return None
     
-    def get_daily_articles(self, date=None):
-        """获取指定日期的文章ID列表"""
+    # 阅读量统计
+    def record_article_view(self, article_id, reader=None, date=None):
+        """
+        记录一次文章阅读，不改写文章本身
+        
+        Args:
+            article_id: 文章ID
+            reader: 读者标识（如客户端IP），用于按天统计独立读者数
+            
+        Returns:
+            该文章累计阅读量，失败时返回 None
+        """
         try:
-            if date is None:
-                date = timezone.now().date().isoformat()
+            date = date or timezone.localdate().isoformat()
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hincrby("article_views:total", article_id, 1)
+            pipe.hincrby(f"article_views:{date}", article_id, 1)
+            pipe.expire(f"article_views:{date}", VIEW_COUNTER_TTL)
+            if reader:
+                pipe.pfadd(f"article_readers:{date}:{article_id}", reader)
+                pipe.expire(f"article_readers:{date}:{article_id}", VIEW_COUNTER_TTL)
+            return pipe.execute()[0]
             
-            article_ids = self.redis_client.smembers(f"daily_articles:{date}")
+        except Exception as e:
+            logger.error(f"记录阅读量失败: {str(e)}")
+            return None
+    
+    def flush_view_stats(self, date=None, top_n=10):
+        """
+        把某天的阅读计数汇总写入统计（总阅读量、独立读者数、热门文章），
+        一般在次日由每日任务调用，汇总结果保存在 view_stats:{date}
+        """
+        try:
+            date = date or timezone.localdate().isoformat()
+            counts = {article_id: int(count) for article_id, count in self.redis_client.hgetall(f"article_views:{date}").items()}
+            
+            unique_readers = 0
+            if counts:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for article_id in counts:
+                    pipe.pfcount(f"article_readers:{date}:{article_id}")
+                readers = dict(zip(counts, pipe.execute()))
+                # 多个 HyperLogLog 合并计数即为当天的独立读者总数
+                unique_readers = self.redis_client.pfcount(*[f"article_readers:{date}:{article_id}" for article_id in counts])
+            else:
+                readers = {}
+            
+            top_articles = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:top_n]
+            view_stats = {
+                'date': date,
+                'total_views': sum(counts.values()),
+                'articles_viewed': len(counts),
+                'unique_readers': unique_readers,
+                'top_articles': [
+                    {'article_id': article_id, 'views': views, 'unique_readers': readers.get(article_id, 0)}
+                    for article_id, views in top_articles
+                ],
+                'flushed_at': datetime.now().isoformat()
+            }
+            self.redis_client.set(f"view_stats:{date}", json.dumps(view_stats, ensure_ascii=False), ex=86400*30)
+            logger.info(f"阅读统计已汇总: {date}, 总阅读量 {view_stats['total_views']}")
+            return view_stats
+            
+        except Exception as e:
+            logger.error(f"汇总阅读统计失败: {str(e)}")
+            return None
+    
+    def get_view_stats(self, date):
+        """获取已汇总的某天阅读统计"""
+        try:
+            view_stats = self.redis_client.get(f"view_stats:{date}")
+            return json.loads(view_stats) if view_stats else None
+        except Exception as e:
+            logger.error(f"获取阅读统计失败: {str(e)}")
+            return None
+    
+    def get_articles(self, article_ids, fields=None):
+        """
+        批量获取文章，按 article_ids 顺序返回字典列表（不存在的文章为 None）
+        
+        Args:
+            article_ids: 文章ID列表
+            fields: 需要的字段；为 None 时用 MGET 读取完整文章，
+                    只包含摘要字段（及 view_count）时从 article_meta 哈希按字段读取，不反序列化正文
+        """
+        if not article_ids:
+            return []
+        try:
+            fields = list(fields) if fields else None
+            if fields and set(fields) <= set(ARTICLE_META_FIELDS) | {'view_count'}:
+                articles = self._get_article_meta(article_ids, [f for f in fields if f != 'view_count'])
+            else:
+                articles = [json.loads(article_json) if article_json else None
+                            for article_json in self.redis_client.mget([f"article:{article_id}" for article_id in article_ids])]
+            
+            # Redis 中已过期或已清理的文章从归档读取
+            missing = [index for index, article_data in enumerate(articles) if article_data is None]
+            for index, article_data in zip(missing, self.archive.get_many([article_ids[index] for index in missing])):
+                articles[index] = article_data
+            
+            if fields is None or 'view_count' in fields:
+                views = self.redis_client.hmget("article_views:total", article_ids)
+                for article_data, count in zip(articles, views):
+                    if article_data is not None:
+                        article_data['view_count'] = article_data.get('view_count', 0) + int(count or 0)
+            
+            if fields:
+                articles = [{field: article_data.get(field) for field in fields} if article_data is not None else None
+                            for article_data in articles]
+            return articles
+            
+        except Exception as e:
+            logger.error(f"批量获取文章失败: {str(e)}")
+            return [None] * len(article_ids)
+    
+    def _get_article_meta(self, article_ids, fields):
+        """用 pipeline 按字段读取文章摘要；缺少摘要哈希的旧文章回退为读取完整文章"""
+        fields = fields or ['id']
+        pipe = self.redis_client.pipeline(transaction=False)
+        for article_id in article_ids:
+            pipe.hmget(f"article_meta:{article_id}", fields)
+        articles = []
+        missing = []
+        for index, values in enumerate(pipe.execute()):
+            if all(value is None for value in values):
+                articles.append(None)
+                missing.append(index)
+                continue
+            article_data = {}
+            for field, value in zip(fields, values):
+                if value == '':
+                    value = None
+                elif value is not None and field in ARTICLE_INT_FIELDS:
+                    value = int(value)
+                article_data[field] = value
+            articles.append(article_data)
+        
+        if missing:
+            fallback = self.redis_client.mget([f"article:{article_ids[index]}" for index in missing])
+            for index, article_json in zip(missing, fallback):
+                if article_json:
+                    articles[index] = json.loads(article_json)
+        return articles
+    
+    def get_daily_articles(self, date=None, status=None):
+        """获取指定日期的文章ID列表，可按爬取状态过滤"""
+        try:
+            if date is None:
+                date = timezone.localdate().isoformat()
+            
+            key = f"daily_articles:{date}:{status}" if status else f"daily_articles:{date}"
+            article_ids = self.redis_client.smembers(key)
+            if not article_ids and not self.redis_client.exists(f"daily_articles:{date}"):
+                # 当天的索引已不在 Redis 中（已清理或 Redis 重启），从归档索引读取
+                return [article['id'] for article in self.archive.list_day(date)
+                        if not status or article.get('crawl_status') == status]
             return list(article_ids)
             
         except Exception as e:
             logger.error(f"获取每日文章列表失败: {str(e)}")
             return []
     
+    def get_daily_version(self, date=None):
+        """获取每日文章列表的修订号和爬取状态（一次往返），用于条件请求"""
+        if date is None:
+            date = timezone.localdate().isoformat()
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.get(f"daily_revision:{date}")
+        pipe.get(f"crawl_status:{date}")
+        version, status = pipe.execute()
+        return int(version or 0), status
+    
+    def get_daily_delta(self, since_revision, date=None):
+        """
+        获取指定修订号之后新增（或重新保存）的爬取成功的文章
+        
+        Returns:
+            (当前修订号, 文章ID列表)，文章按修订号先后排列
+        """
+        try:
+            if date is None:
+                date = timezone.localdate().isoformat()
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.get(f"daily_revision:{date}")
+            pipe.zrangebyscore(f"daily_revisions:{date}", since_revision + 1, '+inf')
+            revision, article_ids = pipe.execute()
+            return int(revision or 0), article_ids
+            
+        except Exception as e:
+            logger.error(f"获取每日新增文章失败: {str(e)}")
+            return 0, []
+    
+    def count_daily_articles(self, date=None, status=None):
+        """用 SCARD 统计指定日期（及状态）的文章数量"""
+        try:
+            if date is None:
+                date = timezone.localdate().isoformat()
+            
+            key = f"daily_articles:{date}:{status}" if status else f"daily_articles:{date}"
+            count = self.redis_client.scard(key)
+            if not count and not self.redis_client.exists(f"daily_articles:{date}"):
+                return len(self.get_daily_articles(date, status))
+            return count
+            
+        except Exception as e:
+            logger.error(f"统计每日文章数量失败: {str(e)}")
+            return 0
+    
+    def get_articles_by_date_range(self, start_date, end_date, status=None):
+        """
+        按日期范围获取文章摘要，仍在 Redis 中的日期读取摘要哈希，其余日期读取归档索引
+        
+        Returns:
+            {日期: [文章摘要, ...]}
+        """
+        results = {}
+        day = start_date
+        while day <= end_date:
+            date = day.isoformat()
+            try:
+                article_ids = self.redis_client.smembers(f"daily_articles:{date}")
+                if article_ids:
+                    articles = [article for article in self.get_articles(list(article_ids), fields=ARTICLE_META_FIELDS + ('view_count',)) if article]
+                else:
+                    articles = self.archive.list_day(date)
+                    views = self.redis_client.hmget("article_views:total", [article['id'] for article in articles]) if articles else []
+                    for article, count in zip(articles, views):
+                        article['view_count'] = (article.get('view_count') or 0) + int(count or 0)
+                if status:
+                    articles = [article for article in articles if article.get('crawl_status') == status]
+                results[date] = articles
+            except Exception as e:
+                logger.error(f"获取 {date} 的文章失败: {str(e)}")
+                results[date] = []
+            day += timedelta(days=1)
+        return results
+    
+    def archive_daily_articles(self, date=None):
+        """把指定日期（默认今天）Redis 中的文章写入磁盘归档，返回归档数量"""
+        try:
+            if date is None:
+                date = timezone.localdate().isoformat()
+            article_ids = list(self.redis_client.smembers(f"daily_articles:{date}"))
+            return self.archive.write_day(date, self.get_articles(article_ids))
+            
+        except Exception as e:
+            logger.error(f"归档文章失败: {str(e)}")
+            return 0
+    
+    def count_articles_by_category(self, category):
+        """用 SCARD 统计分类文章数量"""
+        try:
+            return self.redis_client.scard(f"category:{category}")
+        except Exception as e:
+            logger.error(f"统计分类文章数量失败: {str(e)}")
+            return 0
+    
     def get_articles_by_category(self, category):
         """根据分类获取文章ID列表"""
         try:
@@ -109,45 +475,44 @@ class RedisService:
             logger.error(f"获取分类文章失败: {str(e)}")
             return []
     
-    def search_articles(self, keyword):
-        """搜索包含关键词的文章"""
+    def search_articles(self, keyword, limit=None):
+        """通过倒排索引搜索包含关键词的文章，按相关度返回文章ID列表"""
         try:
-            # 获取所有今日文章
-            today = timezone.now().date().isoformat()
-            article_ids = self.get_daily_articles(today)
-            
-            matching_articles = []
-            for article_id in article_ids:
-                article = self.get_article(article_id)
-                if article:
-                    title = article.get('title', '').lower()
-                    content = article.get('content', '').lower()
-                    if keyword.lower() in title or keyword.lower() in content:
-                        matching_articles.append(article_id)
-            
-            return matching_articles
+            return self.search_index.search_ids(keyword, limit=limit)
             
         except Exception as e:
             logger.error(f"搜索文章失败: {str(e)}")
             return []
     
     def clear_old_articles(self, days_to_keep=1):
-        """清理旧文章"""
+        """把旧文章转入磁盘归档后从 Redis 中清理"""
         try:
-            cutoff_date = timezone.now().date() - timedelta(days=days_to_keep)
+            cutoff_date = timezone.localdate() - timedelta(days=days_to_keep)
             cutoff_date_str = cutoff_date.isoformat()
             
             # 获取要删除的文章ID
             old_article_ids = self.redis_client.smembers(f"daily_articles:{cutoff_date_str}")
             
+            # 先转入磁盘归档（含截至目前的阅读量），归档失败时不删除
+            if old_article_ids:
+                self.archive.write_day(cutoff_date_str, self.get_articles(list(old_article_ids)))
+            
+            pipe = self.redis_client.pipeline(transaction=False)
             deleted_count = 0
             for article_id in old_article_ids:
-                # 删除文章数据
-                self.redis_client.delete(f"article:{article_id}")
+                # 删除文章数据、摘要、预渲染的 Markdown 和累计阅读量
+                pipe.delete(f"article:{article_id}", f"article_meta:{article_id}", self.markdown_cache.key(article_id))
+                pipe.hdel("article_views:total", article_id)
                 deleted_count += 1
             
-            # 删除日期索引
-            self.redis_client.delete(f"daily_articles:{cutoff_date_str}")
+            # 删除日期索引（含按状态的索引和修订记录）
+            pipe.delete(f"daily_articles:{cutoff_date_str}", f"daily_revisions:{cutoff_date_str}", f"daily_revision:{cutoff_date_str}")
+            for key in self.redis_client.scan_iter(match=f"daily_articles:{cutoff_date_str}:*"):
+                pipe.delete(key)
+            pipe.execute()
+            
+            # 检索索引按自己的保留天数清理，文章数据过期后仍可被搜索到
+            self.search_index.prune()
             
             logger.info(f"清理了 {deleted_count} 篇 {cutoff_date_str} 的文章")
             return deleted_count
@@ -167,13 +532,15 @@ class RedisService:
             
             task_json = json.dumps(task_data, ensure_ascii=False)
             
+            pipe = self.redis_client.pipeline(transaction=True)
             # 保存任务数据
             key = f"task:{task_id}"
-            self.redis_client.set(key, task_json, ex=86400*7)  # 7天过期
+            pipe.set(key, task_json, ex=86400*7)  # 7天过期
             
             # 添加到任务列表
-            self.redis_client.lpush("tasks", task_id)
-            self.redis_client.ltrim("tasks", 0, 99)  # 只保留最近100个任务
+            pipe.lpush("tasks", task_id)
+            pipe.ltrim("tasks", 0, 99)  # 只保留最近100个任务
+            pipe.execute()
             
             logger.info(f"任务已保存到Redis: {task_id}")
             return task_id
@@ -209,25 +576,44 @@ class RedisService:
             return []
     
     def update_task(self, task_id, updates):
-        """更新任务信息"""
+        """更新任务信息（Lua 脚本在服务端合并字段，一次往返且不会与并发更新互相覆盖）"""
         try:
-            task_data = self.get_task(task_id)
-            if task_data:
-                task_data.update(updates)
-                task_data['updated_at'] = datetime.now().isoformat()
-                
-                task_json = json.dumps(task_data, ensure_ascii=False)
-                key = f"task:{task_id}"
-                self.redis_client.set(key, task_json, ex=86400*7)
-                
-                return True
-            else:
-                return False
+            updates = dict(updates, updated_at=datetime.now().isoformat())
+            return bool(self._update_task_script(
+                keys=[f"task:{task_id}"],
+                args=[json.dumps(updates, ensure_ascii=False), 86400*7],
+                client=self.redis_client
+            ))
                 
         except Exception as e:
             logger.error(f"更新任务失败: {str(e)}")
             return False
-    
+
+    def save_task_article_timings(self, task_id, timings):
+        """保存任务中每篇文章的各阶段耗时（文章地址 -> 耗时），与任务同样保留7天"""
+        if not timings:
+            return True
+        try:
+            key = f"task_article_stages:{task_id}"
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.delete(key)
+            pipe.hset(key, mapping={url: json.dumps(entry) for url, entry in timings.items()})
+            pipe.expire(key, 86400*7)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"保存文章阶段耗时失败: {str(e)}")
+            return False
+
+    def get_task_article_timings(self, task_id):
+        """获取任务中每篇文章的各阶段耗时"""
+        try:
+            timings = self.redis_client.hgetall(f"task_article_stages:{task_id}")
+            return {url: json.loads(entry) for url, entry in timings.items()}
+        except Exception as e:
+            logger.error(f"获取文章阶段耗时失败: {str(e)}")
+            return {}
+
     def get_recent_tasks(self, limit=10):
         """获取最近的任务列表"""
         try:
@@ -249,7 +635,7 @@ class RedisService:
     def get_stats(self):
         """获取统计信息"""
         try:
-            today = timezone.now().date().isoformat()
+            today = timezone.localdate().isoformat()
             
             # 今日文章数量
             today_articles_count = self.redis_client.scard(f"daily_articles:{today}")
@@ -260,10 +646,16 @@ class RedisService:
             # 最近任务
             recent_tasks = self.get_recent_tasks(5)
             
+            # 今日实时阅读量和昨日汇总
+            today_views = sum(int(count) for count in self.redis_client.hvals(f"article_views:{today}"))
+            yesterday = (timezone.localdate() - timedelta(days=1)).isoformat()
+            
             return {
                 'today_articles_count': today_articles_count,
                 'total_tasks_count': total_tasks_count,
                 'recent_tasks': recent_tasks,
+                'today_views': today_views,
+                'yesterday_view_stats': self.get_view_stats(yesterday),
                 'redis_info': self.redis_client.info('memory')
             }
             
@@ -276,7 +668,7 @@ class RedisService:
         """获取每日爬取分布式锁（避免并发重复触发）。返回True表示获取成功。"""
         try:
             if date_str is None:
-                date_str = timezone.now().date().isoformat()
+                date_str = timezone.localdate().isoformat()
             key = f"crawl_lock:{date_str}"
             # NX: 不存在才设置; ex: 过期（两小时防止死锁）
             return bool(self.redis_client.set(key, "1", nx=True, ex=ttl_seconds))
@@ -288,7 +680,7 @@ class RedisService:
         """释放每日爬取锁。"""
         try:
             if date_str is None:
-                date_str = timezone.now().date().isoformat()
+                date_str = timezone.localdate().isoformat()
             key = f"crawl_lock:{date_str}"
             self.redis_client.delete(key)
             return True
@@ -296,11 +688,43 @@ class RedisService:
             logger.error(f"释放每日爬取锁失败: {str(e)}")
             return False
 
+    def acquire_delta_crawl_lock(self, date_str=None, ttl_seconds=1800):
+        """获取日内追加爬取锁，与每日爬取锁分开，过期时间短于追加爬取的调度间隔。返回True表示获取成功。"""
+        try:
+            if date_str is None:
+                date_str = timezone.localdate().isoformat()
+            return bool(self.redis_client.set(f"delta_crawl_lock:{date_str}", "1", nx=True, ex=ttl_seconds))
+        except Exception as e:
+            logger.error(f"获取追加爬取锁失败: {str(e)}")
+            return False
+
+    def release_delta_crawl_lock(self, date_str=None):
+        """释放日内追加爬取锁。"""
+        try:
+            if date_str is None:
+                date_str = timezone.localdate().isoformat()
+            self.redis_client.delete(f"delta_crawl_lock:{date_str}")
+            return True
+        except Exception as e:
+            logger.error(f"释放追加爬取锁失败: {str(e)}")
+            return False
+
+    def is_crawl_locked(self, delta=False, date_str=None):
+        """每日爬取（delta=True 时为追加爬取）的锁是否被持有。两者不能同时运行，否则同一链接可能被保存两次。"""
+        try:
+            if date_str is None:
+                date_str = timezone.localdate().isoformat()
+            key = f"delta_crawl_lock:{date_str}" if delta else f"crawl_lock:{date_str}"
+            return bool(self.redis_client.exists(key))
+        except Exception as e:
+            logger.error(f"检查爬取锁失败: {str(e)}")
+            return False
+
     def set_daily_crawl_status(self, status, date_str=None, ttl_seconds=172800):
         """设置每日爬取状态: running/completed/failed。默认两天过期。"""
         try:
             if date_str is None:
-                date_str = timezone.now().date().isoformat()
+                date_str = timezone.localdate().isoformat()
             key = f"crawl_status:{date_str}"
             self.redis_client.set(key, status, ex=ttl_seconds)
             return True
@@ -312,7 +736,7 @@ class RedisService:
         """获取每日爬取状态。可能返回None/running/completed/failed。"""
         try:
             if date_str is None:
-                date_str = timezone.now().date().isoformat()
+                date_str = timezone.localdate().isoformat()
             key = f"crawl_status:{date_str}"
             status = self.redis_client.get(key)
             return status
@@ -320,8 +744,11 @@ class RedisService:
             logger.error(f"获取每日爬取状态失败: {str(e)}")
             return None
     def _generate_article_id(self):
-        """生成文章ID"""
-        return f"article_{int(datetime.now().timestamp() * 1000)}"
+        """生成文章ID（毫秒时间戳，同一进程内单调递增）"""
+        with self._id_lock:
+            ms = max(int(datetime.now().timestamp() * 1000), self._last_article_ms + 1)
+            self._last_article_ms = ms
+        return f"article_{ms}"
     
     def _generate_task_id(self):
         """生成任务ID"""
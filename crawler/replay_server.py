@@ -0,0 +1,124 @@
+"""
+录制页面回放服务
+在本地启动一个 HTTP 服务，按清单（manifest.json）把人民网的列表页、文章页和图片地址映射到录制的文件，
+作为 HTTP 代理使用（设置 HTTP_PROXY 指向它），爬虫代码和其中的真实地址都不需要修改：
+
+    {
+      "routes": [
+        {"url": "http://www.people.com.cn/GB/59476/*", "file": "list.html"},
+        {"url": "http://*.people.com.cn/n1/*", "files": ["a.html", "b.html"]},
+        {"url": "http://*.people.com.cn/*.jpg", "file": "images/photo.jpg", "content_type": "image/jpeg"}
+      ]
+    }
+
+url 为 fnmatch 通配符，按顺序匹配第一条；files 有多个时按地址的哈希固定选择其中一个，
+少量录制的文章页即可组成任意数量的不同文章链接。未匹配的地址返回 404。
+"""
+
+import os
+import json
+import zlib
+import fnmatch
+import logging
+import mimetypes
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class RecordedSite:
+    """按清单把地址映射到录制文件，文件内容加载后缓存在内存中"""
+
+    def __init__(self, root):
+        self.root = str(root)
+        with open(os.path.join(self.root, 'manifest.json'), encoding='utf-8') as f:
+            self.routes = json.load(f)['routes']
+        self._files = {}
+        self._lock = threading.Lock()
+        self.hits = {}
+
+    def resolve(self, url):
+        """返回 (内容, Content-Type)，未匹配时返回 None"""
+        parts = urlsplit(url)
+        url = f"{parts.scheme}://{parts.netloc}{parts.path}"
+        for route in self.routes:
+            if not fnmatch.fnmatchcase(url, route['url']):
+                continue
+            files = route.get('files') or [route['file']]
+            name = files[zlib.crc32(url.encode('utf-8')) % len(files)]
+            with self._lock:
+                self.hits[route['url']] = self.hits.get(route['url'], 0) + 1
+            return self._load(name), route.get('content_type') or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        return None
+
+    def _load(self, name):
+        with self._lock:
+            body = self._files.get(name)
+        if body is None:
+            with open(os.path.join(self.root, name), 'rb') as f:
+                body = f.read()
+            with self._lock:
+                self._files[name] = body
+        return body
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._respond(include_body=True)
+
+    def do_HEAD(self):
+        self._respond(include_body=False)
+
+    def _respond(self, include_body):
+        # 作为代理时请求行是完整地址，直接访问时根据 Host 拼出地址
+        url = self.path if self.path.startswith('http') else f"http://{self.headers.get('Host', '')}{self.path}"
+        resolved = self.server.site.resolve(url)
+        if resolved is None:
+            body, content_type, status = b'not recorded', 'text/plain', 404
+        else:
+            (body, content_type), status = resolved, 200
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"回放服务: {format % args}")
+
+
+class ReplayServer:
+    """在后台线程中运行的回放服务"""
+
+    def __init__(self, root, host='127.0.0.1', port=0):
+        self.site = RecordedSite(root)
+        self.httpd = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.site = self.site
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='replay-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -0,0 +1,316 @@
+"""
+文章全文检索
+保存文章时建立倒排索引，查询时只读取命中的词项，不扫描文章正文。
+- 分词：中文按相邻两字切分（二元组），英文和数字按整词切分，不依赖分词词典；
+  建立索引时中文另外记录单字，单字查询（如“党”）也能命中
+- 存储（Redis）：
+    search_term:{词项}         有序集合，文章ID -> 该词项在文章中的权重
+    search_terms:{文章ID}      集合，文章包含的词项（重建或清理索引时使用）
+    search_doc:{文章ID}        哈希，标题、链接、分类、日期及用于高亮摘要的正文
+    search_category:{分类}     集合，按分类过滤时与检索结果求交集
+    search_docs                有序集合，文章ID -> 建立索引的时间，用于统计文档数和按保留天数清理
+    search_result:{查询}       有序集合，查询结果缓存，翻页时直接读取
+  索引独立于文章数据的过期时间，按 SEARCH_INDEX_CONFIG['retention_days'] 覆盖多日文章。
+"""
+
+import re
+import html
+import math
+import time
+import hashlib
+import logging
+
+from .config import SEARCH_INDEX_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'[\u4e00-\u9fff]+|[a-z0-9]+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def _is_cjk(text):
+    return '\u4e00' <= text[0] <= '\u9fff'
+
+
+def tokenize(text):
+    """把文本切分为词项列表：中文为二元组（单字成段时保留单字），英文和数字为小写整词"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or '').lower()):
+        if _is_cjk(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def index_terms(text):
+    """建立索引用的词项：在 tokenize 的基础上为多字的中文段补充单字，供单字查询命中"""
+    terms = tokenize(text)
+    for run in _TOKEN_RE.findall((text or '').lower()):
+        if _is_cjk(run) and len(run) > 1:
+            terms.extend(run)
+    return terms
+
+
+def highlight(text, tokens, length=None, pre_tag='<em>', post_tag='</em>'):
+    """
+    在文本中标出命中的词项，返回 HTML 转义后的片段
+
+    Args:
+        text: 原文
+        tokens: 查询词项
+        length: 摘要长度，为 None 时返回全文；否则截取第一个命中位置附近的片段
+    """
+    text = _SPACE_RE.sub(' ', text or '').strip()
+    lowered = text.lower()
+    spans = []
+    for token in set(tokens):
+        start = lowered.find(token)
+        while start != -1:
+            spans.append((start, start + len(token)))
+            start = lowered.find(token, start + 1)
+    spans.sort()
+
+    # 相邻或重叠的二元组合并为一段，整个词只标一次
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    window_start, window_end = 0, len(text)
+    if length and len(text) > length:
+        window_start = max(0, (merged[0][0] if merged else 0) - length // 4)
+        window_end = min(len(text), window_start + length)
+        window_start = max(0, window_end - length)
+
+    parts = ['…'] if window_start > 0 else []
+    cursor = window_start
+    for start, end in merged:
+        if end <= window_start or start >= window_end:
+            continue
+        start, end = max(start, window_start), min(end, window_end)
+        parts.append(html.escape(text[cursor:start]))
+        parts.append(f"{pre_tag}{html.escape(text[start:end])}{post_tag}")
+        cursor = end
+    parts.append(html.escape(text[cursor:window_end]))
+    if window_end < len(text):
+        parts.append('…')
+    return ''.join(parts)
+
+
+class ArticleSearchIndex:
+    """基于 Redis 有序集合的倒排索引"""
+
+    def __init__(self, service):
+        """
+        Args:
+            service: RedisService 实例（使用其文本客户端）
+        """
+        self.service = service
+        self.config = SEARCH_INDEX_CONFIG
+
+    @property
+    def client(self):
+        return self.service.redis_client
+
+    def get_indexed_terms(self, article_ids):
+        """批量读取文章已建立索引的词项，供重建索引时移除旧词项"""
+        pipe = self.client.pipeline(transaction=False)
+        for article_id in article_ids:
+            pipe.smembers(f"search_terms:{article_id}")
+        return pipe.execute()
+
+    def queue_document(self, pipe, article_data, previous_terms=None):
+        """
+        把一篇文章的索引写入命令加入 pipeline（与文章数据在同一事务中提交）
+
+        Args:
+            pipe: Redis pipeline
+            article_data: 文章字典
+            previous_terms: 文章此前建立索引的词项，重新保存时用于移除不再出现的词项
+        """
+        article_id = article_data['id']
+        title = article_data.get('title') or ''
+        content = article_data.get('content') or ''
+        weights = self._term_weights(title, content)
+        if not weights:
+            return
+
+        for term in set(previous_terms or ()) - set(weights):
+            pipe.zrem(f"search_term:{term}", article_id)
+        for term, weight in weights.items():
+            pipe.zadd(f"search_term:{term}", {article_id: weight})
+
+        ttl = self.config['retention_days'] * 86400
+        terms_key = f"search_terms:{article_id}"
+        pipe.delete(terms_key)
+        pipe.sadd(terms_key, *weights)
+        pipe.expire(terms_key, ttl)
+
+        doc_key = f"search_doc:{article_id}"
+        pipe.hset(doc_key, mapping={
+            'title': title,
+            'url': article_data.get('url') or '',
+            'source': article_data.get('source') or '',
+            'category': article_data.get('category') or '',
+            'publish_date': article_data.get('publish_date') or '',
+            'text': content[:self.config['max_stored_chars']],
+        })
+        pipe.expire(doc_key, ttl)
+
+        category = article_data.get('category')
+        if category:
+            pipe.sadd(f"search_category:{category}", article_id)
+            pipe.expire(f"search_category:{category}", ttl)
+        pipe.zadd("search_docs", {article_id: time.time()})
+
+    def index_documents(self, articles_data):
+        """为已保存的文章单独建立（或重建）索引，返回建立索引的数量"""
+        articles_data = [article_data for article_data in articles_data if article_data and article_data.get('id')]
+        if not articles_data:
+            return 0
+        article_ids = [article_data['id'] for article_data in articles_data]
+        pipe = self.client.pipeline(transaction=False)
+        for article_data, previous_terms in zip(articles_data, self.get_indexed_terms(article_ids)):
+            self.queue_document(pipe, article_data, previous_terms)
+        pipe.execute()
+        return len(articles_data)
+
+    def search(self, query, page=1, page_size=None, category=None):
+        """
+        检索文章，按相关度排序并分页
+
+        Returns:
+            {'query', 'total', 'page', 'page_size', 'results': [...]}，
+            每条结果包含文章信息、相关度得分以及高亮后的标题和摘要
+        """
+        page_size = min(page_size or self.config['page_size'], self.config['max_page_size'])
+        page = max(1, page)
+        tokens = list(dict.fromkeys(tokenize(query)))
+        empty = {'query': query, 'total': 0, 'page': page, 'page_size': page_size, 'results': []}
+        if not tokens:
+            return empty
+
+        result_key = self._result_key(tokens, category)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.exists(result_key)
+        pipe.zcard(result_key)
+        pipe.zrevrange(result_key, (page - 1) * page_size, page * page_size - 1, withscores=True)
+        cached, total, hits = pipe.execute()
+        if not cached:
+            total, hits = self._execute_query(tokens, category, result_key, page, page_size)
+        if not hits:
+            return dict(empty, total=total)
+
+        pipe = self.client.pipeline(transaction=False)
+        for article_id, _ in hits:
+            pipe.hgetall(f"search_doc:{article_id}")
+        docs = pipe.execute()
+
+        results = []
+        for (article_id, score), doc in zip(hits, docs):
+            if not doc:
+                continue
+            results.append({
+                'id': article_id,
+                'title': doc.get('title', ''),
+                'url': doc.get('url', ''),
+                'source': doc.get('source', ''),
+                'category': doc.get('category', ''),
+                'publish_date': doc.get('publish_date', ''),
+                'score': round(score, 4),
+                'title_highlight': highlight(doc.get('title', ''), tokens),
+                'snippet': highlight(doc.get('text', ''), tokens, length=self.config['snippet_length']),
+            })
+        return dict(empty, total=total, results=results)
+
+    def search_ids(self, query, limit=None):
+        """只返回命中的文章ID（按相关度排序）"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        result_key = self._result_key(tokens, None)
+        if not self.client.exists(result_key):
+            self._execute_query(tokens, None, result_key, 1, 1)
+        return self.client.zrevrange(result_key, 0, (limit or 0) - 1)
+
+    def remove(self, article_ids):
+        """从索引中移除文章"""
+        if not article_ids:
+            return 0
+        pipe = self.client.pipeline(transaction=False)
+        for article_id in article_ids:
+            pipe.smembers(f"search_terms:{article_id}")
+            pipe.hget(f"search_doc:{article_id}", 'category')
+        values = pipe.execute()
+
+        pipe = self.client.pipeline(transaction=False)
+        for article_id, terms, category in zip(article_ids, values[::2], values[1::2]):
+            for term in terms:
+                pipe.zrem(f"search_term:{term}", article_id)
+            if category:
+                pipe.srem(f"search_category:{category}", article_id)
+        for article_id in article_ids:
+            pipe.delete(f"search_terms:{article_id}", f"search_doc:{article_id}")
+        pipe.zrem("search_docs", *article_ids)
+        pipe.execute()
+        return len(article_ids)
+
+    def prune(self, retention_days=None):
+        """移除超过保留天数的文章索引，返回移除数量"""
+        try:
+            retention_days = retention_days or self.config['retention_days']
+            cutoff = time.time() - retention_days * 86400
+            removed = 0
+            while True:
+                article_ids = self.client.zrangebyscore("search_docs", 0, cutoff, start=0, num=500)
+                if not article_ids:
+                    break
+                removed += self.remove(article_ids)
+            if removed:
+                logger.info(f"清理了 {removed} 篇文章的检索索引")
+            return removed
+
+        except Exception as e:
+            logger.error(f"清理检索索引失败: {str(e)}")
+            return 0
+
+    def _term_weights(self, title, content):
+        """计算词项权重：正文词频取对数抑制长文，标题命中额外加权"""
+        counts = {}
+        for term in index_terms(content):
+            counts[term] = counts.get(term, 0) + 1
+        weights = {term: 1 + math.log(count) for term, count in counts.items()}
+        for term in set(index_terms(title)):
+            weights[term] = weights.get(term, 0) + self.config['title_weight']
+        return weights
+
+    def _execute_query(self, tokens, category, result_key, page, page_size):
+        """求各词项的交集，按逆文档频率加权后写入结果缓存，返回 (总数, 当前页)"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zcard("search_docs")
+        for token in tokens:
+            pipe.zcard(f"search_term:{token}")
+        total_docs, *frequencies = pipe.execute()
+        if not all(frequencies):
+            return 0, []
+
+        keys = {
+            f"search_term:{token}": math.log(1 + total_docs / frequency)
+            for token, frequency in zip(tokens, frequencies)
+        }
+        if category:
+            keys[f"search_category:{category}"] = 0
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zinterstore(result_key, keys, aggregate='SUM')
+        pipe.expire(result_key, self.config['result_cache_ttl'])
+        pipe.zrevrange(result_key, (page - 1) * page_size, page * page_size - 1, withscores=True)
+        total, _, hits = pipe.execute()
+        return total, hits
+
+    def _result_key(self, tokens, category):
+        signature = hashlib.md5(f"{category or ''}|{' '.join(sorted(tokens))}".encode('utf-8')).hexdigest()
+        return f"search_result:{signature}"
@@ -0,0 +1,85 @@
+"""
+爬取阶段计时
+按阶段（discovery / fetch / parse / images / persist）记录每篇文章的耗时，汇总 p50/p95，
+结果写入任务的 metrics['stages']，基准测试据此比较各阶段是否变慢。
+记录时带上文章地址（key）会同时累计该文章各阶段的耗时，任务结束后按文章保存，便于定位慢文章。
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+
+def percentile(values, pct):
+    """最近秩法百分位数，values 为空时返回 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class StageTimer:
+    """线程安全的阶段耗时记录器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._articles = {}
+
+    @contextmanager
+    def time(self, stage, key=None):
+        """记录 with 块的耗时"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(stage, time.monotonic() - started, key)
+
+    def record(self, stage, seconds, key=None):
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+            if key is not None:
+                self._add_to_article(key, stage, seconds)
+
+    def record_batch(self, stage, seconds, keys):
+        """批量操作（如一次保存多篇文章）：阶段样本记一次，耗时按篇数平摊到每篇文章"""
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+            for key in keys:
+                self._add_to_article(key, stage, seconds / len(keys))
+
+    def _add_to_article(self, key, stage, seconds):
+        timings = self._articles.setdefault(key, {})
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._articles = {}
+
+    def summary(self):
+        """各阶段的次数、p50/p95/最大耗时(毫秒)和总耗时(秒)"""
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        return {
+            stage: {
+                'count': len(values),
+                'p50_ms': round(percentile(values, 50) * 1000, 2),
+                'p95_ms': round(percentile(values, 95) * 1000, 2),
+                'max_ms': round(max(values) * 1000, 2),
+                'total_s': round(sum(values), 3),
+            }
+            for stage, values in samples.items()
+        }
+
+    def article_timings(self):
+        """每篇文章各阶段耗时(毫秒)及合计 total_ms，按文章地址索引"""
+        with self._lock:
+            articles = {key: dict(timings) for key, timings in self._articles.items()}
+        result = {}
+        for key, timings in articles.items():
+            entry = {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}
+            entry['total_ms'] = round(sum(timings.values()) * 1000, 2)
+            result[key] = entry
+        return result
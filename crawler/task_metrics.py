@@ -0,0 +1,69 @@
+"""
+爬取任务指标导出
+把最近一次爬取任务的进度和各阶段耗时渲染为 Prometheus 文本格式（exposition format 0.0.4），
+各阶段耗时以 summary 形式输出 p50/p95 分位数、总耗时和次数，单位为秒。
+"""
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class _Exposition:
+    """按指标分组输出 HELP/TYPE 和样本行"""
+
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name, metric_type, help_text, samples):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+        for suffix, labels, value in samples:
+            self.lines.append(f"{name}{suffix}{_labels(**labels)} {value}")
+
+    def render(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def render_task_metrics(task):
+    """渲染任务指标；task 为 RedisCrawlTask，没有任务时只输出 crawler_task_running 0"""
+    out = _Exposition()
+    running = 1 if task and task.status == 'running' else 0
+    out.metric('crawler_task_running', 'gauge', '最近一次爬取任务是否正在运行', [('', {}, running)])
+    if task is None:
+        return out.render()
+
+    out.metric('crawler_task_info', 'gauge', '最近一次爬取任务', [
+        ('', {'task_id': task.id, 'task_type': task.task_type, 'status': task.status}, 1),
+    ])
+    out.metric('crawler_task_links', 'gauge', '最近一次爬取任务的新闻链接数', [('', {}, task.total_links or 0)])
+    out.metric('crawler_task_articles', 'gauge', '最近一次爬取任务已处理的文章数', [
+        ('', {'result': 'success'}, task.success_count or 0),
+        ('', {'result': 'failed'}, task.failed_count or 0),
+    ])
+    duration = task.duration_seconds
+    if duration is not None:
+        out.metric('crawler_task_duration_seconds', 'gauge', '最近一次爬取任务耗时（运行中为已运行时间）',
+                   [('', {}, round(duration, 3))])
+
+    stages = task.stages
+    if stages:
+        samples = []
+        for stage, summary in stages.items():
+            samples.append(('', {'stage': stage, 'quantile': '0.5'}, summary['p50_ms'] / 1000))
+            samples.append(('', {'stage': stage, 'quantile': '0.95'}, summary['p95_ms'] / 1000))
+            samples.append(('_sum', {'stage': stage}, summary['total_s']))
+            samples.append(('_count', {'stage': stage}, summary['count']))
+        out.metric('crawler_stage_duration_seconds', 'summary', '最近一次爬取任务各阶段耗时', samples)
+        out.metric('crawler_stage_duration_max_seconds', 'gauge', '最近一次爬取任务各阶段最大耗时', [
+            ('', {'stage': stage}, summary['max_ms'] / 1000) for stage, summary in stages.items()
+        ])
+    return out.render()
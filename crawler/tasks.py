@@ -1,21 +1,39 @@
 import logging
 from celery import shared_task
+from .config import CRAWLER_CONFIG
 from .services import PeopleNetCrawler
+from .async_pipeline import AsyncCrawlPipeline
 from .redis_service import redis_service
+from legacy_pi_backend.edge_cache import refresh_edge_cache
 
 logger = logging.getLogger(__name__)
 
 @shared_task
-def run_daily_crawler_task(task_id):
+def run_daily_crawler_task(task_id, backend=None, refresh=False):
     """
     这是一个 Celery 任务，它将在 Celery worker 中安全地运行。
+    backend 可选 'threaded'（线程池抓取）或 'async'（aiohttp 异步流水线），默认取 CRAWLER_BACKEND 配置。
+    已入库的文章不会重复抓取；refresh=True 时重新抓取全部链接，只保存新文章和内容有变化的文章。
     """
     try:
-        logger.info(f"Celery worker 开始执行每日爬取任务，任务ID: {task_id}")
-        crawler = PeopleNetCrawler()
-        result = crawler.crawl_today_news(task_id=task_id)
-        logger.info(f"每日爬取任务完成: {result}")
-        redis_service.set_daily_crawl_status('success')
+        backend = backend or CRAWLER_CONFIG['backend']
+        logger.info(f"Celery worker 开始执行每日爬取任务，任务ID: {task_id}，后端: {backend}")
+        if backend == 'async':
+            result = AsyncCrawlPipeline().run(task_id=task_id, refresh=refresh)
+        else:
+            crawler = PeopleNetCrawler()
+            result = crawler.crawl_today_news(task_id=task_id, refresh=refresh)
+        # 爬取失败时返回 success=False 而不抛出异常，此时不写归档，避免不完整的结果覆盖已有归档
+        if result.get('success'):
+            logger.info(f"每日爬取任务完成: {result}")
+            redis_service.set_daily_crawl_status('success')
+            # 同时写入磁盘归档，Redis 重启后无需重新爬取
+            redis_service.archive_daily_articles()
+            # 刷新 nginx 中缓存的当日文章列表（失败时保留缓存中的旧列表）
+            refresh_edge_cache(['/api/crawler/daily/'])
+        else:
+            logger.error(f"每日爬取任务失败: {result.get('message')}")
+            redis_service.set_daily_crawl_status('failed')
     except Exception as e:
         logger.error(f"每日爬取任务失败: {str(e)}", exc_info=True) # exc_info=True 会记录完整的堆栈跟踪
         redis_service.set_daily_crawl_status('failed')
@@ -23,4 +41,30 @@ def run_daily_crawler_task(task_id):
         # 释放锁
         redis_service.release_daily_crawl_lock()
         logger.info(f"Task {task_id} 执行完毕，释放锁。")
-    return "Task finished."
\ No newline at end of file
+    return "Task finished."
+
+@shared_task
+def run_delta_crawl_task(task_id, backend=None):
+    """
+    日内追加爬取：重新获取列表页，只抓取新出现的链接并追加到当日文章。
+    新文章保存时分配递增的修订号，客户端通过 daily/?since_revision= 只获取新增部分。
+    不改变每日爬取状态，结束后释放追加爬取锁。
+    """
+    try:
+        backend = backend or CRAWLER_CONFIG['backend']
+        logger.info(f"Celery worker 开始执行追加爬取任务，任务ID: {task_id}，后端: {backend}")
+        if backend == 'async':
+            result = AsyncCrawlPipeline().run(task_id=task_id, delta=True)
+        else:
+            crawler = PeopleNetCrawler()
+            result = crawler.crawl_today_news(task_id=task_id, delta=True)
+        logger.info(f"追加爬取任务完成: {result}")
+        if result.get('success_count'):
+            redis_service.archive_daily_articles()
+            refresh_edge_cache(['/api/crawler/daily/'])
+    except Exception as e:
+        logger.error(f"追加爬取任务失败: {str(e)}", exc_info=True)
+    finally:
+        redis_service.release_delta_crawl_lock()
+        logger.info(f"Task {task_id} 执行完毕，释放追加爬取锁。")
+    return "Task finished."
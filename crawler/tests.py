@@ -1,3 +1,1404 @@
-from django.test import TestCase
+import os
+import gzip
+import json
+import time
+import tempfile
+import base64
+import hashlib
+import asyncio
+import threading
+from io import BytesIO, StringIO
+from unittest import mock
+from PIL import Image
+from datetime import datetime, timedelta
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, RequestFactory
+from django.utils import timezone
+from selenium.common.exceptions import WebDriverException
 
-# Create your tests here.
+from .fetch_engine import HostPolitenessLimiter, ParallelFetchEngine
+from .browser_pool import BrowserPool
+from .page_fetcher import TieredPageFetcher
+from .async_pipeline import AsyncCrawlPipeline, _DONE
+from .image_service import ImageCacheService
+from .blob_store import RedisBlobStore
+from .redis_service import RedisService, ASSIGN_REVISION_SCRIPT, UPDATE_TASK_SCRIPT
+from .redis_models import RedisNewsArticle, RedisCrawlTask
+from .search_index import tokenize, index_terms, highlight
+from .article_archive import ArticleArchive
+from .crawl_registry import url_fingerprint
+from .list_discovery import ListPageDiscovery, parse_news_links
+from .extraction import locate_article
+from .management.commands.benchmark_extraction import DEFAULT_PAGES_DIR, baseline_extract
+from .management.commands.benchmark_crawl import DEFAULT_SITE_DIR, count_redis_ops, find_regressions
+from .replay_server import ReplayServer
+from .stage_timer import StageTimer, percentile
+from .task_metrics import render_task_metrics
+from .services import PeopleNetCrawler
+from .image_derivatives import ImageDerivativeService
+
+
+class ParallelFetchEngineTestCase(SimpleTestCase):
+    def test_run_yields_every_item(self):
+        """测试并发引擎返回每个条目的结果和错误"""
+        def worker(item):
+            if item['url'].endswith('/bad'):
+                raise ValueError('bad page')
+            return item['url'].upper()
+
+        items = [{'url': f'http://a.example.com/{i}'} for i in range(5)] + [{'url': 'http://b.example.com/bad'}]
+        engine = ParallelFetchEngine(max_workers=3, limiter=HostPolitenessLimiter(max_concurrency=2, min_interval=0))
+        results = {index: (result, error) for index, item, result, error in engine.run(items, worker)}
+
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results[0], ('HTTP://A.EXAMPLE.COM/0', None))
+        self.assertIsInstance(results[5][1], ValueError)
+
+    def test_per_host_concurrency_limit(self):
+        """测试同一主机的并发数不超过限制"""
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def worker(item):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.02)
+            with lock:
+                state['active'] -= 1
+
+        items = [{'url': f'http://a.example.com/{i}'} for i in range(8)]
+        engine = ParallelFetchEngine(max_workers=8, limiter=HostPolitenessLimiter(max_concurrency=2, min_interval=0))
+        list(engine.run(items, worker))
+
+        self.assertLessEqual(state['peak'], 2)
+
+    def test_min_interval_between_requests(self):
+        """测试同一主机相邻请求之间保持最小间隔"""
+        limiter = HostPolitenessLimiter(max_concurrency=4, min_interval=0.05)
+        started = []
+        engine = ParallelFetchEngine(max_workers=4, limiter=limiter)
+        list(engine.run([{'url': 'http://a.example.com/'}] * 3, lambda item: started.append(time.monotonic())))
+
+        started.sort()
+        self.assertGreaterEqual(started[-1] - started[0], 0.09)
+
+
+class FakeDriver:
+    """模拟 Chrome 实例，只实现浏览器池用到的接口"""
+
+    def __init__(self, options=None):
+        self.handles = ['base']
+        self.current_window_handle = 'base'
+        self.alive = True
+        self.quit_called = False
+
+    @property
+    def window_handles(self):
+        if not self.alive:
+            raise WebDriverException('chrome not reachable')
+        return list(self.handles)
+
+    @property
+    def switch_to(self):
+        driver = self
+
+        class SwitchTo:
+            def new_window(self, kind):
+                handle = f'tab{len(driver.handles)}'
+                driver.handles.append(handle)
+                driver.current_window_handle = handle
+
+            def window(self, handle):
+                driver.current_window_handle = handle
+
+        return SwitchTo()
+
+    def close(self):
+        self.handles.remove(self.current_window_handle)
+
+    def quit(self):
+        self.quit_called = True
+
+
+@mock.patch('crawler.browser_pool.webdriver.Chrome', FakeDriver)
+class BrowserPoolTestCase(SimpleTestCase):
+    def test_driver_reused_and_tab_closed(self):
+        """测试租约复用同一实例，并在归还时关闭标签页"""
+        pool = BrowserPool(size=1, max_pages_per_driver=10)
+        with pool.lease() as first:
+            self.assertEqual(len(first.handles), 2)
+        with pool.lease() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(second.handles, ['base'])
+        self.assertEqual(pool.get_stats()['drivers_started'], 1)
+
+    def test_driver_recycled_after_max_pages(self):
+        """测试实例服务满 N 个页面后被回收重启"""
+        pool = BrowserPool(size=1, max_pages_per_driver=2)
+        drivers = []
+        for _ in range(3):
+            with pool.lease() as driver:
+                drivers.append(driver)
+
+        self.assertIs(drivers[0], drivers[1])
+        self.assertIsNot(drivers[1], drivers[2])
+        self.assertTrue(drivers[0].quit_called)
+        self.assertEqual(pool.get_stats()['driver_restarts'], 1)
+
+    def test_crashed_driver_restarted(self):
+        """测试实例崩溃后被替换"""
+        pool = BrowserPool(size=1, max_pages_per_driver=10)
+        with self.assertRaises(WebDriverException):
+            with pool.lease() as driver:
+                driver.alive = False
+                raise WebDriverException('tab crashed')
+        with pool.lease() as replacement:
+            pass
+
+        self.assertIsNot(driver, replacement)
+        stats = pool.get_stats()
+        self.assertEqual(stats['driver_crashes'], 1)
+        self.assertEqual(stats['leases'], 2)
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b'', headers=None, encoding='utf-8'):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+        self.encoding = encoding
+        self.apparent_encoding = 'utf-8'
+
+
+class FakeBrowserPool:
+    def __init__(self, page_source):
+        self.page_source = page_source
+        self.leases = 0
+
+    def lease(self):
+        pool = self
+
+        class Lease:
+            def __enter__(self):
+                pool.leases += 1
+                return mock.Mock(page_source=pool.page_source)
+
+            def __exit__(self, *exc):
+                return False
+
+        return Lease()
+
+
+@mock.patch('crawler.page_fetcher.redis_service', mock.MagicMock(**{'redis_client.hgetall.return_value': {}}))
+class TieredPageFetcherTestCase(SimpleTestCase):
+    static_page = '<html><body><!--内容--><div><div>正文内容</div></div></body></html>'.encode('utf-8')
+
+    def _extract(self, page_source):
+        return locate_article(page_source)
+
+    def test_http_tier_used_for_static_page(self):
+        """测试静态页面直接通过 HTTP 层获取，不启动浏览器"""
+        session = mock.Mock(**{'get.return_value': FakeResponse(200, self.static_page)})
+        pool = FakeBrowserPool('')
+        fetcher = TieredPageFetcher(session, pool, self._extract)
+
+        content, tier = fetcher.fetch_article('http://www.people.com.cn/n1/a.html')
+
+        self.assertEqual(tier, 'http')
+        self.assertIn('正文内容', content.text_content())
+        self.assertEqual(pool.leases, 0)
+
+    def test_escalates_to_browser_when_extraction_fails(self):
+        """测试 HTTP 页面提取失败时升级到浏览器，并统计命中率"""
+        session = mock.Mock(**{'get.return_value': FakeResponse(200, b'<html>empty shell</html>')})
+        pool = FakeBrowserPool(self.static_page.decode('utf-8'))
+        fetcher = TieredPageFetcher(session, pool, self._extract)
+
+        content, tier = fetcher.fetch_article('http://www.people.com.cn/n1/b.html')
+
+        self.assertEqual(tier, 'browser')
+        self.assertEqual(pool.leases, 1)
+        self.assertEqual(fetcher.get_stats()['hit_rates']['browser'], 1.0)
+
+    def test_gb2312_page_decoded(self):
+        """测试 GB2312 声明的页面按 GB18030 解码"""
+        body = '<html><body><!--内容--><div><div>正文内容</div></div></body></html>'.encode('gbk')
+        session = mock.Mock(**{'get.return_value': FakeResponse(200, body, encoding='GB2312')})
+        fetcher = TieredPageFetcher(session, FakeBrowserPool(''), self._extract)
+
+        content, tier = fetcher.fetch_article('http://www.people.com.cn/n1/c.html')
+
+        self.assertEqual(tier, 'http')
+
+    def test_not_modified_served_from_cached_article(self):
+        """测试缓存只保存校验器和文章主体（不含整页），304 时直接使用缓存的文章主体"""
+        redis_client = FakeRedis(decode_responses=True)
+        page = '<html><head><script>var big = 1;</script></head><body><!--内容--><div><div>正文内容</div></div></body></html>'
+        session = mock.Mock(**{'get.side_effect': [
+            FakeResponse(200, page.encode('utf-8'), headers={'ETag': '"v1"'}),
+            FakeResponse(304),
+        ]})
+        with mock.patch('crawler.page_fetcher.redis_service', mock.Mock(redis_client=redis_client)):
+            fetcher = TieredPageFetcher(session, FakeBrowserPool(''), self._extract)
+            fetcher.fetch_article('http://www.people.com.cn/n1/d.html')
+            content, tier = fetcher.fetch_article('http://www.people.com.cn/n1/d.html')
+
+        (cached,) = [redis_client.hgetall(key) for key in redis_client.scan_iter('http_cache:*')]
+        self.assertEqual(cached['article'], '<div>正文内容</div>')
+        self.assertNotIn('body', cached)
+        self.assertEqual(session.get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+        self.assertEqual(tier, 'http_not_modified')
+        self.assertEqual(content.text_content(), '正文内容')
+
+
+class ListPageDiscoveryTestCase(SimpleTestCase):
+    index_url = 'http://www.people.com.cn/GB/59476/index.html'
+    list_page = ('<html><body><table><tr><td class="p6"><li><a href="/n1/a.html">要闻一</a><br>'
+                 '<a href="/n1/b.html"> 要闻二 </a></li><a href="">空链接</a></td></tr></table></body></html>').encode('gbk')
+
+    def _session(self, pages):
+        def get(url, timeout=None):
+            return FakeResponse(200, pages[url], encoding='GB2312') if url in pages else FakeResponse(404)
+        return mock.Mock(**{'get.side_effect': get})
+
+    def test_parse_news_links(self):
+        """测试 lxml 解析 td.p6 中的链接，忽略空标题和空链接"""
+        self.assertEqual(parse_news_links(self.list_page.decode('gbk')), [
+            {'title': '要闻一', 'url': '/n1/a.html'},
+            {'title': '要闻二', 'url': '/n1/b.html'},
+        ])
+
+    def test_dated_archive_url(self):
+        """测试直接按日期拼出列表页地址，不打开首页和浏览器"""
+        browser = mock.Mock()
+        session = self._session({'http://www.people.com.cn/GB/59476/review/20250901.html': self.list_page})
+        discovery = ListPageDiscovery(session, browser)
+
+        news_links = discovery.discover(self.index_url, datetime(2025, 9, 1))
+
+        self.assertEqual(len(news_links), 2)
+        self.assertEqual(session.get.call_count, 1)
+        browser.assert_not_called()
+        self.assertEqual(discovery.get_stats()['hits']['archive'], 1)
+
+    def test_iframe_calendar_over_http(self):
+        """测试按日期的地址不可用时，通过 HTTP 获取日历 iframe 并跟随当天的日期链接"""
+        index = b'<html><body><iframe src="calendar.html"></iframe></body></html>'
+        calendar = b'<html><body><a href="list/31.html"><font>31</font></a><a href="list/1.html"><font>1</font></a></body></html>'
+        session = self._session({
+            self.index_url: index,
+            'http://www.people.com.cn/GB/59476/calendar.html': calendar,
+            'http://www.people.com.cn/GB/59476/list/1.html': self.list_page,
+        })
+        discovery = ListPageDiscovery(session, mock.Mock())
+
+        news_links = discovery.discover(self.index_url, datetime(2025, 9, 1))
+
+        self.assertEqual([link['title'] for link in news_links], ['要闻一', '要闻二'])
+        self.assertEqual(discovery.get_stats()['hits']['iframe'], 1)
+
+    def test_browser_fallback(self):
+        """测试 HTTP 方式都失败时回退到浏览器流程"""
+        browser = mock.Mock(return_value=[{'title': '要闻', 'url': '/n1/c.html'}])
+        discovery = ListPageDiscovery(self._session({}), browser)
+
+        news_links = discovery.discover(self.index_url, datetime(2025, 9, 1))
+
+        browser.assert_called_once_with(self.index_url, 1)
+        self.assertEqual(len(news_links), 1)
+        self.assertEqual(discovery.get_stats()['hits']['browser'], 1)
+
+
+class ArticleExtractionTestCase(SimpleTestCase):
+    def _pages(self):
+        for name in sorted(os.listdir(DEFAULT_PAGES_DIR)):
+            with open(os.path.join(DEFAULT_PAGES_DIR, name), encoding='utf-8') as f:
+                yield name, f.read()
+
+    def test_matches_baseline_on_fixtures(self):
+        """测试 lxml 引擎与原 BeautifulSoup 实现在保存的页面上提取结果一致"""
+        crawler = PeopleNetCrawler()
+        for name, page_source in self._pages():
+            link_info = {'title': name, 'url': f'http://www.people.com.cn/n1/2025/0901/{name}'}
+            with self.subTest(page=name):
+                fields, text, image_jobs = crawler._parse_article(crawler._extract_article_content(page_source), link_info)
+                expected = baseline_extract(page_source, link_info)
+                self.assertEqual(fields, expected['fields'])
+                self.assertEqual(text, expected['text'])
+                self.assertEqual(image_jobs, expected['image_jobs'])
+
+    def test_unwanted_elements_and_images(self):
+        """测试正文移除责编、广告和脚本，图片替换为占位符，标题和分类来自同一次遍历"""
+        page = ('<html><body><!--内容--><div><div><h1>标题文字</h1><div class="route"><a>首页</a><a>军事</a></div>'
+                '<div class="rm_txt_con"><p>第一段正文内容。</p><p><img src="/a.jpg"></p><div class="edit">(责编：某某某某)</div>'
+                '<script>var x = "脚本内容不应出现";</script><p>第二段正文内容<b>加粗部分</b>。</p></div></div></div></body></html>')
+        fields, text, image_jobs = PeopleNetCrawler()._parse_article(locate_article(page), {'title': '备用', 'url': 'http://www.people.com.cn/n1/x.html'})
+
+        self.assertEqual(fields['title'], '标题文字')
+        self.assertEqual(fields['category'], '军事')
+        self.assertEqual(text, '第一段正文内容。\n\n__IMAGE_PLACEHOLDER_0__\n\n第二段正文内容')
+        self.assertEqual(image_jobs[0]['src'], 'http://www.people.com.cn/a.jpg')
+        self.assertIsNone(locate_article('<html><body><div>没有标记</div></body></html>'))
+
+
+class CrawlBenchmarkTestCase(SimpleTestCase):
+    baseline = {
+        'pages_per_second': 10.0,
+        'stages': {'fetch': {'p50_ms': 20.0, 'p95_ms': 40.0}},
+        'peak_rss_mb': 200.0,
+        'redis_ops_per_article': 50.0,
+    }
+
+    def test_replay_server_serves_recorded_site_as_proxy(self):
+        """测试回放服务作为 HTTP 代理按清单返回录制的列表页、文章页和图片"""
+        import requests
+        with ReplayServer(DEFAULT_SITE_DIR) as server:
+            proxies = {'http': server.url}
+            listing = requests.get('http://www.people.com.cn/GB/59476/review/20250901.html', proxies=proxies, timeout=5)
+            article = requests.get('http://politics.people.com.cn/n1/2025/0901/c1001-40580000.html', proxies=proxies, timeout=5)
+            image = requests.get('http://www.people.com.cn/NMediaFile/2025/0901/MAIN1.jpg', proxies=proxies, timeout=5)
+            missing = requests.get('http://www.example.com/', proxies=proxies, timeout=5)
+
+        self.assertEqual(len(parse_news_links(listing.text)), 40)
+        self.assertIsNotNone(locate_article(article.content.decode('utf-8')))
+        self.assertEqual(image.headers['Content-Type'], 'image/jpeg')
+        self.assertEqual(missing.status_code, 404)
+
+    def test_stage_timer_percentiles(self):
+        """测试阶段耗时按最近秩法计算 p50/p95"""
+        timer = StageTimer()
+        for ms in range(1, 101):
+            timer.record('fetch', ms / 1000)
+
+        summary = timer.summary()['fetch']
+        self.assertEqual((summary['count'], summary['p50_ms'], summary['p95_ms']), (100, 50.0, 95.0))
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_find_regressions(self):
+        """测试吞吐量下降、阶段变慢和 Redis 命令数增加被判为回归，容差内的波动不算"""
+        within = dict(self.baseline, pages_per_second=8.0, stages={'fetch': {'p50_ms': 24.0, 'p95_ms': 50.0}})
+        self.assertEqual(find_regressions(within, self.baseline, 0.25, 0.05), [])
+
+        worse = dict(self.baseline, pages_per_second=5.0, redis_ops_per_article=60.0,
+                     stages={'fetch': {'p50_ms': 20.0, 'p95_ms': 80.0}})
+        self.assertEqual(len(find_regressions(worse, self.baseline, 0.25, 0.05)), 3)
+
+    def test_redis_op_counter_restored_after_error(self):
+        """测试统计过程中抛出异常时连接的发送方法被恢复"""
+        import redis.connection
+        connection_class = redis.connection.AbstractConnection
+        original = connection_class.send_command
+        with self.assertRaises(RuntimeError):
+            with count_redis_ops():
+                self.assertIsNot(connection_class.send_command, original)
+                raise RuntimeError('boom')
+        self.assertIs(connection_class.send_command, original)
+
+    def test_missing_baseline_fails(self):
+        """测试基线文件不存在时命令以错误退出，而不是跳过回归检查"""
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaisesRegex(CommandError, '基线文件不存在'):
+                call_command('benchmark_crawl', baseline=os.path.join(tmp, 'missing.json'), stdout=StringIO())
+
+
+class CrawlStageMetricsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.service = RedisService()
+        self.service.redis_client = FakeRedis(decode_responses=True)
+        patcher = mock.patch('crawler.redis_models.redis_service', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_article_timings_include_batch_share(self):
+        """测试按文章累计各阶段耗时，批量保存的耗时平摊到每篇文章，阶段样本只记一次"""
+        timer = StageTimer()
+        timer.record('fetch', 0.2, 'http://a')
+        timer.record('fetch', 0.1, 'http://b')
+        timer.record('discovery', 1.0)
+        timer.record_batch('persist', 0.04, ['http://a', 'http://b'])
+
+        timings = timer.article_timings()
+        self.assertEqual(timings['http://a'], {'fetch': 200.0, 'persist': 20.0, 'total_ms': 220.0})
+        self.assertEqual(set(timings), {'http://a', 'http://b'})
+        self.assertEqual(timer.summary()['persist']['count'], 1)
+
+    def test_task_timings_and_prometheus_output(self):
+        """测试任务保存每篇文章的耗时并按总耗时排序，Prometheus 输出包含各阶段分位数"""
+        timer = StageTimer()
+        for ms in (10, 30):
+            timer.record('fetch', ms / 1000, f'http://example.com/{ms}')
+        task = RedisCrawlTask(id='task1', status='completed', success_count=2, total_links=2,
+                              started_at='2025-09-01T08:00:00+08:00', completed_at='2025-09-01T08:02:30+08:00',
+                              metrics={'stages': timer.summary()})
+        task.save_article_timings(timer.article_timings())
+
+        self.assertEqual([entry['url'] for entry in task.slowest_articles(1)], ['http://example.com/30'])
+        self.assertEqual(task.duration_seconds, 150.0)
+
+        body = render_task_metrics(task)
+        self.assertIn('crawler_stage_duration_seconds{stage="fetch",quantile="0.95"} 0.03', body)
+        self.assertIn('crawler_stage_duration_seconds_count{stage="fetch"} 2', body)
+        self.assertIn('crawler_task_articles{result="success"} 2', body)
+        self.assertIn('crawler_task_running 0', body)
+        self.assertEqual(render_task_metrics(None), '# HELP crawler_task_running 最近一次爬取任务是否正在运行\n'
+                                                    '# TYPE crawler_task_running gauge\ncrawler_task_running 0\n')
+
+
+class AsyncCrawlPipelineTestCase(SimpleTestCase):
+    def test_stages_drain_and_count_results(self):
+        """测试各阶段通过有界队列串联，失败条目计入失败数，流水线能正常排空"""
+        pipeline = AsyncCrawlPipeline(crawler=mock.Mock())
+
+        async def double(item):
+            await asyncio.sleep(0)
+            return None if item['n'] % 3 == 0 else dict(item, n=item['n'] * 2)
+
+        async def persist(item):
+            item['article_data'] = {'title': str(item['n'])}
+            return item
+
+        async def run():
+            first, second = asyncio.Queue(2), asyncio.Queue(2)
+
+            async def feed():
+                for n in range(1, 10):
+                    await first.put({'link': {'title': str(n)}, 'n': n})
+                await first.put(_DONE)
+
+            await asyncio.gather(
+                feed(),
+                pipeline._stage('double', double, first, second, 3),
+                pipeline._stage('persist', persist, second, None, 1),
+            )
+
+        asyncio.run(run())
+
+        self.assertEqual(pipeline.progress['success'], 6)
+        self.assertEqual(pipeline.progress['failed'], 3)
+
+    def test_discovery_without_links_finishes_queue(self):
+        """测试列表页发现返回 None 时按没有链接处理，抓取队列正常结束"""
+        crawler = mock.Mock()
+        crawler._plan_links.return_value = ([], 0)
+        pipeline = AsyncCrawlPipeline(crawler=crawler)
+        pipeline.refresh = True
+        pipeline._discover = mock.AsyncMock(return_value=None)
+
+        async def run():
+            queue = asyncio.Queue()
+            await pipeline._discovery_stage(None, queue)
+            return queue.get_nowait()
+
+        self.assertIs(asyncio.run(run()), _DONE)
+        self.assertEqual(pipeline.progress['total'], 0)
+        crawler._plan_links.assert_called_once_with([], True)
+
+    def test_persist_stage_saves_in_batches(self):
+        """测试持久化阶段攒批后通过 _save_articles 保存，未变化的文章不保存，批量保存失败时整批计为失败"""
+        crawler = mock.Mock()
+        crawler._is_changed.side_effect = lambda link, article: link['title'] != 'same'
+        crawler._save_articles.side_effect = [True, False]
+        pipeline = AsyncCrawlPipeline(crawler=crawler)
+
+        async def run():
+            queue = asyncio.Queue()
+            for title in ('a', 'same', 'b', 'c'):
+                queue.put_nowait({'link': {'title': title, 'url': f'/{title}.html'}, 'article_data': {'title': title}})
+            queue.put_nowait(_DONE)
+            await pipeline._persist_stage(queue)
+
+        with mock.patch.dict('crawler.async_pipeline.CRAWLER_CONFIG', save_batch_size=2):
+            asyncio.run(run())
+
+        batches = [[article['title'] for article in call.args[0]] for call in crawler._save_articles.call_args_list]
+        self.assertEqual(batches, [['a', 'b'], ['c']])
+        self.assertEqual((pipeline.progress['success'], pipeline.progress['unchanged'], pipeline.progress['failed']), (2, 1, 1))
+
+
+class FakeImageResponse:
+    def __init__(self, body, content_type='image/png'):
+        self.status_code = 200
+        self.body = body
+        self.headers = {'content-type': content_type, 'content-length': str(len(body))}
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeRedis:
+    """内存版 Redis，只实现测试用到的命令；decode_responses 为 False 时返回 bytes"""
+
+    def __init__(self, decode_responses=False, data=None):
+        self.decode_responses = decode_responses
+        self.data = {} if data is None else data
+        self.ttls = {}
+
+    def _b(self, value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode('utf-8')
+
+    def _out(self, value):
+        if value is None or not self.decode_responses:
+            return value
+        return value.decode('utf-8')
+
+    def get(self, key):
+        value = self.data.get(self._b(key))
+        return self._out(value) if isinstance(value, bytes) else None
+
+    def mget(self, keys):
+        values = [self.data.get(self._b(key)) for key in keys]
+        return [self._out(value) if isinstance(value, bytes) else None for value in values]
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and self._b(key) in self.data:
+            return None
+        self.data[self._b(key)] = self._b(value)
+        if ex:
+            self.ttls[self._b(key)] = ex
+        return True
+
+    def incr(self, key, amount=1):
+        value = int(self.data.get(self._b(key), 0)) + amount
+        self.data[self._b(key)] = self._b(value)
+        return value
+
+    def setex(self, key, seconds, value):
+        self.set(key, value, ex=seconds)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        mapping = dict(mapping or {})
+        if field is not None:
+            mapping[field] = value
+        bucket = self.data.setdefault(self._b(key), {})
+        for name, item in mapping.items():
+            bucket[self._b(name)] = self._b(item)
+        return len(mapping)
+
+    def hsetnx(self, key, field, value):
+        bucket = self.data.setdefault(self._b(key), {})
+        if self._b(field) in bucket:
+            return 0
+        bucket[self._b(field)] = self._b(value)
+        return 1
+
+    def hincrby(self, key, field, amount=1):
+        bucket = self.data.setdefault(self._b(key), {})
+        value = int(bucket.get(self._b(field), 0)) + amount
+        bucket[self._b(field)] = self._b(value)
+        return value
+
+    def hdel(self, key, *fields):
+        bucket = self.data.get(self._b(key), {})
+        return sum(1 for field in fields if bucket.pop(self._b(field), None) is not None)
+
+    def hget(self, key, field):
+        bucket = self.data.get(self._b(key))
+        return self._out(bucket.get(self._b(field))) if isinstance(bucket, dict) else None
+
+    def hmget(self, key, fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hlen(self, key):
+        return len(self.data.get(self._b(key), {}))
+
+    def hgetall(self, key):
+        bucket = self.data.get(self._b(key))
+        if not isinstance(bucket, dict):
+            return {}
+        return {self._out(name): self._out(value) for name, value in bucket.items()}
+
+    def expire(self, key, seconds, nx=False, gt=False):
+        key = self._b(key)
+        if key not in self.data or (nx and key in self.ttls) or (gt and self.ttls.get(key, float('inf')) >= seconds):
+            return False
+        self.ttls[key] = seconds
+        return True
+
+    def sadd(self, key, *members):
+        members_set = self.data.setdefault(self._b(key), set())
+        before = len(members_set)
+        members_set.update(self._b(member) for member in members)
+        return len(members_set) - before
+
+    def srem(self, key, *members):
+        members_set = self.data.get(self._b(key), set())
+        before = len(members_set)
+        members_set.difference_update(self._b(member) for member in members)
+        return before - len(members_set)
+
+    def smembers(self, key):
+        return {self._out(member) for member in self.data.get(self._b(key), set())}
+
+    def scard(self, key):
+        return len(self.data.get(self._b(key), set()))
+
+    def lpush(self, key, *values):
+        items = self.data.setdefault(self._b(key), [])
+        items[:0] = [self._b(value) for value in reversed(values)]
+        return len(items)
+
+    def ltrim(self, key, start, end):
+        items = self.data.get(self._b(key), [])
+        items[:] = items[start:None if end == -1 else end + 1]
+        return True
+
+    def hvals(self, key):
+        return [self._out(value) for value in self.data.get(self._b(key), {}).values()]
+
+    def pfadd(self, key, *elements):
+        return self.sadd(key, *elements)
+
+    def pfcount(self, *keys):
+        merged = set()
+        for key in keys:
+            merged |= self.data.get(self._b(key), set())
+        return len(merged)
+
+    def zadd(self, key, mapping, xx=False):
+        zset = self.data.setdefault(self._b(key), {})
+        for member, score in mapping.items():
+            if not xx or self._b(member) in zset:
+                zset[self._b(member)] = score
+        return len(mapping)
+
+    def zrange(self, key, start, end):
+        zset = self.data.get(self._b(key), {})
+        members = sorted(zset, key=zset.get)
+        return [self._out(member) for member in members[start:None if end == -1 else end + 1]]
+
+    def zrevrange(self, key, start, end, withscores=False):
+        zset = self.data.get(self._b(key), {})
+        members = sorted(zset, key=zset.get, reverse=True)[start:None if end == -1 else end + 1]
+        if withscores:
+            return [(self._out(member), zset[member]) for member in members]
+        return [self._out(member) for member in members]
+
+    def zrangebyscore(self, key, low, high, start=None, num=None):
+        zset = self.data.get(self._b(key), {})
+        low, high = float(low), float(high)
+        members = [member for member in sorted(zset, key=zset.get) if low <= zset[member] <= high]
+        if num is not None:
+            members = members[start:start + num]
+        return [self._out(member) for member in members]
+
+    def zinterstore(self, dest, keys, aggregate=None):
+        result = None
+        for key, weight in keys.items():
+            source = self.data.get(self._b(key), {})
+            scores = dict(source) if isinstance(source, dict) else dict.fromkeys(source, 1)
+            if result is None:
+                result = {member: score * weight for member, score in scores.items()}
+            else:
+                result = {member: result[member] + scores[member] * weight for member in result if member in scores}
+        self.data[self._b(dest)] = result or {}
+        return len(result or {})
+
+    def zrem(self, key, *members):
+        zset = self.data.get(self._b(key), {})
+        return sum(1 for member in members if zset.pop(self._b(member), None) is not None)
+
+    def zcard(self, key):
+        return len(self.data.get(self._b(key), {}))
+
+    def ttl(self, key):
+        return self.ttls.get(self._b(key), -1)
+
+    def exists(self, *keys):
+        return sum(1 for key in keys if self._b(key) in self.data)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.ttls.pop(self._b(key), None)
+        return sum(1 for key in keys if self.data.pop(self._b(key), None) is not None)
+
+    def scan_iter(self, match='*', count=None):
+        import fnmatch
+        for key in list(self.data):
+            if fnmatch.fnmatchcase(key.decode('utf-8'), match):
+                yield self._out(key)
+
+    def eval(self, script, numkeys, *keys_and_args):
+        # 只支持 redis_service 中的脚本，按脚本内容调用等价的 Python 实现
+        scripts = {ASSIGN_REVISION_SCRIPT: self._assign_revision, UPDATE_TASK_SCRIPT: self._update_task}
+        return scripts[script](keys_and_args[:numkeys], keys_and_args[numkeys:])
+
+    def evalsha(self, sha, numkeys, *keys_and_args):
+        script = next(text for text in (ASSIGN_REVISION_SCRIPT, UPDATE_TASK_SCRIPT)
+                      if hashlib.sha1(text.encode('utf-8')).hexdigest() == sha)
+        return self.eval(script, numkeys, *keys_and_args)
+
+    def _assign_revision(self, keys, args):
+        revision = self.incr(keys[0])
+        self.expire(keys[0], int(args[0]))
+        for article_id in args[1:]:
+            self.zadd(keys[1], {article_id: revision})
+        if len(args) > 1:
+            self.expire(keys[1], int(args[0]))
+        return revision
+
+    def _update_task(self, keys, args):
+        current = self.get(keys[0])
+        if current is None:
+            return 0
+        task = json.loads(current)
+        task.update(json.loads(args[0]))
+        self.set(keys[0], json.dumps(task, ensure_ascii=False), ex=int(args[1]))
+        return 1
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        self.client.executed_pipelines = getattr(self.client, 'executed_pipelines', 0) + 1
+        commands, self.commands = self.commands, []
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class FakeRedisService:
+    """同时提供文本客户端和二进制客户端，二者共享同一份数据"""
+
+    def __init__(self):
+        self.binary_client = FakeRedis()
+        self.redis_client = FakeRedis(decode_responses=True, data=self.binary_client.data)
+        self.redis_client.ttls = self.binary_client.ttls
+
+
+class ImageIngestTestCase(SimpleTestCase):
+    def setUp(self):
+        buffer = BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, format='PNG')
+        self.png = buffer.getvalue()
+
+        self.redis = FakeRedisService()
+        for target in ('crawler.image_store.redis_service', 'crawler.blob_store.redis_service'):
+            patcher = mock.patch(target, self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.service = ImageCacheService()
+        self.service.store.blobs = RedisBlobStore()
+        self.service.session = mock.Mock(**{'get.side_effect': lambda *args, **kwargs: FakeImageResponse(self.png)})
+
+    def test_duplicates_downloaded_once_and_stored_as_raw_bytes(self):
+        """测试重复图片只下载一次，并以原始字节存储"""
+        urls = ['/a.png', 'http://www.people.com.cn/a.png', '/b.png', '/a.png']
+        results = self.service.ingest_images(urls, 'http://www.people.com.cn')
+
+        self.assertEqual(set(results), {'/a.png', 'http://www.people.com.cn/a.png', '/b.png'})
+        self.assertEqual(results['/a.png'], results['http://www.people.com.cn/a.png'])
+        self.assertEqual(self.service.session.get.call_count, 2)
+
+        image_id, content_type = results['/b.png']
+        self.assertEqual(self.service.get_image_data(image_id), (self.png, 'image/png'))
+        self.assertEqual(self.service.get_cached_image(image_id)['width'], 4)
+
+    def test_cached_images_not_downloaded_again_across_articles(self):
+        """测试跨文章的重复图片直接命中进程内记录，不再下载"""
+        self.service.ingest_images(['http://www.people.com.cn/a.png'])
+        self.service.session.get.reset_mock()
+
+        results = self.service.ingest_images(['http://www.people.com.cn/a.png'])
+
+        self.assertIsNotNone(results['http://www.people.com.cn/a.png'][0])
+        self.service.session.get.assert_not_called()
+
+    def test_memo_dropped_after_blob_evicted(self):
+        """测试数据被淘汰后进程内记录失效，图片重新下载"""
+        url = 'http://www.people.com.cn/a.png'
+        image_id, _ = self.service.ingest_images([url])[url]
+        blobs = self.service.store.blobs
+        blobs._drop(blobs.resolve('image', image_id))
+        self.service.session.get.reset_mock()
+
+        self.assertEqual(self.service.ingest_images([url])[url][0], image_id)
+        self.assertEqual(self.service.session.get.call_count, 1)
+        self.assertEqual(self.service.get_image_data(image_id), (self.png, 'image/png'))
+
+    def test_legacy_json_images_read_and_migrated(self):
+        """测试旧的 base64 JSON 格式可读取，并能迁移为二进制格式"""
+        legacy = {'url': 'http://x/a.png', 'content_type': 'image/png', 'size': len(self.png),
+                  'width': 4, 'height': 4, 'format': 'PNG', 'data': base64.b64encode(self.png).decode('utf-8')}
+        self.redis.redis_client.setex('image:legacy', 100, json.dumps(legacy))
+
+        self.assertEqual(self.service.get_image_data('legacy'), (self.png, 'image/png'))
+        self.assertEqual(self.service.store.migrate_legacy(), (1, 0))
+        self.assertIsNone(self.redis.redis_client.get('image:legacy'))
+        self.assertEqual(self.service.get_image_data('legacy'), (self.png, 'image/png'))
+        self.assertEqual(self.redis.binary_client.ttl('blob_alias:image:legacy'), 100)
+
+    def test_same_content_stored_once_and_released_by_refcount(self):
+        """测试不同URL的相同图片只存一份数据，删除最后一个引用后数据被释放"""
+        results = self.service.ingest_images(['http://a.example.com/1.png', 'http://b.example.com/2.png'])
+        ids = [image_id for image_id, content_type in results.values()]
+
+        stats = self.service.store.blobs.get_stats()
+        self.assertEqual(stats['blobs'], 1)
+        self.assertEqual(stats['total_bytes'], len(self.png))
+
+        self.service.store.delete(ids[0])
+        self.assertEqual(self.service.get_image_data(ids[1])[0], self.png)
+        self.service.store.delete(ids[1])
+        self.assertEqual(self.service.store.blobs.get_stats()['total_bytes'], 0)
+        self.assertEqual(self.service.get_image_data(ids[1]), (None, None))
+
+    def test_lru_eviction_over_budget(self):
+        """测试超出容量上限时淘汰最久未访问的数据"""
+        blobs = self.service.store.blobs
+        blobs.max_bytes = 10
+        blobs.put('test', 'old', b'0123456789')
+        blobs.put('test', 'new', b'abcdefghij')
+
+        self.assertEqual(blobs.get_by_alias('test', 'old'), (None, None))
+        self.assertEqual(blobs.get_by_alias('test', 'new')[0], b'abcdefghij')
+        self.assertEqual(blobs.get_stats()['total_bytes'], 10)
+
+    def test_expired_blob_stored_again_not_counted_twice(self):
+        """测试数据自然过期后重新写入，总容量不重复计入"""
+        blobs = self.service.store.blobs
+        digest = blobs.put('test', 'a', b'0123456789')
+        self.redis.binary_client.delete(blobs.blob_key(digest))
+
+        blobs.put('test', 'b', b'0123456789')
+        self.assertEqual(blobs.get_stats()['total_bytes'], 10)
+
+        blobs.delete_alias('test', 'a')
+        blobs.delete_alias('test', 'b')
+        self.assertEqual(blobs.get_stats()['total_bytes'], 0)
+
+    def test_sweep_rebuilds_refcount_from_live_aliases(self):
+        """测试别名自然过期后，清理时按现存别名重建引用计数，无引用的数据被删除"""
+        blobs = self.service.store.blobs
+        shared = blobs.put('test', 'a', b'shared')
+        blobs.put('test', 'b', b'shared')
+        orphan = blobs.put('test', 'c', b'orphan')
+        self.redis.binary_client.delete(blobs.alias_key('test', 'b'), blobs.alias_key('test', 'c'))
+
+        with mock.patch('crawler.blob_store.time.time', return_value=time.time() + 1):
+            self.assertEqual(blobs.sweep(), 1)
+
+        self.assertEqual(int(self.redis.binary_client.hget(blobs.meta_key(shared), 'refcount')), 1)
+        self.assertFalse(self.redis.binary_client.exists(blobs.blob_key(orphan)))
+        self.assertEqual(blobs.get_stats(), {'blobs': 1, 'total_bytes': len(b'shared'), 'max_bytes': blobs.max_bytes})
+
+
+class MigrateImageStorageTestCase(SimpleTestCase):
+    def setUp(self):
+        buffer = BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, format='PNG')
+        self.png = buffer.getvalue()
+        buffer = BytesIO()
+        Image.new('RGB', (2, 2)).save(buffer, format='JPEG')
+        self.jpeg = buffer.getvalue()
+
+        self.redis = FakeRedisService()
+        for target in ('crawler.image_store.redis_service', 'crawler.blob_store.redis_service'):
+            patcher = mock.patch(target, self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # 爬虫图片为 base64 JSON 旧格式，AI对话图片为原始字节 + 元数据哈希旧格式
+        legacy = {'url': 'http://x/a.png', 'content_type': 'image/png', 'size': len(self.png),
+                  'width': 4, 'height': 4, 'format': 'PNG', 'data': base64.b64encode(self.png).decode('utf-8')}
+        self.redis.redis_client.setex('image:crawled', 100, json.dumps(legacy))
+        self.redis.binary_client.set('ai_chat_image_data:uploaded', self.jpeg, ex=200)
+        self.redis.binary_client.hset('ai_chat_image_meta:uploaded', mapping={
+            'content_type': 'image/jpeg', 'size': len(self.jpeg), 'filename': 'a.jpg'})
+        self.redis.binary_client.expire('ai_chat_image_meta:uploaded', 200)
+
+    def migrate(self, *args):
+        out = StringIO()
+        call_command('migrate_image_storage', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_legacy_layouts_moved_with_content_type_and_ttl(self):
+        """测试两种旧格式都迁入对象存储，保留数据、content_type 和剩余过期时间，旧键被删除"""
+        output = self.migrate()
+
+        self.assertIn('爬虫图片: 已迁移 1 张，失败 0 张', output)
+        self.assertIn('AI对话图片: 已迁移 1 张，失败 0 张', output)
+        for key in ('image:crawled', 'ai_chat_image_data:uploaded', 'ai_chat_image_meta:uploaded'):
+            self.assertFalse(self.redis.binary_client.exists(key))
+
+        blobs = RedisBlobStore()
+        data, meta = blobs.get_by_alias('image', 'crawled')
+        self.assertEqual((data, meta['content_type'], meta['width']), (self.png, 'image/png', 4))
+        self.assertEqual(self.redis.binary_client.ttl('blob_alias:image:crawled'), 100)
+
+        data, meta = blobs.get_by_alias('ai_chat_image', 'uploaded')
+        self.assertEqual((data, meta['content_type']), (self.jpeg, 'image/jpeg'))
+        self.assertEqual(self.redis.binary_client.ttl('blob_alias:ai_chat_image:uploaded'), 200)
+        self.assertEqual(self.redis.binary_client.ttl(blobs.blob_key(blobs.resolve('ai_chat_image', 'uploaded'))), 200)
+        self.assertEqual(blobs.get_alias_meta_many('ai_chat_image', ['uploaded'])[0]['filename'], 'a.jpg')
+        self.assertEqual(blobs.get_stats()['total_bytes'], len(self.png) + len(self.jpeg))
+
+    def test_dry_run_leaves_legacy_keys(self):
+        """测试 --dry-run 只统计数量，不写入"""
+        output = self.migrate('--dry-run')
+
+        self.assertIn('爬虫图片: 可迁移 1 张', output)
+        self.assertTrue(self.redis.binary_client.exists('image:crawled'))
+        self.assertFalse(self.redis.binary_client.exists('blob_alias:image:crawled'))
+
+
+class ImageDerivativeTestCase(SimpleTestCase):
+    def setUp(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (1000, 500), (255, 0, 0, 128)).save(buffer, format='PNG')
+        self.png = buffer.getvalue()
+
+        patcher = mock.patch('crawler.blob_store.redis_service', FakeRedisService())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = ImageDerivativeService()
+        self.factory = RequestFactory()
+
+    def test_no_params_returns_original(self):
+        """测试未带参数时不做处理"""
+        self.assertIsNone(self.service.negotiate(self.factory.get('/img/', HTTP_ACCEPT='image/webp')))
+
+    def test_width_snapped_and_webp_negotiated(self):
+        """测试宽度向上取档，并根据 Accept 协商为 WebP"""
+        spec = self.service.negotiate(self.factory.get('/img/', {'w': 300}, HTTP_ACCEPT='image/webp,*/*'))
+        data, content_type = self.service.render('test:a', self.png, 'image/png', spec)
+
+        self.assertEqual(content_type, 'image/webp')
+        with Image.open(BytesIO(data)) as img:
+            self.assertEqual(img.size, (320, 160))
+
+    def test_jpeg_fallback_and_variant_cached(self):
+        """测试不支持 WebP 时输出 JPEG，第二次请求命中衍生版本缓存"""
+        spec = self.service.negotiate(self.factory.get('/img/', {'w': 100, 'q': 60}, HTTP_ACCEPT='image/*'))
+        first, content_type = self.service.render('test:b', self.png, 'image/png', spec)
+
+        with mock.patch.object(self.service, '_transform') as transform:
+            second, _ = self.service.render('test:b', self.png, 'image/png', spec)
+            transform.assert_not_called()
+
+        self.assertEqual(content_type, 'image/jpeg')
+        self.assertEqual(first, second)
+
+    def test_invalid_params_rejected(self):
+        """测试非法参数"""
+        with self.assertRaises(ValueError):
+            self.service.negotiate(self.factory.get('/img/', {'fmt': 'bmp'}))
+
+
+class RedisServiceBatchTestCase(SimpleTestCase):
+    def test_save_articles_in_one_transaction(self):
+        """测试批量保存在一次事务中写入文章和索引，且同一毫秒内生成的ID不重复"""
+        service = RedisService()
+        service.redis_client = FakeRedis(decode_responses=True)
+        articles = [{'title': f'文章{i}', 'category': '时政' if i % 2 else '国际'} for i in range(5)]
+
+        article_ids = service.save_articles(articles)
+
+        self.assertEqual(len(set(article_ids)), 5)
+        self.assertEqual(service.redis_client.executed_pipelines, 1)
+        self.assertEqual(len(service.get_daily_articles()), 5)
+        self.assertEqual(len(service.get_articles_by_category('时政')), 2)
+        self.assertEqual(json.loads(service.redis_client.get(f"article:{article_ids[0]}"))['title'], '文章0')
+
+    def test_update_task_merges_fields_in_one_call(self):
+        """测试任务更新在服务端合并字段，未更新的字段保留，任务不存在时返回 False"""
+        service = RedisService()
+        service.redis_client = FakeRedis(decode_responses=True)
+        task_id = service.save_task({'id': 'task1', 'status': 'pending', 'total_links': 3})
+
+        with mock.patch.object(service.redis_client, 'evalsha', wraps=service.redis_client.evalsha) as evalsha:
+            self.assertTrue(service.update_task(task_id, {'status': 'running', 'metrics': {'stages': {}}}))
+        evalsha.assert_called_once()
+
+        task = service.get_task(task_id)
+        self.assertEqual((task['status'], task['total_links'], task['metrics']), ('running', 3, {'stages': {}}))
+        self.assertIn('updated_at', task)
+        self.assertEqual(service.redis_client.ttl(f"task:{task_id}"), 86400*7)
+        self.assertFalse(service.update_task('missing', {'status': 'running'}))
+
+
+class ArticleViewCountTestCase(SimpleTestCase):
+    def setUp(self):
+        self.service = RedisService()
+        self.service.redis_client = FakeRedis(decode_responses=True)
+        self.article_id = self.service.save_article({'title': '文章', 'category': '时政'})
+
+    def test_reading_does_not_rewrite_article(self):
+        """测试读取文章不改写文章，阅读量来自独立计数器"""
+        stored = self.service.redis_client.get(f"article:{self.article_id}")
+        self.service.record_article_view(self.article_id, reader='1.1.1.1')
+        self.service.record_article_view(self.article_id, reader='1.1.1.1')
+
+        self.assertEqual(self.service.get_article(self.article_id)['view_count'], 2)
+        self.assertEqual(self.service.redis_client.get(f"article:{self.article_id}"), stored)
+
+    def test_flush_view_stats(self):
+        """测试按天汇总阅读量和独立读者数"""
+        for reader in ('1.1.1.1', '2.2.2.2', '1.1.1.1'):
+            self.service.record_article_view(self.article_id, reader=reader, date='2025-09-01')
+
+        view_stats = self.service.flush_view_stats('2025-09-01')
+
+        self.assertEqual(view_stats['total_views'], 3)
+        self.assertEqual(view_stats['unique_readers'], 2)
+        self.assertEqual(self.service.get_view_stats('2025-09-01')['top_articles'][0]['article_id'], self.article_id)
+
+
+class ArticleBulkLoadTestCase(SimpleTestCase):
+    def setUp(self):
+        self.service = RedisService()
+        self.service.redis_client = FakeRedis(decode_responses=True)
+        self.service.save_articles([
+            {'title': f'文章{i}', 'content': '正文' * 100, 'category': '时政',
+             'crawl_status': 'success' if i < 3 else 'failed'}
+            for i in range(5)
+        ])
+        patcher = mock.patch('crawler.redis_models.redis_service', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_filter_by_status_loads_in_bulk(self):
+        """测试按状态过滤走状态索引，并一次 MGET 读取全部文章"""
+        with mock.patch.object(self.service.redis_client, 'get', side_effect=AssertionError('不应逐篇读取')):
+            articles = RedisNewsArticle.filter(crawl_status='success')
+
+        self.assertEqual(len(articles), 3)
+        self.assertTrue(all(article.content for article in articles))
+
+    def test_projection_and_count_skip_article_bodies(self):
+        """测试只取部分字段和计数时不读取文章正文"""
+        with mock.patch.object(self.service.redis_client, 'mget', side_effect=AssertionError('不应读取正文')):
+            titles = sorted(article.title for article in RedisNewsArticle.filter(fields=['id', 'title'], crawl_status='failed'))
+            success_count = RedisNewsArticle.count(crawl_status='success')
+
+        self.assertEqual(titles, ['文章3', '文章4'])
+        self.assertEqual(success_count, 3)
+        self.assertEqual(RedisNewsArticle.count(category='时政'), 5)
+        self.assertEqual(len(RedisNewsArticle.ids(crawl_status='failed')), 2)
+
+
+class ArticleSearchIndexTestCase(SimpleTestCase):
+    def setUp(self):
+        self.service = RedisService()
+        self.service.redis_client = FakeRedis(decode_responses=True)
+        self.article_ids = self.service.save_articles([
+            {'title': '人工智能助力乡村振兴', 'content': '各地推进人工智能应用。' * 3, 'category': '时政'},
+            {'title': '经济数据发布', 'content': '报告提到人工智能产业增长。', 'category': '财经'},
+            {'title': '体育新闻', 'content': '比赛结果公布。', 'category': '体育'},
+        ])
+
+    def test_tokenize_bigrams_and_words(self):
+        """测试中文切分为二元组，英文按整词小写"""
+        self.assertEqual(tokenize('人工智能 AI 2025'), ['人工', '工智', '智能', 'ai', '2025'])
+        self.assertEqual(index_terms('智能 AI'), ['智能', 'ai', '智', '能'])
+
+    def test_single_character_query(self):
+        """测试单字查询命中包含该字的文章（中文段在索引中同时记录单字）"""
+        self.assertEqual(tokenize('赛'), ['赛'])
+        self.assertEqual(self.service.search_index.search('赛')['results'][0]['id'], self.article_ids[2])
+        self.assertEqual(self.service.search_index.search('智')['total'], 2)
+        self.assertEqual(self.service.search_index.search('智', category='财经')['total'], 1)
+
+    def test_ranked_paginated_and_highlighted(self):
+        """测试检索结果按相关度排序、分页并高亮命中部分"""
+        result = self.service.search_index.search('人工智能', page=1, page_size=1)
+
+        self.assertEqual(result['total'], 2)
+        self.assertEqual(result['results'][0]['id'], self.article_ids[0])
+        self.assertEqual(result['results'][0]['title_highlight'], '<em>人工智能</em>助力乡村振兴')
+        self.assertEqual(self.service.search_index.search('人工智能', page=2, page_size=1)['results'][0]['id'], self.article_ids[1])
+        self.assertEqual(self.service.search_index.search('人工智能', category='财经')['total'], 1)
+        self.assertEqual(self.service.search_articles('比赛'), [self.article_ids[2]])
+
+    def test_resave_and_remove_update_index(self):
+        """测试重新保存文章时移除旧词项，删除后不再命中"""
+        self.service.save_article({'id': self.article_ids[2], 'title': '体育新闻', 'content': '赛程调整。', 'category': '体育'})
+        self.assertEqual(self.service.search_index.search('比赛')['total'], 0)
+
+        self.service.search_index.remove([self.article_ids[2]])
+        self.assertEqual(self.service.search_index.search('赛程')['total'], 0)
+
+    def test_highlight_escapes_html(self):
+        """测试高亮摘要会转义原文中的 HTML"""
+        self.assertEqual(highlight('<b>人工智能</b>', tokenize('智能')), '&lt;b&gt;人工<em>智能</em>&lt;/b&gt;')
+
+
+class ArticleArchiveTestCase(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.service = RedisService()
+        self.service.redis_client = FakeRedis(decode_responses=True)
+        self.service.archive = ArticleArchive(tmpdir.name)
+        self.article_ids = self.service.save_articles([
+            {'title': f'文章{i}', 'content': '正文' * 50, 'category': '时政', 'crawl_status': 'success'}
+            for i in range(3)
+        ])
+
+    def test_cleared_articles_read_from_archive(self):
+        """测试清理后的文章转入归档，读取时透明回退到归档"""
+        self.service.record_article_view(self.article_ids[0])
+        today = timezone.localdate()
+
+        self.assertEqual(self.service.clear_old_articles(days_to_keep=0), 3)
+
+        self.assertIsNone(self.service.redis_client.get(f"article:{self.article_ids[0]}"))
+        article = self.service.get_article(self.article_ids[0])
+        self.assertEqual(article['content'], '正文' * 50)
+        self.assertEqual(article['view_count'], 1)
+        self.assertEqual(sorted(self.service.get_daily_articles(today.isoformat(), status='success')), sorted(self.article_ids))
+        days = self.service.get_articles_by_date_range(today - timedelta(days=1), today)
+        self.assertEqual(len(days[today.isoformat()]), 3)
+        self.assertEqual(days[(today - timedelta(days=1)).isoformat()], [])
+
+    def test_rewriting_a_day_merges_articles(self):
+        """测试同一天再次归档时与已有文章合并，旧数据段被替换"""
+        date = timezone.localdate().isoformat()
+        self.service.archive.write_day(date, [{'id': self.article_ids[0], 'title': '旧标题'}])
+        self.service.archive_daily_articles(date)
+
+        self.assertEqual(len(self.service.archive.list_day(date)), 3)
+        self.assertEqual(self.service.archive.get(self.article_ids[0])['title'], '文章0')
+        self.assertEqual(len([name for name in os.listdir(self.service.archive.root) if name.endswith('.seg')]), 1)
+
+    def test_rewrite_only_removes_segment_it_replaced(self):
+        """测试重写时只删除旧索引引用的数据段，其他写入方的数据段和索引临时文件不受影响"""
+        archive = self.service.archive
+        date = timezone.localdate().isoformat()
+        archive.write_day(date, [{'id': self.article_ids[0], 'title': '文章0'}])
+        replaced = archive._load_index(date)['segment']
+        other = os.path.join(archive.root, f"{date}.1.seg")
+        with open(other, 'wb') as f:
+            f.write(b'other writer')
+
+        archive.write_day(date, [{'id': self.article_ids[1], 'title': '文章1'}])
+
+        segments = sorted(name for name in os.listdir(archive.root) if name.endswith('.seg'))
+        self.assertEqual(segments, sorted([f"{date}.1.seg", archive._load_index(date)['segment']]))
+        self.assertNotIn(replaced, segments)
+        self.assertEqual(len(archive.list_day(date)), 2)
+        self.assertTrue(os.path.exists(archive.lock_path(date)))
+        self.assertFalse([name for name in os.listdir(archive.root) if name.endswith('.tmp')])
+
+
+class ArticleMarkdownTestCase(SimpleTestCase):
+    def setUp(self):
+        fake = FakeRedisService()
+        self.service = RedisService()
+        self.service.redis_client = fake.redis_client
+        self.service.binary_client = fake.binary_client
+        self.article_id = self.service.save_article({
+            'title': '标题', 'source': '人民网', 'category': '时政', 'crawl_status': 'success',
+            'markdown_content': '正文第一段\n\n扫码关注公众号', 'publish_date': '2025-09-01T08:00:00',
+        })
+        patcher = mock.patch('crawler.views.redis_service', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        from .views import get_article_markdown
+        return get_article_markdown(self.factory.get(f'/api/crawler/article/{self.article_id}/', **headers), self.article_id)
+
+    def test_precompressed_markdown_with_etag(self):
+        """测试保存时预渲染的 Markdown 以 gzip 直接返回，并支持条件请求"""
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        markdown = gzip.decompress(response.content).decode('utf-8')
+        self.assertTrue(markdown.startswith('# 标题'))
+        self.assertIn('2025年09月01日 08:00', markdown)
+        self.assertNotIn('公众号', markdown)
+        self.assertEqual(response['X-View-Count'], '1')
+
+        not_modified = self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['X-View-Count'], '2')
+
+    def test_missing_rendition_rendered_lazily(self):
+        """测试缺少预渲染结果时按需生成，未接受 gzip 的客户端得到未压缩内容"""
+        self.service.binary_client.delete(self.service.markdown_cache.key(self.article_id))
+
+        response = self.get()
+
+        self.assertNotIn('Content-Encoding', response)
+        self.assertTrue(response.content.decode('utf-8').startswith('# 标题'))
+        self.assertNotEqual(self.service.binary_client.hgetall(self.service.markdown_cache.key(self.article_id)), {})
+
+    def test_nginx_decompresses_for_clients_without_gzip(self):
+        """测试 nginx 中把 Accept-Encoding 改写为 gzip 的 location 都开启了 gunzip（否则不接受 gzip 的客户端收到压缩数据）"""
+        import re
+        conf_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'nginx', 'nginx.conf')
+        with open(conf_path, encoding='utf-8') as f:
+            conf = f.read()
+
+        blocks = re.findall(r'location [^{]+\{[^}]*\}', conf)
+        forced = [block for block in blocks if 'proxy_set_header Accept-Encoding gzip;' in block]
+        self.assertTrue(forced)
+        for block in forced:
+            self.assertIn('gunzip on;', block, block.splitlines()[0])
+
+
+class DailyArticlesConditionalGetTestCase(SimpleTestCase):
+    def test_incomplete_list_not_cached(self):
+        """测试尚无文章（爬取中）时响应禁止缓存，不输出 ETag"""
+        service = RedisService()
+        service.redis_client = FakeRedis(decode_responses=True)
+        service.redis_client.set(f"crawl_status:{timezone.localdate().isoformat()}", 'running')
+        from .views import get_daily_articles
+
+        with mock.patch('crawler.views.redis_service', service), \
+                mock.patch('crawler.redis_models.redis_service', service):
+            response = get_daily_articles(RequestFactory().get('/api/crawler/daily/'))
+
+        self.assertEqual(json.loads(response.content)['status'], 'crawling')
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
+
+    def test_daily_list_revalidated_by_version(self):
+        """测试当日文章列表按版本号生成 ETag，保存新文章后版本变化"""
+        service = RedisService()
+        service.redis_client = FakeRedis(decode_responses=True)
+        service.save_article({'title': '文章', 'crawl_status': 'success'})
+        from .views import get_daily_articles
+        factory = RequestFactory()
+
+        with mock.patch('crawler.views.redis_service', service), \
+                mock.patch('crawler.redis_models.redis_service', service):
+            response = get_daily_articles(factory.get('/api/crawler/daily/'))
+            etag = response['ETag']
+            cached = get_daily_articles(factory.get('/api/crawler/daily/', HTTP_IF_NONE_MATCH=etag))
+            service.save_article({'title': '新文章', 'crawl_status': 'success'})
+            changed = get_daily_articles(factory.get('/api/crawler/daily/', HTTP_IF_NONE_MATCH=etag))
+
+        self.assertEqual(json.loads(response.content)['total_articles'], 1)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(json.loads(changed.content)['total_articles'], 2)
+
+    def test_daily_delta_since_revision(self):
+        """测试按修订号只返回之后追加的文章，修订号超前（跨天）时返回完整列表"""
+        service = RedisService()
+        service.redis_client = FakeRedis(decode_responses=True)
+        service.save_article({'title': '早间文章', 'crawl_status': 'success'})
+        from .views import get_daily_articles
+        factory = RequestFactory()
+
+        with mock.patch('crawler.views.redis_service', service), \
+                mock.patch('crawler.redis_models.redis_service', service):
+            revision = json.loads(get_daily_articles(factory.get('/api/crawler/daily/')).content)['revision']
+            new_id = service.save_articles([{'title': '突发新闻', 'crawl_status': 'success'},
+                                            {'title': '失败', 'crawl_status': 'failed'}])[0]
+            delta = json.loads(get_daily_articles(factory.get('/api/crawler/daily/', {'since_revision': revision})).content)
+            stale = json.loads(get_daily_articles(factory.get('/api/crawler/daily/', {'since_revision': 99})).content)
+
+        self.assertTrue(delta['delta'])
+        self.assertEqual(delta['revision'], revision + 1)
+        self.assertEqual(delta['article_ids'], [new_id])
+        self.assertFalse(stale['delta'])
+        self.assertEqual(stale['total_articles'], 2)
+
+
+class IncrementalCrawlTestCase(SimpleTestCase):
+    def setUp(self):
+        self.service = RedisService()
+        self.service.redis_client = FakeRedis(decode_responses=True)
+        for target in ('crawler.services.redis_service', 'crawler.redis_models.redis_service'):
+            patcher = mock.patch(target, self.service)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.crawler = PeopleNetCrawler()
+        self.article = {
+            'title': '标题', 'url': 'http://politics.people.com.cn/n1/2025/0901/c1001-1.html', 'source': '人民网',
+            'publish_date': None, 'content': '正文', 'markdown_content': '正文', 'category': '时政',
+            'word_count': 2, 'image_count': 0,
+        }
+        self.crawler._save_articles([dict(self.article)])
+
+    def test_url_fingerprint_normalized(self):
+        """测试指纹忽略协议、大小写、锚点、追踪参数和参数顺序"""
+        self.assertEqual(
+            url_fingerprint('https://WWW.people.com.cn/a.html?b=2&a=1&utm_source=x#top'),
+            url_fingerprint('http://www.people.com.cn/a.html?a=1&b=2'),
+        )
+        self.assertEqual(url_fingerprint('/a.html'), url_fingerprint('http://www.people.com.cn/a.html'))
+
+    def test_rerun_skips_ingested_links(self):
+        """测试重跑时跳过已入库的链接"""
+        links = [{'title': '标题', 'url': self.article['url']}, {'title': '新文章', 'url': '/n1/new.html'}]
+
+        planned, skipped = self.crawler._plan_links(links)
+
+        self.assertEqual(skipped, 1)
+        self.assertEqual([link['title'] for link in planned], ['新文章'])
+
+    def test_refresh_saves_only_changed_articles(self):
+        """测试刷新模式下未变化的文章不保存，修改过的文章沿用原ID覆盖"""
+        (link_info,), _ = self.crawler._plan_links([{'title': '标题', 'url': self.article['url']}], refresh=True)
+        article_id = link_info['article_id']
+
+        self.assertFalse(self.crawler._is_changed(link_info, dict(self.article)))
+        edited = dict(self.article, content='修改后的正文')
+        self.assertTrue(self.crawler._is_changed(link_info, edited))
+        self.crawler._save_articles([edited])
+
+        self.assertEqual(self.service.get_daily_articles(), [article_id])
+        self.assertEqual(self.service.get_article(article_id)['content'], '修改后的正文')
+
+
+class DailyCrawlTaskTestCase(SimpleTestCase):
+    def setUp(self):
+        self.service = mock.Mock()
+        self.refresh = mock.Mock()
+        for target, value in (('crawler.tasks.redis_service', self.service), ('crawler.tasks.refresh_edge_cache', self.refresh)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _run(self, result):
+        from .tasks import run_daily_crawler_task
+        with mock.patch('crawler.tasks.PeopleNetCrawler') as crawler_class:
+            crawler_class.return_value.crawl_today_news.return_value = result
+            run_daily_crawler_task('task', backend='threaded')
+
+    def test_failed_crawl_skips_archive(self):
+        """测试爬取返回失败时状态记为 failed，不写归档、不刷新边缘缓存，并释放锁"""
+        self._run({'success': False, 'message': '获取新闻列表失败'})
+
+        self.service.set_daily_crawl_status.assert_called_once_with('failed')
+        self.service.archive_daily_articles.assert_not_called()
+        self.refresh.assert_not_called()
+        self.service.release_daily_crawl_lock.assert_called_once()
+
+    def test_successful_crawl_archives(self):
+        """测试爬取成功时状态记为 success，写入归档并刷新边缘缓存"""
+        self._run({'success': True, 'success_count': 1, 'failed_count': 0})
+
+        self.service.set_daily_crawl_status.assert_called_once_with('success')
+        self.service.archive_daily_articles.assert_called_once()
+        self.refresh.assert_called_once_with(['/api/crawler/daily/'])
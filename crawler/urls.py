@@ -13,6 +13,15 @@ urlpatterns = [
     # 辅助API：获取爬取状态
     path('status/', views.get_crawl_status, name='crawl_status'),
     
+    # 监控API：Prometheus 格式的爬取阶段耗时指标
+    path('metrics/', views.get_crawl_metrics, name='crawl_metrics'),
+    
+    # 归档API：按日期范围获取文章（包括已归档的往日文章）
+    path('articles/', views.get_articles_by_date, name='articles_by_date'),
+    
+    # 检索API：全文检索文章
+    path('search/', views.search_articles, name='search_articles'),
+    
     # 图片API：获取缓存的图片
     path('image/<str:image_id>/', views.get_cached_image, name='cached_image'),
     
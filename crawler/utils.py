@@ -74,7 +74,9 @@ def extract_images(content):
             'alt': alt
         })
     
-    # 提取HTML格式的图片
+    # 提取HTML格式的图片（正文通常是纯文本 + Markdown 图片，不含 <img> 时不必解析）
+    if '<img' not in content.lower():
+        return images
     soup = BeautifulSoup(content, 'html.parser')
     img_tags = soup.find_all('img')
     for img in img_tags:
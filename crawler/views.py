@@ -1,19 +1,26 @@
-import json
 import re
+import gzip
+import json
 import logging
 import threading
 from datetime import datetime, timedelta
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import never_cache
 from django.utils import timezone
 from django.core.paginator import Paginator
+from django.utils.cache import get_conditional_response, add_never_cache_headers
 
 from .redis_models import RedisNewsArticle, RedisCrawlTask, RedisStats
 from .redis_service import redis_service
 from .services import PeopleNetCrawler
 from .image_service import image_cache_service
+from .image_derivatives import image_derivative_service
 from .tasks import run_daily_crawler_task
+from .config import ARTICLE_ARCHIVE_CONFIG
+from .task_metrics import render_task_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from legacy_pi_backend.conditional import conditional_get, make_etag
 
 logger = logging.getLogger(__name__)
 
@@ -33,26 +40,58 @@ logger = logging.getLogger(__name__)
         # thread = threading.Thread(target=run_daily_crawler)
         # thread.daemon = True
         # thread.start()
+def _daily_articles_stamp(request):
+    """当日文章列表的版本戳：保存文章时递增的修订号 + 爬取状态（+ 增量查询的起始修订号）"""
+    date = timezone.localdate().isoformat()
+    version, status = redis_service.get_daily_version(date)
+    return make_etag('daily', date, version, status, request.GET.get('since_revision', '')), None
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
+@conditional_get(_daily_articles_stamp, max_age=60)
 def get_daily_articles(request):
     """
     获取当日文章ID列表
-    首次请求时触发爬取，返回所有文章ID
+    首次请求时触发爬取，返回所有文章ID及当前修订号（revision）；
+    带 since_revision 参数时只返回该修订号之后追加的文章（delta=true），
+    since_revision 大于当前修订号（如已跨天）时返回完整列表（delta=false）。
+    尚无文章（爬取中或未开始）的响应禁止缓存，避免 nginx 和客户端保存空结果。
     """
     try:
-        today = timezone.now().date()
+        today = timezone.localdate()
         status = redis_service.get_daily_crawl_status()
 
+        since_revision = request.GET.get('since_revision')
+        if since_revision is not None:
+            try:
+                since_revision = int(since_revision)
+            except ValueError:
+                return JsonResponse({'error': 'since_revision 必须是整数'}, status=400)
+            revision, delta_ids = redis_service.get_daily_delta(since_revision)
+            if revision and 0 <= since_revision <= revision:
+                return JsonResponse({
+                    'msg': 'success',
+                    'crawl_date': today.strftime('%Y-%m-%d'),
+                    'revision': revision,
+                    'since_revision': since_revision,
+                    'delta': True,
+                    'total_articles': len(delta_ids),
+                    'article_ids': delta_ids,
+                    'status': 'completed'
+                })
+
         # 尝试获取已成功的文章
-        today_article_ids = RedisNewsArticle.filter(crawl_status='success')
-        today_article_ids = [article.id for article in today_article_ids]
+        revision, _ = redis_service.get_daily_version()
+        today_article_ids = RedisNewsArticle.ids(crawl_status='success')
 
         if today_article_ids:
             # 如果有成功的数据，直接返回
             return JsonResponse({
                 'msg': 'success',
                 'crawl_date': today.strftime('%Y-%m-%d'),
+                'revision': revision,
+                'delta': False,
                 'total_articles': len(today_article_ids),
                 'article_ids': today_article_ids,
                 'status': 'completed' # 状态可以叫 completed 或 cached
@@ -60,12 +99,14 @@ def get_daily_articles(request):
         
         # 如果没有成功的数据，根据状态返回不同信息
         if status == 'running':
-            return JsonResponse({
+            response = JsonResponse({
                 'msg': 'crawling_in_progress',
                 'crawl_date': today.strftime('%Y-%m-%d'),
                 'status': 'crawling',
                 'message': '每日文章正在爬取中，请稍后重试。'
             })
+            add_never_cache_headers(response)
+            return response
         
         if status == 'failed':
             return JsonResponse({
@@ -76,12 +117,14 @@ def get_daily_articles(request):
             }, status=500)
 
         # 默认情况，例如任务还未开始
-        return JsonResponse({
+        response = JsonResponse({
             'msg': 'no_data_yet',
             'crawl_date': today.strftime('%Y-%m-%d'),
             'status': 'pending',
             'message': '今日文章尚未开始爬取或暂无数据。'
         })
+        add_never_cache_headers(response)
+        return response
     
     except Exception as e:
         logger.error(f"查询每日文章失败: {str(e)}")
@@ -92,106 +135,65 @@ def get_daily_articles(request):
 def get_article_markdown(request, article_id):
     """
     根据文章ID获取Markdown格式内容
+    Markdown 在保存文章时预先渲染并压缩，支持 ETag 条件请求；客户端接受 gzip 时直接返回压缩数据。
+    经 nginx 代理时请求头统一为 Accept-Encoding: gzip，不接受 gzip 的客户端由 nginx 的 gunzip 解压。
+    阅读量通过 X-View-Count 响应头返回。
     """
     try:
-        article = RedisNewsArticle.get(article_id)
-        
-        if not article or article.crawl_status != 'success':
+        rendition = redis_service.markdown_cache.get(article_id)
+        if not rendition:
             return HttpResponse('文章不存在', status=404, content_type='text/plain; charset=utf-8')
         
-        # 构建完整的Markdown内容
-        publish_date_str = article.publish_date
-        if isinstance(article.publish_date, str):
-            from datetime import datetime
-            try:
-                dt = datetime.fromisoformat(article.publish_date.replace('Z', '+00:00'))
-                publish_date_str = dt.strftime('%Y年%m月%d日 %H:%M')
-            except:
-                publish_date_str = article.publish_date
-        else:
-            publish_date_str = article.publish_date.strftime('%Y年%m月%d日 %H:%M')
+        # 阅读量记在独立计数器中，文章本身保持只读
+        reader = request.META.get('HTTP_X_REAL_IP') or request.META.get('REMOTE_ADDR')
+        views = redis_service.record_article_view(article_id, reader=reader)
         
-        created_at_str = article.created_at
-        if isinstance(article.created_at, str):
-            try:
-                dt = datetime.fromisoformat(article.created_at.replace('Z', '+00:00'))
-                created_at_str = dt.strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                created_at_str = article.created_at
-        else:
-            created_at_str = article.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 渲染前过滤“关注公众号/二维码/扫码”等推广类内容（针对已缓存旧数据的兜底处理）
-        def filter_promo_content(md_text: str) -> str:
-            if not md_text:
-                return md_text
-            # 关键词列表（含常见变体）
-            keywords = [
-                '关注公众号', '关注 公众号', '公众号', '二维码', '扫码', '微信', '微博', '客户端', '订阅', '官微'
-            ]
-            # 逐行过滤：
-            # - 含关键词的纯文本行
-            # - 含关键词的Markdown图片行
-            filtered_lines = []
-            for line in md_text.split('\n'):
-                normalized = line.strip()
-                lower_line = normalized.lower()
-                if not normalized:
-                    filtered_lines.append(line)
-                    continue
-                # 命中关键词即过滤
-                if any(k in normalized for k in keywords):
-                    # 只有当是图片且包含关键词或者纯文本推广时，均跳过
-                    if normalized.startswith('![') or True:
-                        continue
-                # 针对图片的额外兜底：凡是图片alt或链接中包含关键词，删除
-                if normalized.startswith('![') and any(k in normalized for k in keywords):
-                    continue
-                filtered_lines.append(line)
-            md_text = '\n'.join(filtered_lines)
-            # 收敛多余空行
-            md_text = re.sub(r"\n{3,}", "\n\n", md_text)
-            return md_text.strip()
-
-        markdown_content = f"""# {article.title}
-
-                        **来源**: {article.source}  
-                        **发布时间**: {publish_date_str}  
-                        **分类**: {article.category}  
-                        **字数**: {article.word_count}  
-                        **原文链接**: [{article.url}]({article.url})
-
-                        ---
-
-                        {article.markdown_content}
-
-                        ---
-
-                        *本文由人民网爬虫系统自动采集整理*  
-                        *采集时间: {created_at_str}*  
-                        *阅读次数: {article.view_count}*
-                        """
-        # 最后一步过滤（确保旧缓存中的推广内容被清理）
-        markdown_content = filter_promo_content(markdown_content)
-
-        # 返回纯文本的Markdown内容
-        response = HttpResponse(markdown_content, content_type='text/markdown; charset=utf-8')
-        response['Content-Disposition'] = f'inline; filename="{article.title}.md"'
+        # 压缩与未压缩的内容是不同的表示，使用不同的强 ETag
+        use_gzip = _accepts_gzip(request)
+        etag = f'"{rendition["etag"]}-gz"' if use_gzip else f'"{rendition["etag"]}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            if use_gzip:
+                response = HttpResponse(rendition['gzip'], content_type='text/markdown; charset=utf-8')
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(gzip.decompress(rendition['gzip']), content_type='text/markdown; charset=utf-8')
+            response['Content-Disposition'] = f'inline; filename="{rendition["title"]}.md"'
+        
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        # 每次阅读都要计数，共享缓存不保存，客户端每次带 ETag 重新验证
+        response['Cache-Control'] = 'private, no-cache'
+        if views is not None:
+            response['X-View-Count'] = str(rendition['base_views'] + views)
         return response
         
-
     except Exception as e:
         logger.error(f"获取文章Markdown失败: {str(e)}")
         return HttpResponse(f'获取文章失败: {str(e)}', status=500, content_type='text/plain; charset=utf-8')
 
+
+def _accepts_gzip(request):
+    """客户端是否接受 gzip 编码"""
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = coding.strip().partition(';')
+        if name.strip().lower() == 'gzip':
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_crawl_status(request):
     """
     获取当前爬取状态（可选的辅助接口）
+    stages 为最近一次任务各阶段耗时汇总（运行中随进度更新），slowest_articles 为总耗时最长的文章（数量由 slowest 参数指定，默认5）
     """
     try:
-        today = timezone.now().date()
+        today = timezone.localdate()
+        try:
+            slowest = min(max(int(request.GET.get('slowest', 5)), 0), 50)
+        except ValueError:
+            return JsonResponse({'error': 'slowest 必须是整数'}, status=400)
         
         # 获取统计信息
         stats = RedisStats.get_crawler_stats()
@@ -222,7 +224,11 @@ def get_crawl_status(request):
                 'task_id': today_task.id,
                 'started_at': format_datetime(today_task.started_at),
                 'completed_at': format_datetime(today_task.completed_at),
-                'total_tasks': stats.get('total_tasks_count', 0)
+                'total_tasks': stats.get('total_tasks_count', 0),
+                'duration_seconds': today_task.duration_seconds,
+                'stages': today_task.stages,
+                'slowest_articles': today_task.slowest_articles(slowest),
+                'metrics': today_task.metrics
             })
         else:
             return JsonResponse({
@@ -237,22 +243,109 @@ def get_crawl_status(request):
         logger.error(f"获取爬取状态失败: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
+@csrf_exempt
+@never_cache
+@require_http_methods(["GET"])
+def get_crawl_metrics(request):
+    """
+    Prometheus 格式的爬取指标：最近一次任务的进度、耗时和各阶段耗时分位数
+    """
+    try:
+        recent_tasks = RedisCrawlTask.get_recent(1)
+        body = render_task_metrics(recent_tasks[0] if recent_tasks else None)
+        return HttpResponse(body, content_type=METRICS_CONTENT_TYPE)
+        
+    except Exception as e:
+        logger.error(f"获取爬取指标失败: {str(e)}")
+        return HttpResponse(f'获取爬取指标失败: {str(e)}', status=500, content_type='text/plain; charset=utf-8')
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_articles_by_date(request):
+    """
+    按日期范围获取文章摘要（当天读取 Redis，较早的日期读取磁盘归档）
+    参数: start、end 日期（YYYY-MM-DD，end 默认等于 start），status 爬取状态（默认 success，传 all 不过滤）
+    """
+    try:
+        try:
+            start_date = datetime.strptime(request.GET.get('start', ''), '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.GET.get('end') or request.GET['start'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            return JsonResponse({'error': '日期格式错误，应为 YYYY-MM-DD'}, status=400)
+        
+        if end_date < start_date:
+            return JsonResponse({'error': 'end 不能早于 start'}, status=400)
+        if (end_date - start_date).days + 1 > ARTICLE_ARCHIVE_CONFIG['max_range_days']:
+            return JsonResponse({'error': f"日期范围不能超过 {ARTICLE_ARCHIVE_CONFIG['max_range_days']} 天"}, status=400)
+        
+        status = request.GET.get('status', 'success')
+        days = redis_service.get_articles_by_date_range(start_date, end_date, status=None if status == 'all' else status)
+        return JsonResponse({
+            'msg': 'success',
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'total_articles': sum(len(articles) for articles in days.values()),
+            'days': days,
+        })
+        
+    except Exception as e:
+        logger.error(f"按日期获取文章失败: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def search_articles(request):
+    """
+    全文检索文章（覆盖最近多日的文章）
+    参数: q 关键词，page 页码，page_size 每页数量，category 分类（可选）
+    返回按相关度排序的结果，标题和摘要中命中的部分用 <em> 标出
+    """
+    try:
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return JsonResponse({'error': '缺少搜索关键词 q'}, status=400)
+        
+        try:
+            page = int(request.GET.get('page', 1))
+            page_size = int(request.GET.get('page_size', 0)) or None
+        except ValueError:
+            return JsonResponse({'error': 'page 和 page_size 必须为整数'}, status=400)
+        
+        result = redis_service.search_index.search(
+            query, page=page, page_size=page_size, category=request.GET.get('category') or None
+        )
+        return JsonResponse(dict(result, msg='success'))
+        
+    except Exception as e:
+        logger.error(f"搜索文章失败: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_cached_image(request, image_id):
     """
     获取缓存的图片
+    支持 w（宽度）、q（质量）、fmt（webp/jpeg/auto）参数返回缩放/转码后的版本
     """
     try:
+        try:
+            spec = image_derivative_service.negotiate(request)
+        except ValueError as e:
+            return HttpResponse(f'参数错误: {str(e)}', status=400, content_type='text/plain; charset=utf-8')
+        
         # 获取图片数据
         image_data, content_type = image_cache_service.get_image_data(image_id)
         
         if image_data is None:
             return HttpResponse('图片不存在', status=404, content_type='text/plain; charset=utf-8')
         
+        if spec:
+            image_data, content_type = image_derivative_service.render(f"crawler:{image_id}", image_data, content_type, spec)
+        
         # 返回图片数据
         response = HttpResponse(image_data, content_type=content_type)
         response['Cache-Control'] = 'public, max-age=86400'  # 缓存1天
+        response['Vary'] = 'Accept'
         response['Content-Disposition'] = f'inline; filename="{image_id}"'
         
         return response
@@ -270,7 +363,7 @@ def reset_daily_crawler(request):
     用于解决第二天无法获取新数据的问题
     """
     try:
-        today = timezone.now().date()
+        today = timezone.localdate()
         today_str = today.isoformat()
         
         logger.info(f"手动重置每日爬虫状态: {today_str}")
@@ -292,6 +385,11 @@ def reset_daily_crawler(request):
         # 3. 清理旧数据
         deleted_count = RedisStats.clear_old_data(days_to_keep=1)
         
+        # 默认保留今日的增量爬取登记，重新爬取时从检查点继续；full=true 时清除，重新抓取全部文章
+        full_reset = request.GET.get('full', '').lower() == 'true'
+        if full_reset:
+            redis_service.crawl_registry.clear(today_str)
+        
         # 4. 清理更早的状态（可选）
         for days_ago in range(2, 7):
             old_date = today - timedelta(days=days_ago)
@@ -309,6 +407,7 @@ def reset_daily_crawler(request):
             'data': {
                 'reset_date': today_str,
                 'deleted_articles': deleted_count,
+                'full_reset': full_reset,
                 'cleared_status_keys': [
                     today_status_key,
                     yesterday_status_key,
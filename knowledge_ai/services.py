@@ -7,6 +7,7 @@ import logging
 import time
 from typing import Dict, Any, Optional, Union
 from volcenginesdkarkruntime import Ark
+from legacy_pi_backend.instrumentation import instrument_llm_client
 from .config import AI_MODEL_CONFIG, KNOWLEDGE_AI_PROMPTS
 from .models import QuestionAnalysis
 from knowledge_quiz.models import Knowledge, Question
@@ -18,7 +19,7 @@ class KnowledgeAiService:
     
     def __init__(self):
         """初始化知识AI服务"""
-        self.client = Ark(api_key=AI_MODEL_CONFIG['api_key'])
+        self.client = instrument_llm_client(Ark(api_key=AI_MODEL_CONFIG['api_key']), 'knowledge_ai')
         self.model = AI_MODEL_CONFIG['model']
     
     def explain_question(self, 
@@ -3,15 +3,32 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Q, Max, Count
 from django.db import transaction
 import json
 import random
 from .models import Knowledge, Question, Answer, QuizSession, DailyQuestion
+from legacy_pi_backend.conditional import conditional_get, make_etag
+
+
+def _knowledge_list_stamp(request):
+    """知识列表的版本戳：查询参数 + 知识条目数量和最近更新时间"""
+    stats = Knowledge.objects.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    etag = make_etag('knowledge', request.GET.urlencode(), stats['count'], stats['last_modified'])
+    return etag, stats['last_modified']
+
+
+def _knowledge_detail_stamp(request, knowledge_id):
+    """单条知识的版本戳"""
+    updated_at = Knowledge.objects.filter(id=knowledge_id).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return make_etag('knowledge', knowledge_id, updated_at), updated_at
 
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@conditional_get(_knowledge_list_stamp, max_age=300)
 def get_knowledge_list(request):
     """获取知识列表"""
     try:
@@ -90,6 +107,7 @@ def get_knowledge_list(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@conditional_get(_knowledge_detail_stamp, max_age=300)
 def get_knowledge_detail(request, knowledge_id):
     """获取知识详情"""
     try:
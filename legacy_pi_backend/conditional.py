@@ -0,0 +1,66 @@
+"""
+条件请求支持
+只读接口先计算一个廉价的版本戳（Redis 中的版本号、数据库 updated_at 最大值等），
+客户端带 If-None-Match / If-Modified-Since 且版本未变时直接返回 304，不查询和序列化数据；
+同时输出 Cache-Control，nginx 的 proxy_cache（已开启 proxy_cache_revalidate）据此缓存并向后端重新验证。
+"""
+
+import hashlib
+import logging
+from functools import wraps
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(*parts):
+    """由若干版本信息拼出强 ETag"""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def conditional_get(stamp_func, max_age=60, public=True):
+    """
+    为只读视图添加 ETag / Last-Modified 校验和 Cache-Control
+
+    Args:
+        stamp_func: stamp_func(request, *args, **kwargs) -> (etag, last_modified)；
+                    etag 为 make_etag 的结果，last_modified 为 datetime，均可为 None；
+                    返回 None 表示无法确定版本（如数据不存在），此时按普通请求处理
+        max_age: 缓存时间(秒)
+        public: 是否允许 nginx 等共享缓存保存
+
+    视图自行设置了 Cache-Control 时（如数据尚不完整，调用 add_never_cache_headers）原样返回，
+    不再输出 ETag 和缓存时间。
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            try:
+                stamp = stamp_func(request, *args, **kwargs)
+            except Exception as e:
+                logger.warning(f"计算版本戳失败: {str(e)}")
+                stamp = None
+
+            etag, last_modified = stamp or (None, None)
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+            response = None
+            if etag or last_modified:
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200 or response.has_header('Cache-Control'):
+                    return response
+
+            if etag:
+                response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            if public:
+                patch_cache_control(response, public=True, max_age=max_age)
+            else:
+                patch_cache_control(response, private=True, max_age=max_age)
+            return response
+        return wrapper
+    return decorator
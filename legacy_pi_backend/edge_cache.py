@@ -0,0 +1,45 @@
+"""
+nginx 边缘缓存刷新
+开源版 nginx 没有缓存清除接口，这里向 nginx 发送带 X-Cache-Refresh 头的请求：
+nginx 对这类请求绕过缓存回源，并用新的响应覆盖缓存中的旧内容。
+nginx 的缓存键包含 Origin（CORS 响应头随来源变化），每个路径分别以不带 Origin 和
+EDGE_CACHE_REFRESH_ORIGINS 中的各个来源刷新；未列出的来源等缓存过期后更新。
+"""
+
+import logging
+import threading
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_edge_cache(paths):
+    """
+    刷新 nginx 中这些路径的缓存（在后台线程中发送，不阻塞调用方）
+
+    Args:
+        paths: 路径列表，可带查询参数，如 /api/md-docs/category/?category=spirit
+    """
+    base_url = getattr(settings, 'EDGE_CACHE_REFRESH_URL', '')
+    token = getattr(settings, 'EDGE_CACHE_REFRESH_TOKEN', '')
+    if not base_url or not token or not paths:
+        return None
+
+    origins = [None] + list(getattr(settings, 'EDGE_CACHE_REFRESH_ORIGINS', []))
+
+    def run():
+        for path in paths:
+            for origin in origins:
+                headers = {'X-Cache-Refresh': token}
+                if origin:
+                    headers['Origin'] = origin
+                try:
+                    response = requests.get(f"{base_url.rstrip('/')}{path}", headers=headers, timeout=5)
+                    logger.info(f"已刷新边缘缓存: {path} {origin or ''} ({response.status_code})")
+                except Exception as e:
+                    logger.warning(f"刷新边缘缓存失败: {path} {origin or ''} - {str(e)}")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,180 @@
+"""
+后端性能埋点
+定义各子系统的指标并提供埋点：HTTP 请求（MetricsMiddleware）、数据库查询（execute_wrapper）、
+Redis 命令（TimedRedis）、MongoDB 命令（pymongo 命令监听器）、方舟大模型调用和 TTS 合成。
+指标由 /metrics 导出，多进程合并见 metrics.py。
+"""
+
+import time
+import logging
+from contextlib import contextmanager
+import redis
+import redis.client
+from pymongo import monitoring
+from django.db.backends.signals import connection_created
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SLOW_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+SQL_OPERATIONS = {'select', 'insert', 'update', 'delete', 'savepoint', 'release', 'rollback', 'begin', 'commit'}
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'HTTP 请求处理耗时（按路由名称，流式响应只计到返回响应对象）',
+    ['view', 'method', 'status'], buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+HTTP_IN_FLIGHT = registry.gauge('http_requests_in_flight', '正在处理的 HTTP 请求数（所有 worker 之和）')
+DB_QUERY_SECONDS = registry.histogram(
+    'db_query_duration_seconds', '数据库查询耗时', ['alias', 'operation', 'status'], buckets=FAST_BUCKETS)
+REDIS_COMMAND_SECONDS = registry.histogram(
+    'redis_command_duration_seconds', 'Redis 命令耗时（pipeline 按整批计）', ['command', 'status'], buckets=FAST_BUCKETS)
+MONGO_COMMAND_SECONDS = registry.histogram(
+    'mongodb_command_duration_seconds', 'MongoDB 命令耗时', ['command', 'status'], buckets=FAST_BUCKETS)
+LLM_REQUEST_SECONDS = registry.histogram(
+    'llm_request_duration_seconds', '大模型调用耗时（流式调用计到读完全部内容）',
+    ['service', 'model', 'stream', 'status'], buckets=SLOW_BUCKETS)
+LLM_FIRST_CHUNK_SECONDS = registry.histogram(
+    'llm_first_chunk_seconds', '流式大模型调用收到首个数据块的等待时间', ['service', 'model'], buckets=SLOW_BUCKETS)
+LLM_TOKENS = registry.counter('llm_tokens_total', '大模型消耗的 token 数', ['service', 'model', 'type'])
+TTS_SYNTHESIS_SECONDS = registry.histogram(
+    'tts_synthesis_duration_seconds', 'TTS 合成耗时', ['mode', 'status'], buckets=SLOW_BUCKETS)
+TTS_CHARACTERS = registry.counter('tts_characters_total', 'TTS 合成的文本字数', ['mode'])
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """记录 with 块的耗时：正常结束 status=ok，抛出异常（包括生成器被提前关闭）为 error"""
+    started = time.monotonic()
+    status = 'error'
+    try:
+        yield
+        status = 'ok'
+    finally:
+        histogram.observe(time.monotonic() - started, status=status, **labels)
+
+
+class MetricsMiddleware:
+    """记录每个请求的耗时和进行中的请求数，请求结束后按间隔把本进程的指标写入共享目录"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        HTTP_IN_FLIGHT.inc()
+        started = time.monotonic()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            match = getattr(request, 'resolver_match', None)
+            HTTP_REQUEST_SECONDS.observe(
+                time.monotonic() - started,
+                view=match.view_name if match else '<unmatched>',
+                method=request.method if request.method in HTTP_METHODS else 'other',
+                status=status,
+            )
+            registry.maybe_flush()
+
+
+# ---- 数据库 ----
+def _time_query(execute, sql, params, many, context):
+    operation = sql.split(None, 1)[0].lower() if isinstance(sql, str) and sql.strip() else ''
+    with timed(DB_QUERY_SECONDS, alias=context['connection'].alias,
+               operation=operation if operation in SQL_OPERATIONS else 'other'):
+        return execute(sql, params, many, context)
+
+
+def _install_query_timer(sender, connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_install_query_timer, dispatch_uid='legacy_pi_backend.instrumentation.query_timer')
+
+
+# ---- Redis ----
+class TimedPipeline(redis.client.Pipeline):
+    """按整批记录耗时的 pipeline"""
+
+    def execute(self, raise_on_error=True):
+        with timed(REDIS_COMMAND_SECONDS, command='multi' if self.transaction else 'pipeline'):
+            return super().execute(raise_on_error)
+
+
+class TimedRedis(redis.Redis):
+    """记录每条命令耗时的 Redis 客户端"""
+
+    def execute_command(self, *args, **options):
+        with timed(REDIS_COMMAND_SECONDS, command=str(args[0]).lower()):
+            return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+# ---- MongoDB ----
+class MongoCommandTimer(monitoring.CommandListener):
+    """pymongo 命令监听器（创建 MongoClient 时通过 event_listeners 传入）"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, status='ok')
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, status='error')
+
+
+# ---- 大模型 ----
+def instrument_llm_client(client, service):
+    """包装方舟客户端的 chat.completions.create，记录调用耗时和 token 数，返回原客户端"""
+    completions = client.chat.completions
+    create = completions.create
+
+    def timed_create(*args, **kwargs):
+        labels = {'service': service, 'model': kwargs.get('model', '')}
+        stream = bool(kwargs.get('stream'))
+        started = time.monotonic()
+        try:
+            result = create(*args, **kwargs)
+        except Exception:
+            LLM_REQUEST_SECONDS.observe(time.monotonic() - started, stream=str(stream).lower(), status='error', **labels)
+            raise
+        if stream:
+            return _timed_stream(result, started, labels)
+        LLM_REQUEST_SECONDS.observe(time.monotonic() - started, stream='false', status='ok', **labels)
+        _count_tokens(getattr(result, 'usage', None), labels)
+        return result
+
+    completions.create = timed_create
+    return client
+
+
+def _timed_stream(chunks, started, labels):
+    """逐块转发流式响应，记录首块等待时间和总耗时"""
+    status = 'error'
+    first = True
+    try:
+        for chunk in chunks:
+            if first:
+                LLM_FIRST_CHUNK_SECONDS.observe(time.monotonic() - started, **labels)
+                first = False
+            _count_tokens(getattr(chunk, 'usage', None), labels)
+            yield chunk
+        status = 'ok'
+    finally:
+        LLM_REQUEST_SECONDS.observe(time.monotonic() - started, stream='true', status=status, **labels)
+
+
+def _count_tokens(usage, labels):
+    if not usage:
+        return
+    for token_type in ('prompt', 'completion'):
+        count = getattr(usage, f'{token_type}_tokens', None)
+        if count:
+            LLM_TOKENS.inc(count, type=token_type, **labels)
@@ -0,0 +1,339 @@
+"""
+进程内指标采集（Prometheus 文本格式导出）
+uWSGI 以多进程方式运行（processes × threads），每个 worker 在内存中累计自己的指标，
+并定期把快照原子写入 METRICS_DIR/<pid>.json；抓取时合并所有 worker 的快照：
+- 计数器、直方图求和；已退出 worker（如 max-requests 回收）的快照并入 aggregate.json，计数不会回退
+- 仪表盘（如进行中的请求数）只统计仍存活的 worker
+uWSGI master 在 fork 前累计的数据会在 worker 中首次更新时丢弃，避免被每个 worker 重复计数。
+未配置 METRICS_DIR 时只导出当前进程的指标（开发服务器）。
+"""
+
+import os
+import json
+import atexit
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境没有 fcntl，合并时不加文件锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AGGREGATE_FILE = 'aggregate.json'
+LOCK_FILE = '.lock'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=None):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames) or set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry._add(self, self._key(labels), amount)
+
+
+class Gauge(_Metric):
+    """仪表盘，多进程合并时只统计存活 worker 的值之和"""
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        self.registry._add(self, self._key(labels), amount)
+
+    def dec(self, amount=1, **labels):
+        self.registry._add(self, self._key(labels), -amount)
+
+    def set(self, value, **labels):
+        self.registry._set(self, self._key(labels), value)
+
+
+class Histogram(_Metric):
+    """直方图（桶计数 + 总和 + 次数）"""
+    kind = 'histogram'
+
+    def observe(self, value, **labels):
+        self.registry._observe(self, self._key(labels), value)
+
+    @contextmanager
+    def time(self, **labels):
+        """记录 with 块的耗时（秒）"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+
+class MetricsRegistry:
+    """线程安全的指标注册表，快照按进程写入共享目录"""
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._values = {}
+        self._pid = os.getpid()
+        self._dirty = False
+        self._last_flush = 0.0
+
+    # ---- 定义指标 ----
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(self, name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, help_text, labelnames, sorted(buckets)))
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    # ---- 更新（调用方已持有锁） ----
+    def _values_for(self, metric):
+        pid = os.getpid()
+        if pid != self._pid:
+            # fork 出的子进程：丢弃父进程的数据，由子进程重新累计
+            self._values = {}
+            self._pid = pid
+            self._last_flush = 0.0
+        self._dirty = True
+        return self._values.setdefault(metric.name, {})
+
+    def _add(self, metric, key, amount):
+        with self._lock:
+            values = self._values_for(metric)
+            values[key] = values.get(key, 0) + amount
+
+    def _set(self, metric, key, value):
+        with self._lock:
+            self._values_for(metric)[key] = value
+
+    def _observe(self, metric, key, value):
+        with self._lock:
+            values = self._values_for(metric)
+            state = values.get(key)
+            if state is None:
+                # 各桶计数（非累计）+ 总和 + 次数
+                state = values[key] = [0] * len(metric.buckets) + [0.0, 0]
+            index = bisect.bisect_left(metric.buckets, value)
+            if index < len(metric.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    # ---- 快照与写入 ----
+    def snapshot(self):
+        """当前进程的指标快照（可 JSON 序列化）"""
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._values = {}
+                self._pid = os.getpid()
+            self._dirty = False
+            metrics = {}
+            for name, metric in self._metrics.items():
+                values = self._values.get(name, {})
+                metrics[name] = {
+                    'type': metric.kind,
+                    'help': metric.help_text,
+                    'labelnames': list(metric.labelnames),
+                    'buckets': list(metric.buckets) if metric.buckets else None,
+                    'samples': [[list(key), list(value) if isinstance(value, list) else value] for key, value in values.items()],
+                }
+            return {'pid': self._pid, 'metrics': metrics}
+
+    def flush(self):
+        """把当前进程的快照原子写入共享目录"""
+        if not self.directory:
+            return
+        snapshot = self.snapshot()
+        os.makedirs(self.directory, exist_ok=True)
+        _write_json(os.path.join(self.directory, f"{snapshot['pid']}.json"), snapshot)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        """距上次写入超过 flush_interval 且有更新时写入（每个请求结束时调用）"""
+        if not self.directory or not self._dirty or time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        try:
+            self.flush()
+        except OSError as e:
+            logger.warning(f"写入指标快照失败: {str(e)}")
+
+    def flush_at_exit(self):
+        """进程退出前写入最后一次快照（worker 被回收时不丢失最后一段时间的计数）"""
+        if self.directory and self._dirty and self._pid == os.getpid():
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def collect(self):
+        """合并所有 worker 的快照；已退出 worker 的计数器和直方图并入 aggregate.json"""
+        if not self.directory:
+            return merge_snapshots([self.snapshot()])
+        self.flush()
+        with _directory_lock(self.directory):
+            aggregate_path = os.path.join(self.directory, AGGREGATE_FILE)
+            aggregate = _read_json(aggregate_path) or {'metrics': {}}
+            live, dead = [], []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json') or name == AGGREGATE_FILE:
+                    continue
+                path = os.path.join(self.directory, name)
+                snapshot = _read_json(path)
+                if snapshot is None:
+                    continue
+                if _pid_alive(snapshot.get('pid')):
+                    live.append(snapshot)
+                else:
+                    dead.append((path, snapshot))
+            if dead:
+                aggregate = merge_snapshots([aggregate] + [snapshot for _, snapshot in dead], include_gauges=False)
+                _write_json(aggregate_path, aggregate)
+                for path, _ in dead:
+                    os.remove(path)
+        return merge_snapshots([aggregate] + live)
+
+    def render(self):
+        """Prometheus 文本格式"""
+        return render_metrics(self.collect()['metrics'])
+
+
+def merge_snapshots(snapshots, include_gauges=True):
+    """合并多个快照：同名同标签的样本相加，直方图逐桶相加；include_gauges=False 时丢弃仪表盘"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.get('metrics', {}).items():
+            if metric['type'] == 'gauge' and not include_gauges:
+                continue
+            target = merged.setdefault(name, dict(metric, samples={}))
+            if target['type'] != metric['type'] or target.get('buckets') != metric.get('buckets'):
+                # 不同版本代码中定义不一致的指标，保留先出现的定义
+                continue
+            for labels, value in metric['samples']:
+                key = tuple(labels)
+                current = target['samples'].get(key)
+                if current is None:
+                    target['samples'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['samples'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['samples'][key] = current + value
+    for metric in merged.values():
+        metric['samples'] = [[list(key), value] for key, value in metric['samples'].items()]
+    return {'metrics': merged}
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def render_metrics(metrics):
+    """把合并后的指标渲染为 Prometheus 文本格式"""
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in sorted(metric['samples']):
+            pairs = list(zip(metric['labelnames'], labels))
+            if metric['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric['buckets'], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(pairs + [('le', _format_value(float(bound)))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(pairs + [('le', '+Inf')])} {value[-1]}")
+            lines.append(f"{name}_sum{_format_labels(pairs)} {_format_value(value[-2])}")
+            lines.append(f"{name}_count{_format_labels(pairs)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    if not isinstance(pid, int):
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.warning(f"指标快照损坏，已忽略: {path} - {str(e)}")
+        return None
+
+
+def _write_json(path, data):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+@contextmanager
+def _directory_lock(directory):
+    """合并快照时的进程间互斥（多个 worker 同时被抓取）"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# 全局指标注册表
+registry = MetricsRegistry(
+    directory=getattr(settings, 'METRICS_DIR', None),
+    flush_interval=getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0),
+)
+atexit.register(registry.flush_at_exit)
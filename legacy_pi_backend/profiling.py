@@ -0,0 +1,172 @@
+"""
+请求级采样分析
+ProfilingMiddleware 按 PROFILING_SAMPLE_RATE 随机抽取请求（或携带调试请求头且令牌正确的请求），
+在请求处理期间由后台线程定时读取处理线程的调用栈（sys._current_frames），
+按 collapsed stack 格式（"帧;帧;帧 次数"）保存到 PROFILING_DIR/<视图名>/。
+未被抽中的请求只多一次随机数判断，采样率较低时可以在生产环境常开；
+merge_profiles 命令把保存的结果合并为 flamegraph.pl / speedscope 可直接读取的文件。
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = '.folded'
+MAX_STACK_DEPTH = 128
+
+
+def profile_dir_name(view_name):
+    """视图名转换为目录名（如 knowledge_quiz:get_daily_question）"""
+    return re.sub(r'[^A-Za-z0-9_.:-]', '_', view_name or '<unmatched>').replace(':', '__')
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    # 只保留最后两级路径，避免不同机器上的绝对路径不一致
+    short = '/'.join(filename.replace('\\', '/').split('/')[-2:])
+    return f"{code.co_name} ({short}:{code.co_firstlineno})".replace(';', ',')
+
+
+class StackSampler:
+    """定时采样指定线程的调用栈，在 stop_code 所在的帧处截断（不含更外层的服务器框架）"""
+
+    def __init__(self, thread_id, interval=0.01, stop_code=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stop_code = stop_code
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[self._collapse(frame)] += 1
+            self.samples += 1
+
+    def _collapse(self, frame):
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(_frame_label(frame))
+            if frame.f_code is self.stop_code:
+                break
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+
+class ProfileStore:
+    """按视图名保存 collapsed stack 文件，每个视图只保留最近 max_per_view 份"""
+
+    def __init__(self, directory, max_per_view=200):
+        self.directory = directory
+        self.max_per_view = max_per_view
+
+    def save(self, view_name, stacks, duration):
+        """保存一次请求的采样结果，返回文件路径"""
+        view_dir = os.path.join(self.directory, profile_dir_name(view_name))
+        os.makedirs(view_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{threading.get_ident()}_{int(duration * 1000)}ms{PROFILE_SUFFIX}"
+        path = os.path.join(view_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self._prune(view_dir)
+        return path
+
+    def _prune(self, view_dir):
+        profiles = sorted(name for name in os.listdir(view_dir) if name.endswith(PROFILE_SUFFIX))
+        for name in profiles[:max(len(profiles) - self.max_per_view, 0)]:
+            try:
+                os.remove(os.path.join(view_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def views(self):
+        """已保存的视图目录及各自的文件数"""
+        if not os.path.isdir(self.directory):
+            return {}
+        return {
+            name: len([f for f in os.listdir(os.path.join(self.directory, name)) if f.endswith(PROFILE_SUFFIX)])
+            for name in sorted(os.listdir(self.directory))
+            if os.path.isdir(os.path.join(self.directory, name))
+        }
+
+    def load(self, view_dir_name, since=None):
+        """合并某个视图保存的采样结果，since 为时间戳（只读取之后修改的文件）"""
+        merged = Counter()
+        view_dir = os.path.join(self.directory, view_dir_name)
+        for name in os.listdir(view_dir):
+            path = os.path.join(view_dir, name)
+            if not name.endswith(PROFILE_SUFFIX) or (since and os.path.getmtime(path) < since):
+                continue
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack and count.isdigit():
+                        merged[stack] += int(count)
+        return merged
+
+
+class ProfilingMiddleware:
+    """按采样率或调试请求头对请求做调用栈采样"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.header = getattr(settings, 'PROFILING_HEADER', 'X-Profile')
+        self.token = getattr(settings, 'PROFILING_TOKEN', '')
+        self.interval = getattr(settings, 'PROFILING_INTERVAL', 0.01)
+        self.store = ProfileStore(getattr(settings, 'PROFILING_DIR', ''), getattr(settings, 'PROFILING_MAX_PER_VIEW', 200))
+
+    def _should_profile(self, request):
+        if not self.store.directory:
+            return False
+        # 调试请求头必须携带正确的令牌，避免外部请求任意触发采样
+        if self.token and request.headers.get(self.header) == self.token:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+
+        sampler = StackSampler(threading.get_ident(), self.interval, stop_code=ProfilingMiddleware.__call__.__code__).start()
+        started = time.monotonic()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        duration = time.monotonic() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unmatched>'
+        if stacks:
+            try:
+                path = self.store.save(view_name, stacks, duration)
+                response['X-Profile-Id'] = os.path.basename(path)
+            except OSError as e:
+                logger.warning(f"保存采样结果失败: {view_name} - {str(e)}")
+        return response
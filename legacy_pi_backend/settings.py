@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'legacy_pi_backend.instrumentation.MetricsMiddleware',  # 放在最外层，耗时包含其他中间件
+    'legacy_pi_backend.profiling.ProfilingMiddleware',  # 按采样率对请求做调用栈采样
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -134,6 +136,31 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 受保护媒体文件交给 nginx 发送（X-Accel-Redirect），未部署 nginx 时关闭，由 Django 流式返回
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', 'False').lower() == 'true'
+MEDIA_ACCEL_PREFIX = '/protected-media/'  # 对应 nginx 中的 internal location
+
+# nginx 边缘缓存刷新：数据更新后向 nginx 发送带 X-Cache-Refresh 头的请求覆盖缓存，未配置时不刷新
+EDGE_CACHE_REFRESH_URL = os.environ.get('EDGE_CACHE_REFRESH_URL', '')
+EDGE_CACHE_REFRESH_TOKEN = os.environ.get('EDGE_CACHE_REFRESH_TOKEN', '')  # nginx 启动时从同名环境变量代入 nginx.conf 中的 $cache_refresh
+# nginx 缓存键包含 Origin，刷新时额外以这些来源各刷新一次（逗号分隔，一般为前端站点的地址）
+EDGE_CACHE_REFRESH_ORIGINS = [origin.strip() for origin in os.environ.get('EDGE_CACHE_REFRESH_ORIGINS', '').split(',') if origin.strip()]
+
+# Prometheus 指标：uWSGI 各 worker 把指标快照写入 METRICS_DIR，/metrics 合并后导出（目录需所有 worker 可写）
+# uwsgi.ini 的 exec-asap 在启动时清空该目录，避免复用的 PID 误读上次运行留下的快照；不要与其他服务共用
+METRICS_DIR = os.environ.get('METRICS_DIR', '/tmp/legacy_pi_metrics')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))  # 每个 worker 写入快照的最小间隔（秒）
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # 配置后抓取需携带 Authorization: Bearer <token>
+
+# 请求采样分析：按比例（或携带 X-Profile: <PROFILING_TOKEN> 请求头）采样调用栈，保存到 PROFILING_DIR/<视图名>/
+# 使用 python manage.py merge_profiles 合并为火焰图输入；采样率为 0 且未配置令牌时不采样
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILING_HEADER = 'X-Profile'
+PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', 0.01))  # 采样间隔（秒）
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_MAX_PER_VIEW = 200  # 每个视图保留的最近采样数
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,146 @@
+import time
+import shutil
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
+
+
+class BackendMetricsTestCase(TestCase):
+    def setUp(self):
+        from legacy_pi_backend.metrics import registry
+        patcher = mock.patch.object(registry, 'directory', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_merge_keeps_exited_worker_counters(self):
+        """测试合并快照时已退出 worker 的计数并入 aggregate.json，仪表盘只统计存活 worker"""
+        import json
+        import os
+        from legacy_pi_backend.metrics import MetricsRegistry
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        registry = MetricsRegistry(directory=directory)
+        requests_total = registry.counter('requests_total', '请求数', ['view'])
+        in_flight = registry.gauge('in_flight', '进行中的请求数')
+        requests_total.inc(view='a')
+        in_flight.inc()
+        exited = registry.snapshot()
+        exited['pid'] = 2 ** 31 - 1
+        exited['metrics']['requests_total']['samples'] = [[['a'], 2]]
+        exited['metrics']['in_flight']['samples'] = [[[], 5]]
+        with open(os.path.join(directory, 'exited.json'), 'w') as f:
+            json.dump(exited, f)
+
+        body = registry.render()
+        self.assertIn('requests_total{view="a"} 3', body)
+        self.assertIn('in_flight 1', body)
+        self.assertFalse(os.path.exists(os.path.join(directory, 'exited.json')))
+        self.assertIn('requests_total{view="a"} 3', registry.render())
+
+    def test_metrics_endpoint_reports_request_latency(self):
+        """测试 /metrics 导出按路由名称统计的请求耗时，配置令牌后未授权请求返回 401"""
+        with mock.patch('legacy_pi_backend.views.RedisCrawlTask.get_recent', return_value=[]):
+            self.client.get('/metrics')
+            response = self.client.get('/metrics')
+            with override_settings(METRICS_TOKEN='token'):
+                unauthorized = self.client.get('/metrics')
+
+        body = response.content.decode()
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('http_request_duration_seconds_count{view="metrics",method="GET",status="200"}', body)
+        self.assertIn('crawler_task_running 0', body)
+        self.assertEqual(unauthorized.status_code, 401)
+
+    def test_llm_client_records_latency_and_tokens(self):
+        """测试包装后的大模型客户端记录调用次数和 token 数，流式调用逐块转发"""
+        from types import SimpleNamespace
+        from legacy_pi_backend.instrumentation import instrument_llm_client, LLM_TOKENS, LLM_REQUEST_SECONDS
+
+        def create(**kwargs):
+            if kwargs.get('stream'):
+                return iter(['a', 'b'])
+            return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=7, completion_tokens=3))
+
+        def sample(metric, labels):
+            samples = dict((tuple(key), value) for key, value in metric.registry.snapshot()['metrics'][metric.name]['samples'])
+            return samples.get(labels)
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        instrument_llm_client(client, 'test_service')
+        before = sample(LLM_TOKENS, ('test_service', 'm1', 'prompt')) or 0
+        client.chat.completions.create(model='m1', messages=[])
+        self.assertEqual(list(client.chat.completions.create(model='m1', messages=[], stream=True)), ['a', 'b'])
+
+        self.assertEqual(sample(LLM_TOKENS, ('test_service', 'm1', 'prompt')) - before, 7)
+        self.assertIsNotNone(sample(LLM_REQUEST_SECONDS, ('test_service', 'm1', 'true', 'ok')))
+
+
+class RequestProfilingTestCase(TestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+
+    def test_stack_sampler_collapses_request_thread(self):
+        """测试采样线程记录处理线程的调用栈，并在指定的帧处截断"""
+        import threading
+        from legacy_pi_backend.profiling import StackSampler
+
+        def busy_leaf():
+            deadline = time.monotonic() + 0.1
+            while time.monotonic() < deadline:
+                pass
+
+        def handler():
+            sampler = StackSampler(threading.get_ident(), 0.005, stop_code=handler.__code__).start()
+            busy_leaf()
+            return sampler.stop()
+
+        stacks = handler()
+        self.assertTrue(stacks)
+        stack = stacks.most_common(1)[0][0]
+        self.assertTrue(stack.startswith('handler ('))
+        self.assertIn(';busy_leaf (', stack)
+
+    def test_header_triggered_profile_is_saved_and_merged(self):
+        """测试携带调试请求头的请求被采样并按视图名保存，merge_profiles 合并为 collapsed stack 格式"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.test import Client
+
+        def slow_recent(limit):
+            time.sleep(0.05)
+            return []
+
+        with override_settings(PROFILING_DIR=self.profile_dir, PROFILING_TOKEN='token', PROFILING_INTERVAL=0.001), \
+                mock.patch('legacy_pi_backend.views.RedisCrawlTask.get_recent', side_effect=slow_recent):
+            client = Client()
+            sampled = client.get('/metrics', HTTP_X_PROFILE='token')
+            skipped = client.get('/metrics', HTTP_X_PROFILE='wrong')
+
+        self.assertIn('X-Profile-Id', sampled)
+        self.assertNotIn('X-Profile-Id', skipped)
+
+        out = StringIO()
+        call_command('merge_profiles', dir=self.profile_dir, view=['metrics'], stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(line.startswith('__call__ (legacy_pi_backend/profiling.py:') for line in lines))
+        self.assertTrue(any('metrics (legacy_pi_backend/views.py:' in line for line in lines))
+
+
+class EdgeCacheRefreshOriginsTestCase(TestCase):
+    @override_settings(EDGE_CACHE_REFRESH_URL='http://nginx', EDGE_CACHE_REFRESH_TOKEN='token',
+                       EDGE_CACHE_REFRESH_ORIGINS=['https://app.example.com'])
+    def test_refreshes_each_configured_origin(self):
+        """测试 nginx 缓存键包含 Origin 时，每个路径分别以不带 Origin 和配置的来源刷新"""
+        from legacy_pi_backend.edge_cache import refresh_edge_cache
+
+        with mock.patch('legacy_pi_backend.edge_cache.requests.get') as get:
+            refresh_edge_cache(['/api/crawler/daily/']).join()
+
+        headers = [call.kwargs['headers'] for call in get.call_args_list]
+        self.assertEqual(headers, [
+            {'X-Cache-Refresh': 'token'},
+            {'X-Cache-Refresh': 'token', 'Origin': 'https://app.example.com'},
+        ])
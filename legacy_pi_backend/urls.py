@@ -18,9 +18,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from . import views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', views.metrics, name='metrics'),
     path('api/crawler/', include('crawler.urls')),
     path('api/ai/', include('ai_interpreter.urls')),
     path('api/ai-chat/', include('ai_chat.urls')),
@@ -0,0 +1,35 @@
+"""
+项目级视图：Prometheus 指标抓取接口
+"""
+
+import logging
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_http_methods
+
+from crawler.redis_models import RedisCrawlTask
+from crawler.task_metrics import render_task_metrics
+from .metrics import registry, CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+
+@never_cache
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    合并所有 uWSGI worker 的指标，并附带最近一次爬取任务的阶段耗时（爬取在 Celery 进程中执行，从 Redis 读取）
+    配置了 METRICS_TOKEN 时需携带 Authorization: Bearer <token>
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse('unauthorized', status=401, content_type='text/plain; charset=utf-8')
+
+    body = registry.render()
+    try:
+        recent_tasks = RedisCrawlTask.get_recent(1)
+        body += render_task_metrics(recent_tasks[0] if recent_tasks else None)
+    except Exception as e:
+        logger.warning(f"获取爬取任务指标失败: {str(e)}")
+    return HttpResponse(body, content_type=CONTENT_TYPE)
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class MdDocsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'md_docs'
-    verbose_name = 'MD文档管理'
\ No newline at end of file
+    verbose_name = 'MD文档管理'
+
+    def ready(self):
+        from . import signals  # noqa: F401
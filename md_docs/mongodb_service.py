@@ -7,6 +7,7 @@ import pymongo
 from pymongo import MongoClient
 from django.conf import settings
 import logging
+from legacy_pi_backend.instrumentation import MongoCommandTimer
 from datetime import datetime
 import uuid
 
@@ -39,7 +40,7 @@ class MongoDBService:
             else:
                 connection_string = f"mongodb://{mongo_config['host']}:{mongo_config['port']}"
             
-            self.client = MongoClient(connection_string)
+            self.client = MongoClient(connection_string, event_listeners=[MongoCommandTimer()])
             self.db = self.client[getattr(settings, 'MONGODB_DATABASE', 'md_docs')]
             
             # 测试连接
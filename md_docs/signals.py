@@ -0,0 +1,47 @@
+import logging
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from legacy_pi_backend.edge_cache import refresh_edge_cache
+from .models import MDDocument, MDImage
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_delete, sender=MDImage)
+def release_image_file(sender, instance, **kwargs):
+    """图片记录删除后，若已没有其他记录引用同一文件则删除文件"""
+    from .views import image_blob_store
+
+    try:
+        if not MDImage.objects.filter(file_path=instance.file_path).exists():
+            image_blob_store.delete(instance.file_path)
+    except Exception as e:
+        logger.error(f"删除图片文件失败: {str(e)} - {instance.file_path}")
+
+
+@receiver(pre_save, sender=MDDocument)
+def remember_previous_category(sender, instance, **kwargs):
+    """记录保存前的类别，类别变更后原类别的列表缓存也需要刷新"""
+    if instance._state.adding:
+        instance._previous_category = None
+        return
+    instance._previous_category = MDDocument.objects.filter(pk=instance.pk).values_list('category', flat=True).first()
+
+
+@receiver(post_save, sender=MDDocument)
+@receiver(post_delete, sender=MDDocument)
+def refresh_document_cache(sender, instance, **kwargs):
+    """
+    文档保存或删除后，刷新 nginx 中文档列表和该文档的缓存
+    nginx 中类别列表的缓存键只含 category 参数，每个类别只有一个缓存副本；类别变更时新旧类别都刷新
+    """
+    categories = [instance.category]
+    previous = getattr(instance, '_previous_category', None)
+    if previous and previous != instance.category:
+        categories.append(previous)
+    paths = ['/api/md-docs/category/']
+    paths += [f'/api/md-docs/category/?category={category}' for category in categories]
+    paths.append(f'/api/md-docs/document/{instance.id}/')
+    transaction.on_commit(lambda: refresh_edge_cache(paths))
@@ -1,3 +1,126 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+
+class DocumentImageServingTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8), (0, 128, 255)).save(buffer, format='PNG')
+        self.png = buffer.getvalue()
+
+    def _upload(self):
+        image = SimpleUploadedFile('a.png', self.png, content_type='image/png')
+        return self.client.post('/api/md-docs/upload-image/', {'image': image}).json()
+
+    def test_same_image_stored_once(self):
+        """测试相同内容的图片只保存一份文件"""
+        first = self._upload()
+        second = self._upload()
+
+        self.assertNotEqual(first['image_id'], second['image_id'])
+        self.assertEqual(first['file_path'], second['file_path'])
+
+    def test_streams_file_and_honours_etag(self):
+        """测试未启用 nginx 时流式返回文件，并支持 ETag 条件请求"""
+        url = f"/api/md-docs/image/{self._upload()['image_id']}/"
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.png)
+        self.assertIn('Last-Modified', response)
+
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=True)
+    def test_accel_redirect_hands_off_to_nginx(self):
+        """测试启用 X-Accel-Redirect 时不返回文件内容"""
+        upload = self._upload()
+
+        response = self.client.get(f"/api/md-docs/image/{upload['image_id']}/")
+
+        self.assertEqual(response['X-Accel-Redirect'], f"/protected-media/{upload['file_path']}")
+        self.assertEqual(response.content, b'')
+
+
+class DocumentConditionalGetTestCase(TestCase):
+    def setUp(self):
+        from .models import MDDocument
+        self.document = MDDocument.objects.create(title='文档', category='spirit', content='# 文档')
+
+    def test_list_revalidates_until_documents_change(self):
+        """测试文档列表版本未变时返回 304，文档更新后重新返回内容"""
+        response = self.client.get('/api/md-docs/category/?category=spirit')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=300', response['Cache-Control'])
+
+        cached = self.client.get('/api/md-docs/category/?category=spirit', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        self.document.content = '# 新内容'
+        self.document.save()
+        changed = self.client.get('/api/md-docs/category/?category=spirit', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+
+    def test_document_honours_if_modified_since(self):
+        """测试单个文档支持 If-Modified-Since"""
+        url = f'/api/md-docs/document/{self.document.id}/'
+        response = self.client.get(url)
+
+        cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.client.get('/api/md-docs/document/00000000-0000-0000-0000-000000000000/').status_code, 404)
+
+
+class EdgeCacheRefreshTestCase(TestCase):
+    @override_settings(EDGE_CACHE_REFRESH_URL='http://nginx', EDGE_CACHE_REFRESH_TOKEN='token')
+    def test_saving_document_refreshes_cached_paths(self):
+        """测试文档保存提交后向 nginx 发送刷新请求"""
+        from .models import MDDocument
+
+        with mock.patch('legacy_pi_backend.edge_cache.requests.get') as get, \
+                mock.patch('legacy_pi_backend.edge_cache.threading.Thread') as thread:
+            thread.side_effect = lambda target, daemon: mock.Mock(start=target)
+            with self.captureOnCommitCallbacks(execute=True):
+                document = MDDocument.objects.create(title='文档', category='person', content='# 文档')
+
+        urls = [call.args[0] for call in get.call_args_list]
+        self.assertEqual(urls, [
+            'http://nginx/api/md-docs/category/',
+            'http://nginx/api/md-docs/category/?category=person',
+            f'http://nginx/api/md-docs/document/{document.id}/',
+        ])
+        self.assertEqual(get.call_args.kwargs['headers'], {'X-Cache-Refresh': 'token'})
+
+    @override_settings(EDGE_CACHE_REFRESH_URL='http://nginx', EDGE_CACHE_REFRESH_TOKEN='token')
+    def test_category_change_refreshes_previous_category(self):
+        """测试文档类别变更后，新旧类别的列表缓存都被刷新"""
+        from .models import MDDocument
+
+        document = MDDocument.objects.create(title='文档', category='person', content='# 文档')
+        with mock.patch('legacy_pi_backend.edge_cache.requests.get') as get, \
+                mock.patch('legacy_pi_backend.edge_cache.threading.Thread') as thread:
+            thread.side_effect = lambda target, daemon: mock.Mock(start=target)
+            with self.captureOnCommitCallbacks(execute=True):
+                document.category = 'spirit'
+                document.save()
+
+        urls = [call.args[0] for call in get.call_args_list]
+        self.assertEqual(urls, [
+            'http://nginx/api/md-docs/category/',
+            'http://nginx/api/md-docs/category/?category=spirit',
+            'http://nginx/api/md-docs/category/?category=person',
+            f'http://nginx/api/md-docs/document/{document.id}/',
+        ])
@@ -1,25 +1,52 @@
 import json
 import logging
-import uuid
 import os
-from datetime import datetime
-from django.http import JsonResponse, HttpResponse
+from datetime import datetime, date
+from urllib.parse import quote
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Q, Max, Count
 from django.conf import settings
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 
+from crawler.blob_store import FileBlobStore
+from legacy_pi_backend.conditional import conditional_get, make_etag
+from crawler.image_derivatives import image_derivative_service
 from .models import MDDocument, MDImage, MDCategory
 
 logger = logging.getLogger(__name__)
 
+# 图片按内容哈希存储，相同图片只保存一份文件
+image_blob_store = FileBlobStore('md_docs/blobs')
+
+
+def _documents_stamp(request):
+    """文档列表的版本戳：已发布文档的数量和最近更新时间（一次聚合查询）"""
+    category = request.GET.get('category', '')
+    query = Q(is_published=True)
+    if category:
+        query &= Q(category=category)
+    stats = MDDocument.objects.filter(query).aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    # 响应中包含当天日期，日期变化后版本也随之变化
+    etag = make_etag('documents', category, date.today(), stats['count'], stats['last_modified'])
+    return etag, stats['last_modified']
+
+
+def _document_stamp(request, document_id):
+    """单个文档的版本戳：文档ID和更新时间"""
+    updated_at = MDDocument.objects.filter(id=document_id, is_published=True).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return make_etag('document', document_id, updated_at), updated_at
+
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@conditional_get(_documents_stamp, max_age=300)
 def get_documents_by_category(request):
     """
     根据类别获取MD文档ID列表
@@ -48,7 +75,6 @@ def get_documents_by_category(request):
         document_ids = [str(doc.id) for doc in documents]
         
         # 获取当前日期
-        from datetime import date
         current_date = date.today().strftime('%Y-%m-%d')
         
         return JsonResponse({
@@ -69,6 +95,7 @@ def get_documents_by_category(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@conditional_get(_document_stamp, max_age=300)
 def get_document_markdown(request, document_id):
     """
     根据文档ID获取Markdown格式内容
@@ -135,8 +162,14 @@ def get_document_status(request):
 def get_document_image(request, image_id):
     """
     获取文档图片
+    支持 w（宽度）、q（质量）、fmt（webp/jpeg/auto）参数返回缩放/转码后的版本
     """
     try:
+        try:
+            spec = image_derivative_service.negotiate(request)
+        except ValueError as e:
+            return HttpResponse(f'参数错误: {str(e)}', status=400, content_type='text/plain; charset=utf-8')
+        
         try:
             image = MDImage.objects.get(id=image_id)
         except MDImage.DoesNotExist:
@@ -145,16 +178,37 @@ def get_document_image(request, image_id):
         # 构建图片文件路径
         image_path = os.path.join(settings.MEDIA_ROOT, image.file_path)
         
-        if not os.path.exists(image_path):
+        try:
+            stat = os.stat(image_path)
+        except FileNotFoundError:
             return HttpResponse('图片文件不存在', status=404, content_type='text/plain; charset=utf-8')
         
-        # 读取图片数据
-        with open(image_path, 'rb') as f:
-            image_data = f.read()
-        
-        # 返回图片数据
-        response = HttpResponse(image_data, content_type=image.content_type)
+        # 文件按内容哈希存储时直接用哈希作 ETag，否则用修改时间和大小
+        tag = _image_etag(image.file_path, stat)
+        etag = f'"{tag}-{spec.key}"' if spec else f'"{tag}"'
+        not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if not_modified is not None:
+            not_modified['Vary'] = 'Accept'
+            return not_modified
+        
+        if spec:
+            # 衍生版本需要读取原图处理
+            with open(image_path, 'rb') as f:
+                image_data = f.read()
+            image_data, content_type = image_derivative_service.render(f"md_docs:{image.file_path}", image_data, image.content_type, spec)
+            response = HttpResponse(image_data, content_type=content_type)
+        elif settings.MEDIA_ACCEL_REDIRECT:
+            # 由 nginx 直接发送文件，uWSGI 只负责鉴权和查找
+            response = HttpResponse(content_type=image.content_type)
+            response['X-Accel-Redirect'] = quote(f"{settings.MEDIA_ACCEL_PREFIX}{image.file_path}")
+        else:
+            # 流式返回，uWSGI 会使用 sendfile
+            response = FileResponse(open(image_path, 'rb'), content_type=image.content_type)
+        
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
         response['Cache-Control'] = 'public, max-age=86400'  # 缓存1天
+        response['Vary'] = 'Accept'
         response['Content-Disposition'] = f'inline; filename="{image.original_filename}"'
         
         return response
@@ -164,6 +218,13 @@ def get_document_image(request, image_id):
         return HttpResponse(f'获取图片失败: {str(e)}', status=500, content_type='text/plain; charset=utf-8')
 
 
+def _image_etag(file_path, stat):
+    """生成图片 ETag（不含引号）"""
+    if file_path.startswith(f"{image_blob_store.base_dir}/"):
+        return os.path.splitext(os.path.basename(file_path))[0]
+    return f"{int(stat.st_mtime)}-{stat.st_size}"
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def upload_document(request):
@@ -250,15 +311,10 @@ def upload_image(request):
                 'error': f'不支持的文件类型: {image_file.content_type}'
             }, status=400)
         
-        # 生成唯一文件名
+        # 按内容哈希保存文件，已存在相同内容时直接复用
         file_extension = os.path.splitext(image_file.name)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        
-        # 构建存储路径
-        file_path = f"md_docs/images/{unique_filename}"
-        
-        # 保存文件
-        saved_path = default_storage.save(file_path, ContentFile(image_file.read()))
+        digest, saved_path = image_blob_store.put(image_file.read(), file_extension)
+        unique_filename = os.path.basename(saved_path)
         
         # 创建图片记录
         image = MDImage(
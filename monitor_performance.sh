@@ -40,6 +40,12 @@ docker-compose exec -T nginx wget -qO- http://localhost/nginx_status 2>/dev/null
 
 echo ""
 
+# 应用指标（完整指标见 http://localhost:8000/metrics）
+echo "📈 应用指标:"
+curl -s http://localhost:8000/metrics 2>/dev/null | grep -E "^(http_requests_in_flight|crawler_task_running|crawler_stage_duration_seconds\{.*quantile=\"0.95\")" || echo "无法获取"
+
+echo ""
+
 # 检查日志错误
 echo "📝 最近错误日志 (最后10行):"
 echo "Django 错误:"
@@ -5,6 +5,7 @@ import tempfile
 import time
 from typing import AsyncGenerator, Optional
 import logging
+from legacy_pi_backend.instrumentation import timed, TTS_SYNTHESIS_SECONDS, TTS_CHARACTERS
 
 logger = logging.getLogger(__name__)
 
@@ -67,24 +68,26 @@ class TTSService:
             
             # 分段处理长文本
             segments = self._split_text(text)
+            TTS_CHARACTERS.inc(len(text), mode='stream')
             
-            for i, segment in enumerate(segments):
-                logger.info(f"处理第 {i+1}/{len(segments)} 段文本: {segment[:30]}...")
-                
-                # 使用edge-tts进行转换
-                communicate = edge_tts.Communicate(segment, voice)
-                
-                # 流式获取音频数据
-                async for chunk in communicate.stream():
-                    if chunk["type"] == "audio":
-                        yield chunk["data"]
-                    elif chunk["type"] == "WordBoundary":
-                        # 可以在这里处理单词边界信息
-                        pass
-                
-                # 段落间短暂停顿
-                if i < len(segments) - 1:
-                    await asyncio.sleep(0.1)
+            with timed(TTS_SYNTHESIS_SECONDS, mode='stream'):
+                for i, segment in enumerate(segments):
+                    logger.info(f"处理第 {i+1}/{len(segments)} 段文本: {segment[:30]}...")
+                    
+                    # 使用edge-tts进行转换
+                    communicate = edge_tts.Communicate(segment, voice)
+                    
+                    # 流式获取音频数据
+                    async for chunk in communicate.stream():
+                        if chunk["type"] == "audio":
+                            yield chunk["data"]
+                        elif chunk["type"] == "WordBoundary":
+                            # 可以在这里处理单词边界信息
+                            pass
+                    
+                    # 段落间短暂停顿
+                    if i < len(segments) - 1:
+                        await asyncio.sleep(0.1)
                     
             logger.info("TTS转换完成")
             
@@ -120,9 +123,11 @@ class TTSService:
             
             # 使用edge-tts进行转换
             communicate = edge_tts.Communicate(text, voice)
+            TTS_CHARACTERS.inc(len(text), mode='file')
             
             # 保存到文件
-            await communicate.save(output_path)
+            with timed(TTS_SYNTHESIS_SECONDS, mode='file'):
+                await communicate.save(output_path)
             
             # 获取文件信息
             file_size = os.path.getsize(output_path)
@@ -17,6 +17,7 @@ import edge_tts
 
 from .models import TTSRequest
 from .services import tts_service
+from legacy_pi_backend.instrumentation import timed, TTS_SYNTHESIS_SECONDS, TTS_CHARACTERS
 
 logger = logging.getLogger(__name__)
 
@@ -107,14 +108,16 @@ class TTSView(View):
             try:
                 # 使用edge-tts进行转换
                 communicate = edge_tts.Communicate(text, voice)
+                TTS_CHARACTERS.inc(len(text), mode='stream')
                 
                 # 流式获取音频数据
-                async for chunk in communicate.stream():
-                    if chunk["type"] == "audio":
-                        yield chunk["data"]
-                    elif chunk["type"] == "WordBoundary":
-                        # 可以在这里处理单词边界信息
-                        pass
+                with timed(TTS_SYNTHESIS_SECONDS, mode='stream'):
+                    async for chunk in communicate.stream():
+                        if chunk["type"] == "audio":
+                            yield chunk["data"]
+                        elif chunk["type"] == "WordBoundary":
+                            # 可以在这里处理单词边界信息
+                            pass
                 
                 # 标记完成
                 tts_request.mark_completed(